@@ -6,14 +6,19 @@ Tokamak AI CLI Tool
 
 import os
 import sys
-from openai import OpenAI
 from dotenv import load_dotenv
 import argparse
 
+from transport import get_transport
+from model_discovery import ModelDiscovery, collect_api_keys, default_cache_path
+from chat_history import ChatHistory
+from hedging import HedgePolicy, print_hedge
+import timings
+
 load_dotenv()
 
 class TokamakAI:
-    def __init__(self, model=None):
+    def __init__(self, model=None, hedge=None):
         self.api_key = os.getenv("AI_API_KEY")
         self.base_url = os.getenv("AI_BASE_URL")
         self.model = model or os.getenv("AI_MODEL")
@@ -23,7 +28,14 @@ class TokamakAI:
         if not self.base_url:
             raise ValueError("AI_BASE_URL must be set in .env file")
             
-        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        # code_assistant.py와 같은 커넥션 풀을 공유하는 호출 계층
+        self.transport = get_transport(self.api_key, self.base_url)
+        # 첫 토큰이 늦으면 중복 요청 (hedge: None이면 사용 안 함, 빈 문자열이면 같은 모델, 아니면 대체 모델 이름)
+        self.hedge = HedgePolicy(fallback_model=hedge) if hedge is not None else None
+    
+    def _hedge_options(self):
+        """transport.stream에 넘길 중복 요청 옵션"""
+        return {'hedge': self.hedge, 'on_hedge': print_hedge} if self.hedge is not None else {}
     
     def ask(self, question, stream=True):
         """단일 질문에 대한 답변"""
@@ -31,37 +43,27 @@ class TokamakAI:
             if stream:
                 return self._stream_response(question)
             else:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[{"role": "user", "content": question}]
-                )
-                return response.choices[0].message.content
+                return self.transport.complete([{"role": "user", "content": question}], self.model)
         except Exception as e:
             return f"Error: {e}"
     
     def _stream_response(self, question):
         """스트리밍 응답"""
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": question}],
-            stream=True
-        )
-        
-        full_response = ""
-        for chunk in response:
-            if chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                print(content, end="", flush=True)
-                full_response += content
+        parts = []
+        for content in self.transport.stream([{"role": "user", "content": question}], self.model,
+                                             **self._hedge_options()):
+            print(content, end="", flush=True)
+            parts.append(content)
         print()  # 줄바꿈
-        return full_response
+        return "".join(parts)
     
     def chat(self):
         """대화형 모드"""
         print(f"🤖 Tokamak AI Chat (Model: {self.model})")
         print("Type 'exit' or 'quit' to end the conversation.\n")
         
-        messages = []
+        # 오래된 대화는 백그라운드에서 요약해서 요청 크기를 일정하게 유지
+        history = ChatHistory(self.transport, self.model)
         
         while True:
             try:
@@ -74,24 +76,17 @@ class TokamakAI:
                 if not user_input:
                     continue
                 
-                messages.append({"role": "user", "content": user_input})
+                history.add("user", user_input)
                 
                 print("AI: ", end="", flush=True)
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    stream=True
-                )
-                
-                full_response = ""
-                for chunk in response:
-                    if chunk.choices[0].delta.content:
-                        content = chunk.choices[0].delta.content
-                        print(content, end="", flush=True)
-                        full_response += content
+                parts = []
+                for content in self.transport.stream(history.messages(), self.model, **self._hedge_options()):
+                    print(content, end="", flush=True)
+                    parts.append(content)
                 
                 print("\n")
-                messages.append({"role": "assistant", "content": full_response})
+                history.add("assistant", "".join(parts))
+                history.maybe_compact()
                 
             except KeyboardInterrupt:
                 print("\n👋 Goodbye!")
@@ -116,6 +111,9 @@ def main():
   
   # 스트리밍 없이 전체 응답 받기
   python ai.py --no-stream "간단한 시 하나 써줘"
+  
+  # 첫 토큰이 늦으면 대체 모델로 중복 요청
+  python ai.py --hedge --hedge-model qwen3-80b-next "블록체인이란?"
         """
     )
     
@@ -143,6 +141,18 @@ def main():
         help='스트리밍 없이 전체 응답 받기'
     )
     
+    parser.add_argument(
+        '--hedge',
+        action='store_true',
+        help='첫 토큰이 최근 TTFT의 95백분위수보다 늦으면 중복 요청하고 먼저 응답한 쪽 사용'
+    )
+    
+    parser.add_argument(
+        '--hedge-model',
+        default=None,
+        help='--hedge의 중복 요청에 사용할 대체 모델 (기본값: 같은 모델)'
+    )
+    
     parser.add_argument(
         '--list-models',
         action='store_true',
@@ -152,18 +162,23 @@ def main():
     args = parser.parse_args()
     
     try:
-        ai = TokamakAI(model=args.model)
+        ai = TokamakAI(model=args.model, hedge=(args.hedge_model or '') if args.hedge else None)
+        timings.record('command', command='list-models' if args.list_models else 'chat' if args.chat else 'ask')
         
         if args.list_models:
-            print("📋 Available models:")
-            try:
-                models = ai.client.models.list()
-                for model in models.data:
-                    print(f"  - {model.id}")
-            except Exception as e:
-                print(f"Error fetching models: {e}")
+            discovery = ModelDiscovery(ai.base_url, collect_api_keys() or [ai.api_key],
+                                       cache_path=default_cache_path())
+            result = discovery.get()
+            print("📋 Available models:" + (" (캐시, 갱신 중)" if result.stale else ""))
+            for model_id in result.models:
+                print(f"  - {model_id}")
+            for key, error in result.errors.items():
+                print(f"Error fetching models for key {discovery.key_label(key)}: {error}")
+            if not result.models:
                 print("  - qwen3-235b (default)")
                 print("  - qwen3-80b-next")
+            # 다음 실행을 위해 캐시 갱신이 끝날 때까지 대기
+            discovery.wait_refresh(discovery.timeout + 1)
             return
         
         if args.chat:
@@ -0,0 +1,125 @@
+"""
+Tokamak AI Artifacts
+스트리밍 응답의 코드 블록을 실제 파일(생성된 테스트, 리팩토링된 소스 등)로 바로 기록하는 도구
+
+- FenceParser로 받은 조각만 처리하므로 긴 응답도 다시 훑지 않음
+- 코드 블록마다 목적지 옆의 임시 파일(<목적지>.<tag><번호>.partial)에 받는 대로 기록
+- 응답이 끝나면 가장 긴 닫힌 블록 하나를 남기고 나머지(설치 명령, 사용 예시 등)는 삭제
+- 닫히지 않은 블록(잘린 응답)은 사용하지 않음
+"""
+
+from pathlib import Path
+
+from fence_parser import FenceParser
+from result_writer import ResultWriter
+
+# 소스 확장자 -> 그 언어로 인정하는 코드 블록 정보 문자열
+LANGUAGES = {
+    '.py': {'python', 'py', 'python3'},
+    '.js': {'javascript', 'js', 'jsx'},
+    '.ts': {'typescript', 'ts', 'tsx'},
+    '.java': {'java'},
+    '.go': {'go', 'golang'},
+    '.sol': {'solidity', 'sol'},
+}
+
+# 확장자를 모르는 파일에서도 코드로 보지 않는 블록
+SHELL_LANGUAGES = {'bash', 'sh', 'shell', 'console', 'zsh', 'powershell', 'text', 'txt'}
+
+
+def accepts(suffix, info):
+    """이 코드 블록(정보 문자열)이 해당 확장자의 소스 코드인지"""
+    language = info.split()[0].lower() if info else ''
+    if not language:
+        return True
+    if suffix in LANGUAGES:
+        return language in LANGUAGES[suffix]
+    return language not in SHELL_LANGUAGES
+
+
+def test_path_for(filepath, root):
+    """생성된 테스트 파일 경로 (Python: <root>/tests/test_<stem>.py, 그 외: <root>/tests/<stem>.test<확장자>)"""
+    path = Path(filepath)
+    if path.suffix == '.py':
+        return Path(root) / 'tests' / f"test_{path.stem}.py"
+    return Path(root) / 'tests' / f"{path.stem}.test{path.suffix}"
+
+
+def refactor_path_for(filepath):
+    """리팩토링된 소스 경로 (원본 옆의 <stem>_refactored<확장자>)"""
+    path = Path(filepath)
+    return path.with_name(f"{path.stem}_refactored{path.suffix}")
+
+
+def available_path(path, taken=()):
+    """이미 있는 파일을 덮어쓰지 않도록 비어 있는 경로 반환 (test_app.py -> test_app_2.py ...)
+
+    taken: 아직 파일은 없지만 다른 작업이 쓰기로 한 경로들
+    """
+    path = Path(path)
+    candidate, number = path, 2
+    while candidate.exists() or candidate in taken:
+        candidate = path.with_name(f"{path.stem}_{number}{path.suffix}")
+        number += 1
+    return candidate
+
+
+class ArtifactExtractor:
+    """응답 하나에서 목적지 파일 하나에 쓸 코드 블록 추출"""
+
+    def __init__(self, path, tag='artifact'):
+        self.path = Path(path)
+        self.tag = tag
+        self.opened = 0       # 열린 코드 블록 수 (언어가 다른 블록 포함)
+        self.truncated = 0    # 닫히지 않아서 버린 줄 수
+        self._parser = FenceParser()
+        self._blocks = []     # [기록기, 줄 수]
+        self._current = None  # 기록 중인 블록 (언어가 다른 블록이면 False)
+
+    @property
+    def lines(self):
+        """기록 중인 블록의 줄 수"""
+        return self._current[1] if self._current else 0
+
+    def feed(self, text):
+        self._handle(self._parser.feed(text))
+
+    def _handle(self, events):
+        for event in events:
+            if event.kind == 'open':
+                self.opened += 1
+                if accepts(self.path.suffix, event.text):
+                    self._current = [ResultWriter(self.path, suffix=f".{self.tag}{len(self._blocks)}.partial"), 0]
+                    self._blocks.append(self._current)
+                else:
+                    self._current = False
+            elif event.kind == 'code':
+                if self._current:
+                    self._current[0].write(event.text)
+                    self._current[1] += 1
+            elif event.kind == 'close':
+                if self._current:
+                    self._current[0].close()
+                self._current = None
+
+    def finish(self):
+        """응답이 끝남: 가장 긴 닫힌 블록의 임시 파일 기록기 반환 (확정은 호출하는 쪽에서 commit, 없으면 None)"""
+        self._handle(self._parser.close())
+        if self._current:
+            self.truncated = self._current[1]
+            self._blocks.remove(self._current)
+            self._current[0].discard()
+        self._current = None
+        best = max(self._blocks, key=lambda block: block[1], default=None)
+        for writer, _ in self._blocks:
+            if best is None or writer is not best[0]:
+                writer.discard()
+        self._blocks = [best] if best else []
+        return best[0] if best else None
+
+    def discard(self):
+        """중단/실패: 모든 임시 파일 삭제"""
+        for writer, _ in self._blocks:
+            writer.discard()
+        self._blocks = []
+        self._current = None
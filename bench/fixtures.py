@@ -0,0 +1,91 @@
+"""
+Tokamak AI Bench - 벤치마크용 가짜 저장소 생성
+크기별로 같은 내용이 나오도록 고정된 시드로 Python 패키지를 만듭니다.
+
+- files: 패키지 안의 모듈 수 (한 디렉토리에 10개씩 하위 패키지로 나눔)
+- big_lines: 단일 파일 명령(analyze, review 등)의 대상인 big.py의 줄 수 (큰 크기에서는 청크 분석 경로를 탐)
+"""
+
+import random
+from pathlib import Path
+
+# 이름 -> (모듈 수, big.py 줄 수)
+SIZES = {
+    'small': (10, 150),
+    'medium': (100, 1000),
+    'large': (1000, 6000),
+}
+
+MODULE_TEMPLATE = '''"""{name}: 벤치마크용 모듈"""
+
+import os
+import json
+
+
+class {cls}:
+    """{cls} 설정과 상태를 관리합니다"""
+
+    def __init__(self, path, retries={retries}):
+        self.path = path
+        self.retries = retries
+        self.cache = {{}}
+
+    def load(self):
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, key, default=None):
+        if key not in self.cache:
+            self.cache[key] = self.load().get(key, default)
+        return self.cache[key]
+
+'''
+
+FUNCTION_TEMPLATE = '''
+def {name}(items, limit={limit}):
+    """items에서 조건에 맞는 값을 최대 limit개 반환"""
+    result = []
+    for item in items:
+        if item and len(result) < limit:
+            result.append(item * {factor})
+    total = sum(result)
+    if total > {threshold}:
+        os.environ.get("BENCH_{upper}", "")
+    return result
+'''
+
+
+def _module(rng, name, lines):
+    """대략 lines줄의 모듈 소스"""
+    parts = [MODULE_TEMPLATE.format(name=name, cls=name.title().replace('_', ''), retries=rng.randint(1, 5))]
+    count = 0
+    while sum(part.count('\n') for part in parts) < lines:
+        function = f"{name}_step_{count}"
+        parts.append(FUNCTION_TEMPLATE.format(name=function, upper=function.upper(), limit=rng.randint(5, 50),
+                                              factor=rng.randint(2, 9), threshold=rng.randint(100, 1000)))
+        count += 1
+    return "".join(parts)
+
+
+def make_repo(root, size):
+    """root 아래에 size 크기의 저장소 생성 (이미 만들어져 있으면 그대로 사용) - 저장소 경로 반환"""
+    files, big_lines = SIZES[size]
+    repo = Path(root) / f"repo_{size}"
+    marker = repo / ".bench_complete"
+    if marker.exists():
+        return repo
+
+    rng = random.Random(f"bench-{size}")
+    package = repo / "pkg"
+    (repo / ".git").mkdir(parents=True, exist_ok=True)  # 저장소 루트 표시 (find_repo_root)
+    (repo / "README.md").write_text(f"# Bench repo ({size})\n", encoding='utf-8')
+    for i in range(files):
+        directory = package / f"sub_{i // 10:03d}"
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / "__init__.py").touch()
+        name = f"module_{i:04d}"
+        (directory / f"{name}.py").write_text(_module(rng, name, rng.randint(40, 160)), encoding='utf-8')
+    (package / "__init__.py").touch()
+    (package / "big.py").write_text(_module(rng, "big", big_lines), encoding='utf-8')
+    marker.touch()
+    return repo
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tokamak AI Bench - 로컬 OpenAI 호환 mock 서버
+실제 게이트웨이 없이 도구 자체의 성능을 측정하기 위한 서버 (표준 라이브러리만 사용)
+
+- GET  /v1/models
+- POST /v1/chat/completions (stream=true면 SSE, 아니면 JSON)
+- 첫 토큰까지의 시간(TTFT), 초당 토큰 수, 응답 토큰 수를 설정 가능
+- apply 요청(편집 블록 프롬프트)에는 보낸 코드의 첫 줄을 바꾸는 유효한 편집 블록으로 응답
+
+실행: python bench/mock_server.py --port 8765 --ttft 0.5 --tps 80 --tokens 400
+"""
+
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+WORDS = ("코드 분석 결과 함수 클래스 모듈 성능 개선 제안 구조 테스트 예외 처리 "
+         "the code should handle errors and edge cases more carefully").split()
+
+CODE_BLOCK = re.compile(r"```[^\n]*\n(.*?)\n```", re.DOTALL)
+
+
+class MockConfig:
+    """mock 서버 설정 (요청을 처리하는 스레드들이 함께 읽음)"""
+
+    def __init__(self, ttft=0.2, tps=200.0, tokens=300, chunk_tokens=1, models=('bench-model',)):
+        self.ttft = ttft
+        self.tps = tps
+        self.tokens = tokens
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.models = list(models)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def as_dict(self):
+        return {"ttft": self.ttft, "tps": self.tps, "tokens": self.tokens,
+                "chunk_tokens": self.chunk_tokens, "models": self.models}
+
+
+def reply_tokens(request, config):
+    """요청에 대한 응답 텍스트를 토큰(단어) 단위 목록으로 생성"""
+    messages = request.get('messages') or []
+    system = next((m['content'] for m in messages if m['role'] == 'system'), '')
+    user = messages[-1]['content'] if messages else ''
+
+    if '<<<<<<< SEARCH' in system:
+        # apply 편집 블록: 보낸 코드의 첫 번째 내용 있는 줄 끝에 주석 추가
+        match = CODE_BLOCK.search(user)
+        lines = [line for line in (match.group(1) if match else '').splitlines() if line.strip()]
+        if lines:
+            line = lines[0]
+            text = f"<<<<<<< SEARCH\n{line}\n=======\n{line}  # bench\n>>>>>>> REPLACE\n"
+            return re.findall(r"\S+\s*|\s+", text)
+
+    count = max(1, config.tokens)
+    code_tokens = count // 4
+    words = [WORDS[i % len(WORDS)] + ("\n" if i % 12 == 11 else " ") for i in range(count - code_tokens)]
+    code = ["```python\n"]
+    for i in range(max(1, code_tokens // 6)):
+        code += [f"def bench_{i}(", "value", "):\n", "    return ", "value ", f"+ {i}\n"]
+    code.append("```\n")
+    return words + ["\n\n"] + code
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # serve()에서 설정
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json({"object": "list", "data": [
+                {"id": model, "object": "model", "created": 0, "owned_by": "bench"} for model in self.config.models]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json({"error": "not found"}, 404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        config = self.config
+        config.count()
+        tokens = reply_tokens(request, config)
+        prompt_chars = sum(len(m.get('content') or '') for m in request.get('messages') or [])
+        usage = {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_chars // 4 + len(tokens)}
+        model = request.get('model', config.models[0])
+
+        time.sleep(config.ttft)
+        if not request.get('stream'):
+            time.sleep(len(tokens) / config.tps)
+            self._send_json({"id": "bench", "object": "chat.completion", "created": int(time.time()), "model": model,
+                             "choices": [{"index": 0, "finish_reason": "stop",
+                                          "message": {"role": "assistant", "content": "".join(tokens)}}],
+                             "usage": usage})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(payload):
+            data = b"data: " + (payload if isinstance(payload, bytes) else json.dumps(payload).encode()) + b"\n\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def chunk(delta, finish=None, **extra):
+            return {"id": "bench", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **extra}
+
+        try:
+            step = config.chunk_tokens
+            for i in range(0, len(tokens), step):
+                if i:
+                    time.sleep(step / config.tps)
+                send(chunk({"content": "".join(tokens[i:i + step])}))
+            send(chunk({}, "stop", usage=usage))
+            send(b"[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 클라이언트가 스트림을 중간에 닫음
+
+
+def serve(config, host="127.0.0.1", port=0):
+    """백그라운드 스레드에서 서버 시작 (port=0이면 빈 포트) - (서버, base_url) 반환"""
+    handler = type('BoundMockHandler', (MockHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="bench-mock", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def add_arguments(parser):
+    parser.add_argument('--ttft', type=float, default=0.2, help='첫 토큰까지의 지연 (초, 기본값: 0.2)')
+    parser.add_argument('--tps', type=float, default=200.0, help='초당 토큰 수 (기본값: 200)')
+    parser.add_argument('--tokens', type=int, default=300, help='응답 토큰 수 (기본값: 300)')
+    parser.add_argument('--chunk-tokens', type=int, default=1, help='SSE 이벤트 하나에 담을 토큰 수 (기본값: 1)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokamak AI Bench - 로컬 OpenAI 호환 mock 서버")
+    parser.add_argument('--port', type=int, default=8765, help='포트 (기본값: 8765)')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    config = MockConfig(args.ttft, args.tps, args.tokens, args.chunk_tokens)
+    server, base_url = serve(config, port=args.port)
+    print(f"🧪 Mock server: {base_url} (TTFT {args.ttft}s, {args.tps:g} tokens/s, {args.tokens} tokens)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Tokamak AI Bench - code_assistant.py / ai.py 벤치마크
+로컬 mock 서버(mock_server.py)를 띄우고, 크기별 가짜 저장소에서 각 명령을 실행해서
+파일 탐색 시간, 프롬프트 생성 시간, TTFT, 전체 시간, 최대 메모리(RSS)를 JSON으로 저장합니다.
+
+단계별 시간은 도구가 AI_TIMINGS_FILE에 남기는 기록(timings.py)으로 계산합니다.
+
+실행:
+  python bench/run_bench.py                          # small, medium 저장소에서 모든 명령 3회씩
+  python bench/run_bench.py --sizes large --commands analyze-dir batch-review
+  python bench/run_bench.py --baseline bench/results/bench_20260301_120000.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+from mock_server import MockConfig, serve, add_arguments
+from fixtures import SIZES, make_repo
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+TOOLS = {'code_assistant': ROOT / "code_assistant.py", 'ai': ROOT / "ai.py"}
+
+# 비교할 때 출력하는 지표
+COMPARE_METRICS = ('total_ms', 'walk_ms', 'prompt_build_ms', 'ttft_ms', 'peak_rss_mb')
+
+
+def _ca(build):
+    """code_assistant.py 인자 (캐시 없이, 결과는 작업 디렉토리에 저장)"""
+    return lambda repo, work: [*map(str, build(repo, work)), '--no-cache', '--save-dir', str(work / "out")]
+
+
+def _apply_target(repo, work):
+    """apply는 파일을 수정하므로 매번 원본을 복사해서 사용"""
+    target = repo / "pkg" / "apply_target.py"
+    shutil.copyfile(repo / "pkg" / "big.py", target)
+    return target
+
+
+def _apply_dir(repo, work):
+    """여러 파일 apply: 하위 패키지 하나를 작업 디렉토리에 복사해서 사용"""
+    target = work / "apply_multi"
+    shutil.rmtree(target, ignore_errors=True)
+    shutil.copytree(repo / "pkg" / "sub_000", target)
+    return target
+
+
+# 이름 -> (도구, 인자 생성 함수(repo, work), 표준 입력)
+SCENARIOS = {
+    'analyze': ('code_assistant', _ca(lambda r, w: ['analyze', r / "pkg/big.py"]), None),
+    'review': ('code_assistant', _ca(lambda r, w: ['review', r / "pkg/big.py"]), None),
+    'bugs': ('code_assistant', _ca(lambda r, w: ['bugs', r / "pkg/big.py"]), None),
+    'explain': ('code_assistant', _ca(lambda r, w: ['explain', r / "pkg/big.py", '--lines', 1, 60]), None),
+    'refactor': ('code_assistant', _ca(lambda r, w: ['refactor', r / "pkg/big.py", '--no-artifacts']), None),
+    'test': ('code_assistant', _ca(lambda r, w: ['test', r / "pkg/big.py", '--no-artifacts']), None),
+    'apply': ('code_assistant', _ca(lambda r, w: ['apply', _apply_target(r, w), '-q', '주석 추가', '--no-backup']),
+              None),
+    'apply-multi': ('code_assistant', _ca(lambda r, w: ['apply', _apply_dir(r, w), '-q', '주석 추가', '--no-backup',
+                                                        '-w', 8]), None),
+    'analyze-dir': ('code_assistant', _ca(lambda r, w: ['analyze-dir', r, '--rebuild', '-w', 8]), None),
+    'analyze-dir-q': ('code_assistant', _ca(lambda r, w: ['analyze-dir', r, '-q', '설정 파일은 어디서 읽나요?',
+                                                         '-w', 8]), None),
+    'batch-review': ('code_assistant', _ca(lambda r, w: ['batch', 'review', f"{r}/pkg/sub_000/*.py", '-w', 8]),
+                     None),
+    'index': ('code_assistant', _ca(lambda r, w: ['index', r]), None),
+    'ask': ('ai', lambda repo, work: ['코드 리뷰는 어떻게 하나요?'], None),
+    'ask-no-stream': ('ai', lambda repo, work: ['--no-stream', '코드 리뷰는 어떻게 하나요?'], None),
+    'chat': ('ai', lambda repo, work: ['--chat'], "안녕하세요\n코드 리뷰는 어떻게 하나요?\nquit\n"),
+    'list-models': ('ai', lambda repo, work: ['--list-models'], None),
+}
+
+
+def read_events(path):
+    if not path.exists():
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run_once(tool, argv, stdin, env, log_path):
+    """명령 한 번 실행 - (종료 코드, 전체 시간 ms, 최대 RSS MB 또는 None, 시작 시각)"""
+    started_at = time.time()
+    started = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        process = subprocess.Popen([sys.executable, str(TOOLS[tool]), *argv], env=env, cwd=ROOT,
+                                   stdin=subprocess.PIPE if stdin else subprocess.DEVNULL,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        if stdin:
+            process.stdin.write(stdin.encode())
+            process.stdin.close()
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss: Linux는 KB, macOS는 byte
+            rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+        else:
+            process.wait()
+            rss = None
+    total = (time.perf_counter() - started) * 1000
+    return process.returncode, total, rss, started_at
+
+
+def metrics_for(events, total_ms, rss, started_at):
+    """timings 기록에서 단계별 시간 계산 (해당 단계가 없으면 None)"""
+    def first(name):
+        return min((e['ts'] for e in events if e['event'] == name), default=None)
+
+    command = first('command')
+    request = first('request')
+    first_token = first('first_token') or first('response')
+    walk = sum(e.get('ms', 0) for e in events if e['event'] == 'walk')
+    walk_before = sum(e.get('ms', 0) for e in events
+                      if e['event'] == 'walk' and (request is None or e['ts'] <= request))
+
+    def ms(start, end):
+        return round((end - start) * 1000, 1) if start is not None and end is not None else None
+
+    prompt_build = ms(command, request)
+    return {
+        'total_ms': round(total_ms, 1),
+        'startup_ms': ms(started_at, command),
+        'walk_ms': round(walk, 1),
+        'prompt_build_ms': round(max(0.0, prompt_build - walk_before), 1) if prompt_build is not None else None,
+        'ttft_ms': ms(request, first_token),
+        'first_output_ms': ms(started_at, first_token),
+        'requests': sum(1 for e in events if e['event'] == 'request'),
+        'peak_rss_mb': round(rss, 1) if rss is not None else None,
+    }
+
+
+def median(runs, key):
+    """성공한 실행(종료 코드 0)만으로 중앙값 계산"""
+    values = [run[key] for run in runs if run['exit_code'] == 0 and run.get(key) is not None]
+    if not values:
+        return None
+    if all(isinstance(value, int) for value in values):
+        return statistics.median_low(values)
+    return round(statistics.median(values), 1)
+
+
+def compare(baseline_path, report):
+    """이전 결과와 중앙값 비교 출력"""
+    with open(baseline_path, encoding='utf-8') as f:
+        # 실패한 실행이 있는 기준 결과는 비교하지 않음
+        baseline = {(r['tool'], r['command'], r['size']): r['median'] for r in json.load(f)['results']
+                    if not any(run.get('exit_code') for run in r['runs'])}
+    print(f"\n📊 비교: {baseline_path}")
+    for result in report['results']:
+        before = baseline.get((result['tool'], result['command'], result['size']))
+        if not before:
+            continue
+        if result['failed']:
+            print(f"  {result['command']:<14} [{result['size']}] ❌ 실패 (비교 안 함)")
+            continue
+        changes = []
+        for key in COMPARE_METRICS:
+            old, new = before.get(key), result['median'].get(key)
+            if old and new is not None:
+                changes.append(f"{key} {new - old:+.1f} ({(new - old) / old * 100:+.0f}%)")
+        print(f"  {result['command']:<14} [{result['size']}] " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokamak AI Bench - 로컬 mock 서버로 CLI 도구 성능 측정")
+    parser.add_argument('--sizes', nargs='+', default=['small', 'medium'], choices=list(SIZES),
+                        help='사용할 저장소 크기 (기본값: small medium)')
+    parser.add_argument('--commands', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS),
+                        help='실행할 명령 (기본값: 전체)')
+    parser.add_argument('-n', '--runs', type=int, default=3, help='명령별 반복 횟수 (기본값: 3)')
+    parser.add_argument('--work-dir', default=str(BENCH_DIR / ".work"),
+                        help='가짜 저장소와 실행 로그를 둘 디렉토리 (기본값: bench/.work)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='결과 JSON 경로 (기본값: bench/results/bench_<시각>.json)')
+    parser.add_argument('--baseline', default=None, help='비교할 이전 결과 JSON')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    config = MockConfig(args.ttft, args.tps, args.tokens, args.chunk_tokens)
+    server, base_url = serve(config)
+    work = Path(args.work_dir).resolve()
+    (work / "logs").mkdir(parents=True, exist_ok=True)
+
+    env = {k: v for k, v in os.environ.items() if not k.startswith('AI_')}
+    env.update({
+        'AI_API_KEY': 'bench',
+        'AI_BASE_URL': base_url,
+        'AI_MODEL': config.models[0],
+        'AI_CACHE_DIR': str(work / "cache" / "responses"),
+        'PYTHONUNBUFFERED': '1',
+    })
+
+    print(f"🧪 Mock server: {base_url} (TTFT {args.ttft}s, {args.tps:g} tokens/s, {args.tokens} tokens)")
+    results = []
+    failures = 0
+    for size in args.sizes:
+        started = time.perf_counter()
+        repo = make_repo(work, size)
+        print(f"\n📁 {size}: {repo} ({SIZES[size][0]}개 모듈, 준비 {time.perf_counter() - started:.1f}s)")
+        for name in args.commands:
+            tool, build_argv, stdin = SCENARIOS[name]
+            runs = []
+            for run in range(args.runs):
+                timings_path = work / "timings.jsonl"
+                timings_path.unlink(missing_ok=True)
+                log_path = work / "logs" / f"{name}_{size}_{run}.log"
+                code, total, rss, started_at = run_once(
+                    tool, build_argv(repo, work), stdin, dict(env, AI_TIMINGS_FILE=str(timings_path)), log_path)
+                metrics = metrics_for(read_events(timings_path), total, rss, started_at)
+                metrics['exit_code'] = code
+                runs.append(metrics)
+                if code != 0:
+                    print(f"  ❌ {name} [{size}] 실패 (종료 코드 {code}, 로그: {log_path})")
+            failed = sum(1 for run in runs if run['exit_code'] != 0)
+            summary = {key: median(runs, key) for key in runs[0] if key != 'exit_code'}
+            results.append({'tool': tool, 'command': name, 'size': size, 'failed': failed,
+                            'median': summary, 'runs': runs})
+            if failed:
+                failures += 1
+            if failed == len(runs):
+                print(f"  ❌ {name:<14} 모든 실행 실패")
+                continue
+            shown = {key: '-' if value is None else value for key, value in summary.items()}
+            status = f"⚠️ ({failed}/{len(runs)} 실패 제외)" if failed else "✅"
+            print(f"  {status} {name:<14} total {shown['total_ms']}ms | walk {shown['walk_ms']}ms | "
+                  f"prompt {shown['prompt_build_ms']}ms | TTFT {shown['ttft_ms']}ms | "
+                  f"RSS {shown['peak_rss_mb']}MB | 요청 {shown['requests']}")
+    server.shutdown()
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'mock': config.as_dict(),
+        'runs_per_command': args.runs,
+        'results': results,
+    }
+    output = Path(args.output) if args.output else \
+        BENCH_DIR / "results" / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 결과 저장: {output}")
+
+    if args.baseline:
+        compare(args.baseline, report)
+
+    if failures:
+        print(f"\n❌ 실패한 명령이 있습니다: {failures}개")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
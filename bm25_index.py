@@ -0,0 +1,134 @@
+"""
+Tokamak AI BM25 Index
+임베딩 서비스 없이 질문과 관련된 코드 조각을 찾기 위한 로컬 BM25 검색 인덱스
+"""
+
+import os
+import re
+import json
+import math
+import hashlib
+from pathlib import Path
+from collections import Counter, namedtuple
+
+from code_chunker import chunk_code
+from context_packer import identifier_terms
+
+INDEX_VERSION = 1
+
+# 검색 단위 조각의 최대 토큰 수
+CHUNK_TOKENS = 400
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+SearchHit = namedtuple('SearchHit', ['path', 'start', 'end', 'name', 'score'])
+
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+def code_terms(text):
+    """검색용 토큰: 식별자를 통째로(소문자) + camelCase/snake_case로 나눈 단어"""
+    terms = identifier_terms(text)
+    for identifier in _IDENTIFIER.findall(text):
+        if len(identifier) > 2 and ('_' in identifier or not identifier.islower()):
+            terms.append(identifier.lower().strip('_'))
+    return terms
+
+
+class BM25Index:
+    """디렉토리의 코드 조각에 대한 BM25 인덱스
+
+    파일별 (해시, 조각별 단어 빈도)를 JSON으로 저장해두고, 해시가 바뀐 파일만 다시 토큰화합니다.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.files = {}
+        self._postings = None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.files = data.get('files', {})
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def path_for(base_dir, directory):
+        directory = Path(directory).resolve()
+        digest = hashlib.sha1(str(directory).encode('utf-8')).hexdigest()[:12]
+        return Path(base_dir) / ".cache" / "bm25" / f"{directory.name or 'root'}_{digest}.json"
+
+    def update(self, directory, hashes):
+        """hashes({상대 경로: 내용 해시}) 기준으로 인덱스 갱신. 반환: 다시 토큰화한 파일 수"""
+        changed = 0
+        for relpath in [p for p in self.files if p not in hashes]:
+            del self.files[relpath]
+            self._postings = None
+        for relpath, file_hash in hashes.items():
+            entry = self.files.get(relpath)
+            if entry and entry['hash'] == file_hash:
+                continue
+            try:
+                with open(Path(directory) / relpath, 'r', encoding='utf-8') as f:
+                    code = f.read()
+            except (OSError, UnicodeDecodeError):
+                self.files.pop(relpath, None)
+                continue
+            chunks = []
+            for chunk in chunk_code(code, Path(relpath).suffix, CHUNK_TOKENS):
+                # 파일 경로도 조각의 내용으로 취급 (경로에 들어간 단어도 검색되도록)
+                tf = Counter(code_terms(relpath) + code_terms(chunk.text))
+                chunks.append([chunk.start, chunk.end, chunk.name, dict(tf)])
+            self.files[relpath] = {'hash': file_hash, 'chunks': chunks}
+            changed += 1
+            self._postings = None
+        return changed
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'files': self.files}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def _build_postings(self):
+        """역색인 만들기: 단어 -> [(조각 번호, 빈도)]"""
+        self._docs = []
+        self._postings = {}
+        total_length = 0
+        for relpath in sorted(self.files):
+            for start, end, name, tf in self.files[relpath]['chunks']:
+                doc_id = len(self._docs)
+                length = sum(tf.values())
+                self._docs.append((relpath, start, end, name, length))
+                total_length += length
+                for term, count in tf.items():
+                    self._postings.setdefault(term, []).append((doc_id, count))
+        self._avg_length = total_length / len(self._docs) if self._docs else 0
+
+    def search(self, query, top_k=20):
+        """질문과 관련도가 높은 조각 top_k개 반환"""
+        if self._postings is None:
+            self._build_postings()
+        if not self._docs:
+            return []
+
+        n_docs = len(self._docs)
+        scores = Counter()
+        for term in set(code_terms(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, count in postings:
+                length = self._docs[doc_id][4]
+                norm = count + BM25_K1 * (1 - BM25_B + BM25_B * length / self._avg_length)
+                scores[doc_id] += idf * count * (BM25_K1 + 1) / norm
+
+        hits = []
+        for doc_id, score in scores.most_common(top_k):
+            relpath, start, end, name, _ = self._docs[doc_id]
+            hits.append(SearchHit(relpath, start, end, name, score))
+        return hits
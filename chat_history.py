@@ -0,0 +1,112 @@
+"""
+Tokamak AI Chat History
+ai.py --chat의 대화 기록을 토큰 예산 안에서 유지하는 도구
+
+- 최근 대화는 그대로 보관
+- 기록이 기준 토큰 수(AI_CHAT_COMPACT_TOKENS)를 넘으면 오래된 대화를 백그라운드에서 요약해서 합침
+- 그래서 대화가 길어져도 매 요청의 크기가 거의 일정하게 유지됨
+"""
+
+import os
+import threading
+
+from token_estimator import estimate_tokens, context_window
+
+# 메시지 하나당 역할/구분자 등으로 붙는 토큰 수
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# 응답용으로 남겨둘 토큰 수
+RESERVED_OUTPUT_TOKENS = 4096
+
+SUMMARY_PROMPT = """다음은 사용자와 AI 어시스턴트의 이전 대화입니다.
+이후 대화를 이어가는 데 필요한 내용(사용자의 목표, 결정된 사항, 중요한 사실/코드/이름, 남은 질문)만 남겨서
+{max_chars}자 이내로 요약해주세요. 요약만 출력하세요.
+
+{previous}[대화]
+{transcript}"""
+
+
+def message_tokens(message):
+    return estimate_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ChatHistory:
+    """요약 + 최근 대화로 구성된 대화 기록
+
+    compact_tokens/keep_tokens를 지정하지 않으면 환경변수 AI_CHAT_COMPACT_TOKENS(기본 8000),
+    AI_CHAT_KEEP_TOKENS(기본 3000)를 사용합니다.
+    """
+
+    def __init__(self, transport, model, compact_tokens=None, keep_tokens=None):
+        self.transport = transport
+        self.model = model
+        self.compact_tokens = int(compact_tokens or os.getenv("AI_CHAT_COMPACT_TOKENS", "8000"))
+        self.keep_tokens = int(keep_tokens or os.getenv("AI_CHAT_KEEP_TOKENS", "3000"))
+        # 요약이 끝나기 전에 기록이 이 크기를 넘으면 요약을 기다림
+        self.hard_limit = max(self.compact_tokens, context_window(model) - RESERVED_OUTPUT_TOKENS)
+        self.summary = ""
+        self.turns = []
+        self._lock = threading.Lock()
+        self._pending = None  # 진행 중인 요약 (concurrent.futures.Future)
+
+    def add(self, role, content):
+        with self._lock:
+            self.turns.append({"role": role, "content": content})
+
+    def tokens(self):
+        with self._lock:
+            return sum(map(message_tokens, self.turns)) + estimate_tokens(self.summary)
+
+    def messages(self):
+        """이번 요청에 보낼 메시지 (요약이 있으면 system 메시지로 앞에 붙임)"""
+        if self._pending and self.tokens() > self.hard_limit:
+            self._wait()
+        with self._lock:
+            messages = list(self.turns)
+            if self.summary:
+                messages.insert(0, {"role": "system", "content": f"[이전 대화 요약]\n{self.summary}"})
+        return messages
+
+    def _wait(self):
+        try:
+            self._pending.result()
+        except Exception:
+            pass  # 요약에 실패하면 다음 턴에 다시 시도
+
+    def maybe_compact(self):
+        """기록이 기준을 넘었으면 오래된 대화의 요약을 백그라운드에서 시작"""
+        with self._lock:
+            if self._pending and not self._pending.done():
+                return
+            total = sum(map(message_tokens, self.turns))
+            if total <= self.compact_tokens:
+                return
+            # 최근 대화를 keep_tokens만큼 남기고 (최소 한 번의 질문/답변) 나머지를 요약
+            kept, keep = 0, 0
+            for message in reversed(self.turns):
+                if keep >= 2 and kept + message_tokens(message) > self.keep_tokens:
+                    break
+                kept += message_tokens(message)
+                keep += 1
+            folded = self.turns[:len(self.turns) - keep]
+            if not folded:
+                return
+            previous = f"[이전 요약]\n{self.summary}\n\n" if self.summary else ""
+
+        transcript = "\n\n".join(f"{m['role']}: {m['content']}" for m in folded)
+        prompt = SUMMARY_PROMPT.format(max_chars=self.keep_tokens * 2, previous=previous, transcript=transcript)
+        self._pending = self.transport.submit(
+            self.transport.acomplete([{"role": "user", "content": prompt}], self.model))
+        self._pending.add_done_callback(lambda future: self._apply(future, len(folded)))
+
+    def _apply(self, future, folded_count):
+        """요약이 끝나면 요약한 대화를 기록에서 빼고 요약을 교체"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        summary = future.result().strip()
+        if not summary:
+            return
+        with self._lock:
+            # 요약하는 동안에는 뒤에만 추가되므로 앞쪽 folded_count개가 요약한 대화
+            del self.turns[:folded_count]
+            self.summary = summary
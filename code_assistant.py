@@ -6,16 +6,50 @@ Tokamak AI Code Assistant with Auto-Save
 
 import os
 import sys
+import glob
+import shutil
+import time
+import threading
 from pathlib import Path
 from datetime import datetime
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import argparse
 
+from transport import get_transport
+from response_cache import ResponseCache, CacheMissError
+from result_writer import ResultWriter
+from dir_manifest import DirectoryManifest
+from context_packer import ContextPacker, rank_files
+from code_chunker import chunk_code, number_lines
+from repo_walker import walk_repository, DEFAULT_EXCLUDES
+from symbol_index import SymbolIndex, SymbolLookupError, find_repo_root
+from bm25_index import BM25Index
+from token_estimator import estimate_tokens, estimate_messages, context_window, calibration, default_calibration_path
+import timings
+from prompt_templates import CHUNK_NOTE, get_template, render, system_message
+from artifacts import ArtifactExtractor, available_path, refactor_path_for, test_path_for
+from edit_blocks import ApplyError, EditBlockError, parse_edit_blocks, apply_edit_blocks, check_syntax
+from hedging import HedgePolicy, default_history_path, print_hedge
+
 load_dotenv()
 
+# 모델 응답을 위해 컨텍스트에서 비워둘 토큰 수
+RESERVED_OUTPUT_TOKENS = 4096
+# analyze-dir 컨텍스트 예산 중 파일별 요약에 쓸 수 있는 최대 비율 (나머지는 소스 코드)
+SUMMARY_BUDGET_RATIO = 0.5
+
+# batch 명령에서 사용할 수 있는 하위 명령 -> CodeAssistant 메서드 이름
+BATCH_COMMANDS = {
+    'analyze': 'analyze_file',
+    'review': 'review_code',
+    'bugs': 'find_bugs',
+    'test': 'generate_tests',
+}
+
 class CodeAssistant:
-    def __init__(self, model=None, save_dir=None):
+    def __init__(self, model=None, save_dir=None, use_cache=True, cache_only=False, workers=4, artifacts=True,
+                 hedge=None):
         self.api_key = os.getenv("AI_API_KEY")
         # print("api_key", self.api_key)
         self.base_url = os.getenv("AI_BASE_URL")
@@ -30,6 +64,9 @@ class CodeAssistant:
             script_dir = Path(__file__).parent
             base_save_dir = script_dir / "analysis"
         
+        self.base_save_dir = base_save_dir
+        self.workers = max(1, workers)
+        
         # 날짜별 폴더 생성 (예: 2026-02-02)
         date_folder = datetime.now().strftime("%Y-%m-%d")
         self.save_dir = base_save_dir / date_folder
@@ -42,25 +79,100 @@ class CodeAssistant:
         if not self.base_url:
             raise ValueError("AI_BASE_URL must be set in .env file")
             
-        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
-        self.current_output = []  # 출력 내용 저장용
-    
-    def _print_and_save(self, text, end='\n'):
-        """출력하면서 동시에 저장"""
-        print(text, end=end, flush=True)
-        self.current_output.append(text + end)
-    
-    def _save_to_file(self, filename, content=None):
-        """파일로 저장"""
-        filepath = self.save_dir / filename
+        # ai.py와 같은 커넥션 풀을 공유하는 호출 계층 (batch/청크 분석 워커 스레드도 같은 풀 사용)
+        self.transport = get_transport(self.api_key, self.base_url)
+        
+        # 응답 캐시 (기본: <저장 디렉토리>/.cache/responses)
+        self.cache_only = cache_only
+        self.cache = None
+        if use_cache or cache_only:
+            cache_dir = os.getenv("AI_CACHE_DIR") or base_save_dir / ".cache" / "responses"
+            self.cache = ResponseCache(
+                cache_dir,
+                max_bytes=int(float(os.getenv("AI_CACHE_MAX_MB", "200")) * 1024 * 1024),
+                max_age_days=float(os.getenv("AI_CACHE_MAX_AGE_DAYS", "30")),
+            )
+        
+        # 저장소 루트 -> 저장소별 고정 컨텍스트
+        self._repo_contexts = {}
         
-        if content is None:
-            content = ''.join(self.current_output)
+        # test/refactor 응답의 코드를 실제 파일로 기록할지, 이번 실행에서 쓰기로 한 경로들 (batch 워커끼리 겹치지 않도록)
+        self.artifacts = artifacts
+        self._artifact_paths = set()
+        self._artifact_lock = threading.Lock()
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+        # 첫 토큰이 늦으면 중복 요청 (hedge: None이면 사용 안 함, 빈 문자열이면 같은 모델, 아니면 대체 모델 이름)
+        # TTFT 기록은 응답 캐시와 같은 위치 (기본: <저장 디렉토리>/.cache/hedge_history.json)
+        self.hedge = None
+        if hedge is not None:
+            self.hedge = HedgePolicy(fallback_model=hedge, path=default_history_path(base_save_dir))
         
-        return filepath
+        # 토큰 추정 보정 비율도 같은 위치 (기본: <저장 디렉토리>/.cache/token_calibration.json)
+        calibration.use_path(default_calibration_path(base_save_dir))
+        
+        # 결과 파일은 스레드별로 분리 (batch 워커끼리 결과가 섞이지 않도록)
+        self._local = threading.local()
+    
+    @property
+    def _sink(self):
+        """현재 스레드의 결과 파일 (명령이 연 파일, 없으면 batch 워커가 연 파일)"""
+        return getattr(self._local, 'sink', None) or getattr(self._local, 'batch_sink', None)
+    
+    def _begin_result(self, filename, save=True):
+        """명령의 결과 파일 열기 (filename이 None이거나 save=False면 출력만 함)"""
+        self.discard_result()  # 이전 명령이 중간에 끝나서 남은 파일 정리
+        self._local.sink = ResultWriter(self.save_dir / filename) if filename and save else None
+    
+    def _commit_result(self):
+        """결과 파일을 원래 이름으로 확정하고 경로 반환"""
+        sink, self._local.sink = self._local.sink, None
+        return sink.commit()
+    
+    def abort_result(self):
+        """중단된 명령의 결과 파일을 .partial로 남기고 그 경로 반환 (없으면 None)"""
+        sink, self._local.sink = getattr(self._local, 'sink', None), None
+        return sink.abort() if sink else None
+    
+    def discard_result(self):
+        """완료되지 않은 결과 파일 삭제 (에러로 일찍 끝난 명령)"""
+        sink, self._local.sink = getattr(self._local, 'sink', None), None
+        if sink:
+            sink.discard()
+    
+    def _print_and_save(self, text, end='\n'):
+        """출력하면서 동시에 결과 파일에 이어쓰기"""
+        if not getattr(self._local, 'quiet', False):
+            print(text, end=end, flush=True)
+        sink = self._sink
+        if sink:
+            sink.write(text + end)
+    
+    def _notice(self, text):
+        """저장하지 않는 안내 메시지 출력"""
+        if not getattr(self._local, 'quiet', False):
+            print(text, flush=True)
+    
+    def _notice_inline(self, text):
+        """줄바꿈 없이 출력 (스트리밍 응답, 진행 상황)"""
+        if not getattr(self._local, 'quiet', False):
+            print(text, end='', flush=True)
+    
+    def _cache_key(self, command, code, extra=None):
+        """명령/모델/프롬프트 버전/파일 내용/추가 입력으로 캐시 키 생성"""
+        if not self.cache:
+            return None
+        return ResponseCache.make_key(command, self.model, get_template(command).version, code, extra)
+    
+    def _report_error(self, message):
+        """에러 출력 및 현재 작업 실패 표시"""
+        self._local.failed = True
+        self._print_and_save(f"❌ {message}")
+    
+    def _save_to_file(self, filename, content):
+        """내용을 한 번에 파일로 저장"""
+        writer = ResultWriter(self.save_dir / filename)
+        writer.write(content)
+        return writer.commit()
     
     def read_file(self, filepath):
         """파일 읽기"""
@@ -70,315 +182,345 @@ class CodeAssistant:
         except Exception as e:
             return f"Error reading file: {e}"
     
-    def get_project_structure(self, directory, max_depth=3, current_depth=0):
-        """프로젝트 구조 가져오기"""
-        if current_depth >= max_depth:
-            return ""
-        
-        structure = []
-        try:
-            path = Path(directory)
-            items = sorted(path.iterdir(), key=lambda x: (not x.is_dir(), x.name))
-            
-            for item in items:
-                if item.name.startswith('.') or item.name in ['node_modules', '__pycache__', 'venv', '.venv', 'dist', 'build']:
-                    continue
-                
-                indent = "  " * current_depth
-                if item.is_dir():
-                    structure.append(f"{indent}📁 {item.name}/")
-                    sub_structure = self.get_project_structure(item, max_depth, current_depth + 1)
-                    if sub_structure:
-                        structure.append(sub_structure)
-                else:
-                    size = item.stat().st_size
-                    size_str = self._format_size(size)
-                    structure.append(f"{indent}📄 {item.name} ({size_str})")
-        except Exception as e:
-            structure.append(f"Error: {e}")
+    def get_project_structure(self, directory, max_depth=3):
+        """프로젝트 구조 가져오기 (.gitignore 적용, 큰 디렉토리는 개수/크기로 요약)"""
+        return walk_repository(directory, max_depth=max_depth).tree
+    
+    def _repo_context(self, path):
+        """저장소별로 고정된 컨텍스트 (저장소 이름과 최상위 구조)
+
+        같은 저장소의 파일들에 대한 요청이 [지시사항 + 이 컨텍스트]까지 같은 접두어를 갖게 됩니다.
+        """
+        root = find_repo_root(path)
+        context = self._repo_contexts.get(root)
+        if context is None:
+            try:
+                with timings.span('walk'):
+                    entries = sorted(
+                        entry.name + ('/' if entry.is_dir() else '')
+                        for entry in os.scandir(root)
+                        if not entry.name.startswith('.') and entry.name not in DEFAULT_EXCLUDES
+                    )
+            except OSError:
+                entries = []
+            context = self._repo_contexts[root] = f"저장소: {root.name}\n최상위 구조: {', '.join(entries[:60])}"
+        return context
+    
+    def _split_target(self, target):
+        """'경로::심볼' 형식을 (경로, 심볼 이름)으로 분리 (심볼이 없으면 None)"""
+        filepath, _, symbol_name = str(target).partition('::')
+        return filepath, symbol_name or None
+    
+    def _output_stem(self, filepath, symbol_name=None):
+        """결과 파일 이름에 쓸 이름 (심볼 지정 시 심볼 이름 포함)"""
+        stem = Path(filepath).stem
+        return f"{stem}_{symbol_name.replace('.', '_')}" if symbol_name else stem
+    
+    def _symbol_index(self, path):
+        root = find_repo_root(path)
+        return SymbolIndex(SymbolIndex.path_for(self.base_save_dir, root), root), root
+    
+    def _symbol_source(self, filepath, code, symbol_name):
+        """심볼 인덱스에서 정의를 찾아 (정의 소스, 위치/상위 정의 설명) 반환"""
+        index, root = self._symbol_index(filepath)
+        relpath = Path(filepath).resolve().relative_to(root).as_posix()
+        symbol = index.lookup(relpath, symbol_name)
         
-        return "\n".join(structure)
+        lines = code.splitlines()
+        snippet = "\n".join(lines[symbol.start - 1:symbol.end])
+        label = f"{filepath}::{symbol.qualname} ({symbol.start}-{symbol.end}줄)"
+        for parent in index.parents(symbol):
+            label += f"\n상위 정의: `{parent.signature}`" + (f" - {parent.docstring}" if parent.docstring else "")
+        self._print_and_save(f"🎯 {symbol.kind} {symbol.qualname} ({symbol.start}-{symbol.end}줄)\n")
+        return snippet, label
     
-    def _format_size(self, size):
-        """파일 크기 포맷팅"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024.0:
-                return f"{size:.1f}{unit}"
-            size /= 1024.0
-        return f"{size:.1f}TB"
+    def build_index(self, directory):
+        """저장소 전체 심볼 인덱스 생성/갱신 (바뀐 파일만 여러 프로세스로 파싱)"""
+        started = time.monotonic()
+        index, root = self._symbol_index(directory)
+        reparsed = index.update(workers=self.workers)
+        print(f"🗂️ 심볼 인덱스 갱신: {root} (다시 파싱한 파일 {reparsed}개, {time.monotonic() - started:.1f}s)")
+        print(f"💾 인덱스 위치: {index.db_path}")
     
     def analyze_file(self, filepath, question=None, save=True):
         """파일 분석"""
-        self.current_output = []
+        self._begin_result(f"analyze_{Path(filepath).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md", save)
         
         self._print_and_save(f"📖 Reading: {filepath}")
         code = self.read_file(filepath)
         
         if code.startswith("Error"):
-            self._print_and_save(f"❌ {code}")
+            self._report_error(code)
             return
         
-        prompt = f"""다음 코드를 분석해주세요:
-
-파일: {filepath}
-
-```
-{code}
-```
-
-"""
-        if question:
-            prompt += f"\n특히 다음에 대해 답변해주세요: {question}"
-        else:
-            prompt += """
-다음 항목들을 분석해주세요:
-1. 코드의 주요 기능과 목적
-2. 코드 품질 (가독성, 유지보수성)
-3. 잠재적인 버그나 개선점
-4. 베스트 프랙티스 준수 여부
-5. 성능 최적화 제안
-"""
+        extra = f"질문: {question}" if question else None
         
         self._print_and_save("\n🤖 AI 분석 중...\n")
-        self._stream_response(prompt)
+        self._respond('analyze', filepath, code, extra, cache_key=self._cache_key('analyze', code, question))
         
         # 저장
         if save:
-            filename = f"analyze_{Path(filepath).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-            saved_path = self._save_to_file(filename)
+            saved_path = self._commit_result()
             print(f"\n\n💾 분석 결과 저장: {saved_path}")
     
-    def analyze_directory(self, directory, question=None, save=True):
-        """디렉토리 전체 분석"""
-        self.current_output = []
+    def analyze_directory(self, directory, question=None, save=True, rebuild=False, top_k=20):
+        """디렉토리 전체 분석 (변경된 파일만 다시 요약하고, 저장된 요약으로 전체 분석)
+
+        질문(-q)이 있으면 BM25 검색으로 질문과 관련된 코드 조각 top_k개만 소스로 보냅니다.
+        """
+        self._begin_result(f"analyze_dir_{Path(directory).name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md", save)
         
         self._print_and_save(f"📁 Analyzing directory: {directory}\n")
         
-        structure = self.get_project_structure(directory)
+        # 한 번의 순회로 프로젝트 구조와 분석 대상 파일(50KB 이하 코드 파일)을 함께 수집
+        with timings.span('walk'):
+            walked = walk_repository(directory)
+        structure = walked.tree
         
-        # 주요 파일들 읽기
-        code_files = []
-        for ext in ['.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.go', '.rs', '.sol']:
-            for filepath in Path(directory).rglob(f'*{ext}'):
-                if any(exclude in str(filepath) for exclude in ['.venv', 'node_modules', '__pycache__']):
-                    continue
-                if filepath.stat().st_size < 50000:  # 50KB 이하만
-                    code_files.append(filepath)
+        # 이전 실행의 매니페스트와 비교해서 추가/변경/삭제된 파일만 다시 요약
+        manifest = DirectoryManifest(
+            DirectoryManifest.path_for(self.base_save_dir, directory),
+            model=self.model,
+            prompt_version=get_template('summary').version,
+        )
+        if rebuild:
+            manifest.files = {}
         
-        files_content = ""
-        for filepath in code_files[:10]:  # 최대 10개 파일
-            content = self.read_file(filepath)
-            if not content.startswith("Error"):
-                files_content += f"\n\n### {filepath.name}\n```\n{content[:2000]}\n```\n"
+        current = {}
+        stats = {}
+        for walked_file in walked.files:
+            relpath = walked_file.relpath
+            current[relpath] = manifest.file_hash(relpath, walked_file.path, walked_file.stat)
+            stats[relpath] = walked_file.stat
         
-        prompt = f"""다음 프로젝트를 분석해주세요:
-
-프로젝트 경로: {directory}
+        added, changed, deleted = manifest.diff(current)
+        for relpath in deleted:
+            manifest.remove(relpath)
+        self._print_and_save(
+            f"🗂️ 파일 {len(current)}개: 추가 {len(added)}, 변경 {len(changed)}, "
+            f"삭제 {len(deleted)}, 그대로 {len(current) - len(added) - len(changed)}\n"
+        )
+        
+        pending = added + changed
+        if pending:
+            if self.cache_only:
+                raise CacheMissError("요약되지 않은 파일이 있습니다 (--cache-only)")
+            self._summarize_files(directory, pending, current, stats, manifest)
+        manifest.save()
+        
+        # 프로젝트 구조와 파일별 요약은 파일이 바뀌기 전까지 고정 -> system 메시지 (질문이 달라도 같은 접두어)
+        header = f"""프로젝트 경로: {directory}
 
 프로젝트 구조:
 ```
 {structure}
 ```
-
-주요 파일들:
-{files_content}
-
 """
+        footer = f"질문: {question}" if question else None
+        
+        # 모델 컨텍스트 크기 안에서 중요한 파일의 요약과 소스를 순서대로 채움
+        fixed = system_message('analyze_dir', header)['content'] + (footer or '')
+        budget = context_window(self.model) - RESERVED_OUTPUT_TOKENS - estimate_tokens(fixed, self.model)
+        ranked = rank_files([
+            {'path': relpath, 'size': stats[relpath].st_size, 'mtime': stats[relpath].st_mtime,
+             'summary': manifest.files[relpath]['summary']}
+            for relpath in manifest.files if relpath in stats
+        ], question)
+        
+        summary_packer = ContextPacker(int(budget * SUMMARY_BUDGET_RATIO), self.model)
+        for candidate in ranked:
+            summary_packer.add(f"\n\n### {candidate['path']}\n{candidate['summary']}")
+        
+        source_packer = ContextPacker(budget - summary_packer.used, self.model)
         if question:
-            prompt += f"\n특히 다음에 대해 답변해주세요: {question}"
+            source_title = "질문과 관련된 코드:"
+            self._pack_relevant_chunks(directory, question, current, source_packer, top_k)
+            source_info = f"관련 코드 조각 {len(source_packer.parts)}개"
         else:
-            prompt += """
-다음 항목들을 분석해주세요:
-1. 프로젝트의 전체적인 구조와 아키텍처
-2. 사용된 기술 스택
-3. 코드 품질과 일관성
-4. 개선 제안사항
-5. 보안 이슈나 잠재적 문제점
-"""
+            source_title = "주요 파일 소스:"
+            for candidate in ranked:
+                if source_packer.remaining < 200:
+                    break
+                content = self.read_file(Path(directory) / candidate['path'])
+                if not content.startswith("Error"):
+                    source_packer.add_file(candidate['path'], content)
+            source_info = f"소스 전체 {source_packer.full_files}개 + 일부 {source_packer.partial_files}개"
+        
+        messages = render('analyze_dir', context=header + "\n파일별 요약:" + summary_packer.text(),
+                          sources=source_title + source_packer.text(), extra=footer)
+        self._print_and_save(f"📦 컨텍스트: 요약 {len(summary_packer.parts)}개, {source_info}")
         
         self._print_and_save("\n🤖 AI 분석 중...\n")
-        self._stream_response(prompt)
+        self._stream_response(messages)
         
         # 저장
         if save:
-            dir_name = Path(directory).name
-            filename = f"analyze_dir_{dir_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-            saved_path = self._save_to_file(filename)
+            saved_path = self._commit_result()
             print(f"\n\n💾 분석 결과 저장: {saved_path}")
     
+    def _pack_relevant_chunks(self, directory, question, hashes, packer, top_k):
+        """BM25 인덱스(변경된 파일만 갱신)에서 질문과 관련된 코드 조각을 찾아 packer에 추가"""
+        index = BM25Index(BM25Index.path_for(self.base_save_dir, directory))
+        if index.update(directory, hashes):
+            index.save()
+        
+        file_lines = {}
+        for hit in index.search(question, top_k):
+            if hit.path not in file_lines:
+                content = self.read_file(Path(directory) / hit.path)
+                file_lines[hit.path] = [] if content.startswith("Error") else content.splitlines()
+            snippet = "\n".join(file_lines[hit.path][hit.start - 1:hit.end])
+            if not snippet:
+                continue
+            where = f"{hit.start}-{hit.end}줄" + (f", {hit.name}" if hit.name else "")
+            packer.add(f"\n\n### {hit.path} ({where})\n```\n{number_lines(snippet, hit.start)}\n```\n")
+    
+    def _summarize_files(self, directory, relpaths, hashes, stats, manifest):
+        """파일별 요약을 동시에 생성해서 매니페스트에 기록 (실패한 파일은 다음 실행에서 재시도)"""
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {
+                pool.submit(self._summarize_file, relpath, Path(directory) / relpath): relpath
+                for relpath in relpaths
+            }
+            for future in as_completed(futures):
+                relpath = futures[future]
+                done += 1
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    self._notice(f"\n⚠️ 요약 실패 ({relpath}): {e}")
+                    manifest.remove(relpath)
+                    continue
+                manifest.update(relpath, hashes[relpath], stats[relpath], summary)
+                if not getattr(self._local, 'quiet', False):
+                    print(f"\r📝 파일 요약 중 [{done}/{len(relpaths)}] {relpath}\033[K", end='', flush=True)
+        self._notice("")
+    
+    def _summarize_file(self, relpath, filepath):
+        """파일 하나를 짧게 요약 (analyze-dir 매니페스트용)"""
+        code = self.read_file(filepath)
+        if code.startswith("Error"):
+            raise OSError(code)
+        
+        messages = render('summary', context=self._repo_context(filepath), path=relpath, code=code)
+        return self._complete(messages).strip()
+    
     def review_code(self, filepath, save=True):
-        """코드 리뷰"""
-        self.current_output = []
+        """코드 리뷰 (경로::함수명 형식이면 해당 정의만 리뷰)"""
+        target = filepath
+        filepath, symbol_name = self._split_target(target)
+        self._begin_result(f"review_{self._output_stem(filepath, symbol_name)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md", save)
         
-        self._print_and_save(f"🔍 Reviewing: {filepath}\n")
+        self._print_and_save(f"🔍 Reviewing: {target}\n")
         code = self.read_file(filepath)
         
         if code.startswith("Error"):
-            self._print_and_save(f"❌ {code}")
+            self._report_error(code)
             return
         
-        prompt = f"""다음 코드를 전문 개발자 관점에서 리뷰해주세요:
-
-파일: {filepath}
-
-```
-{code}
-```
-
-다음 관점에서 리뷰해주세요:
-1. 코드 스타일과 컨벤션
-2. 잠재적 버그
-3. 성능 이슈
-4. 보안 취약점
-5. 테스트 가능성
-6. 구체적인 개선 제안 (코드 예시 포함)
-
-리뷰는 건설적이고 구체적으로 해주세요.
-"""
+        label = None
+        if symbol_name:
+            try:
+                code, label = self._symbol_source(filepath, code, symbol_name)
+            except SymbolLookupError as e:
+                self._report_error(e)
+                return
         
         self._print_and_save("🤖 AI 코드 리뷰 중...\n")
-        self._stream_response(prompt)
+        self._respond('review', filepath, code, cache_key=self._cache_key('review', code, label), label=label)
         
         # 저장
         if save:
-            filename = f"review_{Path(filepath).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-            saved_path = self._save_to_file(filename)
+            saved_path = self._commit_result()
             print(f"\n\n💾 리뷰 결과 저장: {saved_path}")
     
     def refactor_code(self, filepath, instruction=None, save=True):
         """코드 리팩토링"""
-        self.current_output = []
+        self._begin_result(f"refactor_{Path(filepath).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md", save)
         
         self._print_and_save(f"🔧 Refactoring: {filepath}\n")
         code = self.read_file(filepath)
         
         if code.startswith("Error"):
-            self._print_and_save(f"❌ {code}")
+            self._report_error(code)
             return
         
-        prompt = f"""다음 코드를 리팩토링해주세요:
-
-파일: {filepath}
-
-```
-{code}
-```
-
-"""
-        if instruction:
-            prompt += f"\n리팩토링 요구사항: {instruction}\n"
-        else:
-            prompt += """
-다음 원칙에 따라 리팩토링해주세요:
-1. 가독성 향상
-2. 중복 코드 제거
-3. 함수/클래스 분리
-4. 네이밍 개선
-5. 성능 최적화
-
-리팩토링된 전체 코드를 제공해주세요.
-"""
+        messages = render('refactor', context=self._repo_context(filepath), path=filepath, code=code,
+                          extra=f"리팩토링 요구사항: {instruction}" if instruction else None)
         
         self._print_and_save("🤖 AI 리팩토링 중...\n")
-        self._stream_response(prompt)
+        self._stream_response(messages, artifact=self._artifact(refactor_path_for(filepath)))
         
         # 저장
         if save:
-            filename = f"refactor_{Path(filepath).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-            saved_path = self._save_to_file(filename)
+            saved_path = self._commit_result()
             print(f"\n\n💾 리팩토링 결과 저장: {saved_path}")
     
     def explain_code(self, filepath, line_start=None, line_end=None, save=True):
-        """코드 설명"""
-        self.current_output = []
+        """코드 설명 (경로::클래스.메서드 형식이면 해당 정의만 설명)"""
+        target = filepath
+        filepath, symbol_name = self._split_target(target)
+        self._begin_result(f"explain_{self._output_stem(filepath, symbol_name)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md", save)
         
-        self._print_and_save(f"📚 Explaining: {filepath}\n")
+        self._print_and_save(f"📚 Explaining: {target}\n")
         code = self.read_file(filepath)
         
         if code.startswith("Error"):
-            self._print_and_save(f"❌ {code}")
+            self._report_error(code)
             return
         
-        if line_start and line_end:
+        context = ""
+        if symbol_name:
+            try:
+                code, label = self._symbol_source(filepath, code, symbol_name)
+            except SymbolLookupError as e:
+                self._report_error(e)
+                return
+            context = f"위치: {label}\n\n"
+        elif line_start and line_end:
             lines = code.split('\n')
             code = '\n'.join(lines[line_start-1:line_end])
             self._print_and_save(f"Lines {line_start}-{line_end}:\n")
         
-        prompt = f"""다음 코드를 초보자도 이해할 수 있도록 자세히 설명해주세요:
-
-```
-{code}
-```
-
-다음을 포함해서 설명해주세요:
-1. 전체적인 동작 방식
-2. 각 부분의 역할
-3. 사용된 개념/패턴
-4. 주의할 점
-5. 실제 사용 예시
-"""
+        messages = render('explain', context=self._repo_context(filepath), location=context, code=code)
         
         self._print_and_save("🤖 AI 설명 중...\n")
-        self._stream_response(prompt)
+        self._stream_response(messages, cache_key=self._cache_key('explain', code, context or None))
         
         # 저장
         if save:
-            filename = f"explain_{Path(filepath).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-            saved_path = self._save_to_file(filename)
+            saved_path = self._commit_result()
             print(f"\n\n💾 설명 결과 저장: {saved_path}")
     
     def find_bugs(self, filepath, save=True):
         """버그 찾기"""
-        self.current_output = []
+        self._begin_result(f"bugs_{Path(filepath).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md", save)
         
         self._print_and_save(f"🐛 Finding bugs in: {filepath}\n")
         code = self.read_file(filepath)
         
         if code.startswith("Error"):
-            self._print_and_save(f"❌ {code}")
+            self._report_error(code)
             return
         
-        prompt = f"""다음 코드에서 버그나 잠재적 문제를 찾아주세요:
-
-파일: {filepath}
-
-```
-{code}
-```
-
-다음을 찾아주세요:
-1. 논리적 오류
-2. 예외 처리 누락
-3. 메모리 누수 가능성
-4. 경쟁 조건 (race condition)
-5. 보안 취약점
-6. 엣지 케이스 미처리
-
-각 문제에 대해:
-- 문제가 있는 코드 라인
-- 문제 설명
-- 수정 방법
-을 제시해주세요.
-"""
-        
         self._print_and_save("🤖 AI 버그 찾는 중...\n")
-        self._stream_response(prompt)
+        self._respond('bugs', filepath, code, cache_key=self._cache_key('bugs', code))
         
         # 저장
         if save:
-            filename = f"bugs_{Path(filepath).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-            saved_path = self._save_to_file(filename)
+            saved_path = self._commit_result()
             print(f"\n\n💾 버그 분석 결과 저장: {saved_path}")
     
     def generate_tests(self, filepath, save=True):
         """테스트 코드 생성"""
-        self.current_output = []
+        self._begin_result(f"test_{Path(filepath).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md", save)
         
         self._print_and_save(f"🧪 Generating tests for: {filepath}\n")
         code = self.read_file(filepath)
         
         if code.startswith("Error"):
-            self._print_and_save(f"❌ {code}")
+            self._report_error(code)
             return
         
         ext = Path(filepath).suffix
@@ -392,84 +534,47 @@ class CodeAssistant:
         }
         test_framework = lang_map.get(ext, 'appropriate testing framework')
         
-        prompt = f"""다음 코드에 대한 테스트 코드를 작성해주세요:
-
-파일: {filepath}
-
-```
-{code}
-```
-
-{test_framework}를 사용하여:
-1. 단위 테스트 (unit tests)
-2. 엣지 케이스 테스트
-3. 에러 케이스 테스트
-4. 통합 테스트 (필요시)
-
-완전하고 실행 가능한 테스트 코드를 제공해주세요.
-"""
+        messages = render('test', context=self._repo_context(filepath), path=filepath, code=code,
+                          extra=f"테스트 프레임워크: {test_framework}")
         
         self._print_and_save("🤖 AI 테스트 생성 중...\n")
-        self._stream_response(prompt)
+        self._stream_response(messages, cache_key=self._cache_key('test', code, test_framework),
+                              artifact=self._artifact(test_path_for(filepath, find_repo_root(filepath))))
         
         # 저장
         if save:
-            filename = f"test_{Path(filepath).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-            saved_path = self._save_to_file(filename)
+            saved_path = self._commit_result()
             print(f"\n\n💾 테스트 코드 저장: {saved_path}")
     
     def apply_fix(self, filepath, instruction, no_backup=False, save=True):
-        """AI 지시사항에 따라 코드 수정 및 적용"""
-        self.current_output = []
+        """AI 지시사항에 따라 코드 수정 및 적용
+
+        모델에는 바뀌는 부분만 편집 블록으로 받아서 로컬에서 적용하고,
+        블록을 적용할 수 없거나 결과가 문법 검사를 통과하지 못하면 전체 파일 모드로 다시 요청합니다.
+        수정된 코드는 대상 파일 옆의 임시 파일에 쓰고, 검사를 통과해야 원래 파일과 교체합니다.
+        """
+        self._begin_result(None)
         
         self._print_and_save(f"🛠️ Applying fix to: {filepath}")
         code = self.read_file(filepath)
         
         if code.startswith("Error"):
-            self._print_and_save(f"❌ {code}")
+            self._report_error(code)
             return
         
-        prompt = f"""다음 코드를 사용자의 지시사항에 따라 수정해주세요.
-수정된 **전체 코드**만 코드 블록(```) 안에 넣어서 응답해주세요. 불필요한 설명은 제외해주세요.
-
-파일: {filepath}
-
-지시사항: {instruction}
-
-현재 코드:
-```
-{code}
-```
-"""
+        if self.cache_only:
+            raise CacheMissError("apply 명령은 --cache-only 모드에서 사용할 수 없습니다")
         
         self._print_and_save("🤖 AI가 코드를 수정 중...\n")
         
-        # 스트리밍 대신 전체 응답을 한꺼번에 받아서 처리 (코드 추출을 위해)
+        staged = None
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            full_response = response.choices[0].message.content
-            
-            # 코드 블록 추출
-            new_code = self._extract_code(full_response)
-            
-            if not new_code or new_code.strip() == code.strip():
-                self._print_and_save("⚠️ 수정된 내용이 없거나 코드를 추출할 수 없습니다.")
+            staged, full_response = self._stage_fix(filepath, code, instruction)
+            if staged is None:
+                self._print_and_save("⚠️ 수정된 내용이 없습니다.")
                 return
             
-            # 백업 생성
-            if not no_backup:
-                backup_path = Path(filepath).with_suffix(Path(filepath).suffix + ".bak")
-                with open(backup_path, 'w', encoding='utf-8') as f:
-                    f.write(code)
-                self._print_and_save(f"📦 백업 생성됨: {backup_path}")
-            
-            # 파일 쓰기
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(new_code)
-            
+            self._commit_fixes([(filepath, code, staged)], no_backup)
             self._print_and_save(f"✅ 코드가 성공적으로 수정되었습니다: {filepath}")
             
             # 변경 사항 요약 저장
@@ -478,40 +583,482 @@ class CodeAssistant:
                 summary = f"# Code Change Summary\n\n**File:** {filepath}\n**Instruction:** {instruction}\n\n## AI Response\n{full_response}"
                 saved_path = self._save_to_file(filename, content=summary)
                 print(f"💾 변경 이력 저장: {saved_path}")
-                
+        
+        except ApplyError as e:
+            self._print_and_save(f"❌ 수정된 코드를 적용하지 않았습니다: {e}")
         except Exception as e:
-            self._print_and_save(f"❌ Error: {e}")
+            self._report_error(f"Error: {e}")
+        finally:
+            # 적용하지 않은 임시 파일 정리 (교체가 끝났으면 남은 파일이 없음)
+            if staged:
+                staged.discard()
+    
+    def apply_many(self, patterns, instruction, no_backup=False, save=True, workers=4):
+        """여러 파일(디렉토리/glob)에 같은 지시사항을 동시에 적용 - 하나라도 실패하면 아무 파일도 바꾸지 않음
+        
+        파일별 수정 결과를 모두 임시 파일로 만들고 검사한 뒤에 한꺼번에 원래 파일과 교체합니다.
+        """
+        if self.cache_only:
+            raise CacheMissError("apply 명령은 --cache-only 모드에서 사용할 수 없습니다")
+        
+        files = []
+        for pattern in patterns:
+            if Path(pattern).is_dir():
+                with timings.span('walk'):
+                    files.extend(Path(walked.path) for walked in walk_repository(pattern).files)
+            else:
+                files.extend(self.expand_paths([pattern]))
+        files = list({path.resolve(): path for path in files}.values())
+        if not files:
+            print("⚠️ 수정할 파일이 없습니다.")
+            return False
+        
+        print(f"🛠️ Apply: {len(files)}개 파일, 워커 {workers}개")
+        print(f"📝 지시사항: {instruction}\n")
+        
+        def work(filepath):
+            self._local.quiet = True
+            code = self.read_file(filepath)
+            if code.startswith("Error"):
+                raise ApplyError(code)
+            staged, response = self._stage_fix(str(filepath), code, instruction)
+            return code, staged, response
+        
+        changes = []    # (경로, 원래 코드, 임시 파일)
+        responses = {}
+        failures = []
+        unchanged = 0
+        started = time.monotonic()
+        pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            futures = {pool.submit(work, filepath): filepath for filepath in files}
+            for done, future in enumerate(as_completed(futures), 1):
+                filepath = futures[future]
+                if future.cancelled():
+                    continue
+                try:
+                    code, staged, responses[filepath] = future.result()
+                    if staged:
+                        changes.append((filepath, code, staged))
+                    else:
+                        unchanged += 1
+                except Exception as e:
+                    failures.append((filepath, e))
+                    # 하나라도 실패하면 전체를 되돌리므로 아직 시작하지 않은 파일은 취소
+                    for pending in futures:
+                        pending.cancel()
+                print(f"\r🔄 [{done}/{len(files)}] 수정 {len(changes)} 변경 없음 {unchanged} ❌ {len(failures)} "
+                      f"| {time.monotonic() - started:.1f}s | {filepath}\033[K", end='', flush=True)
+            print()
+            
+            if failures:
+                for filepath, e in failures:
+                    print(f"❌ {filepath}: {e}")
+                print(f"\n↩️ {len(failures)}개 파일 실패: 전체 변경을 취소했습니다 (수정된 파일 없음)")
+                return False
+            if not changes:
+                print("\n⚠️ 수정된 내용이 없습니다.")
+                return True
+            
+            self._commit_fixes(changes, no_backup)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            for _, _, staged in changes:
+                staged.discard()
+        
+        print(f"\n✅ {len(changes)}개 파일 수정 완료 (변경 없음 {unchanged}, {time.monotonic() - started:.1f}s)")
+        if save:
+            filename = f"apply_multi_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
+            lines = [f"# Code Change Summary\n\n**Instruction:** {instruction}\n"]
+            for filepath, _, _ in sorted(changes, key=lambda change: str(change[0])):
+                lines.append(f"## {filepath}\n\n{responses[filepath]}\n")
+            saved_path = self._save_to_file(filename, content="\n".join(lines))
+            print(f"💾 변경 이력 저장: {saved_path}")
+        return True
+    
+    def _stage_fix(self, filepath, code, instruction):
+        """파일 하나의 수정 결과를 임시 파일로 만들고 (임시 파일 기록기 또는 변경 없으면 None, 전체 응답) 반환
+        
+        코드를 추출할 수 없거나 문법 검사를 통과하지 못하면 ApplyError
+        """
+        context = self._repo_context(filepath)
+        # 원래 코드에 이미 문법 오류가 있으면 결과 검사를 하지 않음
+        check = check_syntax(filepath, code) is None
+        
+        full_response = self._stream_text(render('apply', context=context, path=filepath, code=code,
+                                                 instruction=instruction))
+        try:
+            blocks = parse_edit_blocks(full_response)
+            new_code = apply_edit_blocks(code, blocks)
+            error = check and check_syntax(filepath, new_code)
+            if error:
+                raise EditBlockError(error)
+        except EditBlockError as e:
+            self._print_and_save(f"⚠️ 편집 블록을 적용할 수 없습니다: {e}")
+            self._print_and_save("🔁 전체 파일 모드로 다시 요청합니다...\n")
+            full_response, staged = self._stream_full_file(
+                render('apply_full', context=context, path=filepath, code=code, instruction=instruction),
+                filepath)
+            if staged is None:
+                raise ApplyError("응답에서 코드를 추출할 수 없습니다")
+            new_code = staged.partial_path.read_text(encoding='utf-8')
+            error = check and check_syntax(filepath, new_code)
+            if error:
+                staged.discard()
+                raise ApplyError(f"수정된 코드가 검사를 통과하지 못했습니다: {error}")
+            if new_code.strip() == code.strip():
+                staged.discard()
+                return None, full_response
+            return staged, full_response
+        
+        if new_code.strip() == code.strip():
+            return None, full_response
+        self._print_and_save(f"✏️ 편집 블록 {len(blocks)}개 적용 (응답 {len(full_response):,}자)")
+        staged = ResultWriter(filepath, suffix=".apply.partial")
+        staged.write(new_code)
+        staged.close()
+        return staged, full_response
+    
+    def _commit_fixes(self, changes, no_backup=False):
+        """임시 파일들을 원래 파일과 교체 - 중간에 실패하면 이미 교체한 파일을 원래 코드로 되돌림
+        
+        changes: (경로, 원래 코드, 임시 파일 기록기) 목록
+        """
+        replaced = []
+        try:
+            for filepath, code, staged in changes:
+                # 백업 생성
+                if not no_backup:
+                    backup_path = Path(filepath).with_suffix(Path(filepath).suffix + ".bak")
+                    with open(backup_path, 'w', encoding='utf-8') as f:
+                        f.write(code)
+                    self._print_and_save(f"📦 백업 생성됨: {backup_path}")
+                
+                # 임시 파일을 원래 파일과 교체 (권한 유지)
+                shutil.copymode(filepath, staged.partial_path)
+                staged.commit()
+                replaced.append((filepath, code))
+        except BaseException:
+            for filepath, code in replaced:
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write(code)
+            if replaced:
+                print(f"↩️ 교체 중 실패: 이미 교체한 {len(replaced)}개 파일을 되돌렸습니다", file=sys.stderr)
+            raise
 
-    def _extract_code(self, text):
-        """텍스트에서 코드 블럭 추출"""
-        import re
-        # ```python ... ``` 또는 ``` ... ``` 형태 추출
-        pattern = r"```(?:[a-zA-Z0-9]+)?\n?(.*?)```"
-        matches = re.findall(pattern, text, re.DOTALL)
-        
-        if matches:
-            # 가장 긴 코드 블록 반환 (보통 전체 코드)
-            return max(matches, key=len).strip()
-        
-        # 코드 블록이 없으면 텍스트 전체(설명이 없을 것을 기대)
-        return text.strip()
+    def expand_paths(self, patterns, files_from=None):
+        """glob 패턴과 파일 목록을 실제 파일 경로 리스트로 변환 (중복 제거)"""
+        candidates = list(patterns)
+        if files_from:
+            with open(files_from, 'r', encoding='utf-8') as f:
+                candidates.extend(line.strip() for line in f if line.strip())
 
-    def _stream_response(self, prompt):
-        """스트리밍 응답"""
+        with timings.span('walk'):
+            return self._expand(candidates)
+
+    def _expand(self, candidates):
+        seen = set()
+        files = []
+        for pattern in candidates:
+            matches = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+            for match in sorted(matches):
+                path = Path(match)
+                if not path.is_file():
+                    continue
+                key = path.resolve()
+                if key not in seen:
+                    seen.add(key)
+                    files.append(path)
+        return files
+
+    def _batch_result_name(self, filepath):
+        """batch 결과 파일명 (다른 폴더의 같은 파일명이 겹치지 않도록 상대 경로 사용)"""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                stream=True
-            )
-            
-            for chunk in response:
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    self._print_and_save(content, end='')
+            relative = Path(filepath).resolve().relative_to(Path.cwd())
+        except ValueError:
+            relative = Path(filepath).resolve().relative_to(Path(filepath).resolve().anchor)
+        return "__".join(relative.parts) + ".md"
+
+    def run_batch(self, command, patterns, workers=4, question=None, files_from=None):
+        """여러 파일에 대해 명령을 동시에 실행하고 파일별 결과를 저장"""
+        if command not in BATCH_COMMANDS:
+            raise ValueError(f"batch에서 지원하지 않는 명령입니다: {command} (가능: {', '.join(BATCH_COMMANDS)})")
+
+        files = self.expand_paths(patterns, files_from)
+        if not files:
+            print("⚠️ 처리할 파일이 없습니다.")
+            return []
+
+        method = getattr(self, BATCH_COMMANDS[command])
+        out_dir = self.save_dir / f"batch_{command}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        print(f"🚀 Batch {command}: {len(files)}개 파일, 워커 {workers}개")
+        print(f"📁 결과 저장 위치: {out_dir}\n")
+
+        def work(filepath):
+            self._local.quiet = True
+            self._local.failed = False
+            kwargs = {'save': False}
+            if command == 'analyze':
+                kwargs['question'] = question
+            sink = self._local.batch_sink = ResultWriter(out_dir / self._batch_result_name(filepath))
+            try:
+                method(str(filepath), **kwargs)
+            except CacheMissError:
+                sink.discard()  # 받은 응답이 없으므로 남길 결과도 없음
+                raise
+            except BaseException:
+                sink.abort()
+                raise
+            finally:
+                self._local.batch_sink = None
+            sink.commit()
+            return not self._local.failed
+
+        results = []
+        succeeded = failed = 0
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(work, filepath): filepath for filepath in files}
+            for future in as_completed(futures):
+                filepath = futures[future]
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    ok = False
+                    print(f"\n❌ {filepath}: {e}")
+
+                if ok:
+                    succeeded += 1
+                else:
+                    failed += 1
+                results.append((filepath, ok))
+
+                elapsed = time.monotonic() - started
+                print(f"\r🔄 [{succeeded + failed}/{len(files)}] ✅ {succeeded} ❌ {failed} | {elapsed:.1f}s | {filepath}\033[K",
+                      end='', flush=True)
+
+        elapsed = time.monotonic() - started
+        summary_lines = [f"# Batch {command} Summary\n"]
+        for filepath, ok in sorted(results, key=lambda r: str(r[0])):
+            summary_lines.append(f"- {'✅' if ok else '❌'} `{filepath}` → {self._batch_result_name(filepath)}")
+        with open(out_dir / "_summary.md", 'w', encoding='utf-8') as f:
+            f.write("\n".join(summary_lines) + "\n")
+
+        print(f"\n\n📊 완료: {len(files)}개 중 성공 {succeeded}, 실패 {failed} ({elapsed:.1f}s)")
+        print(f"💾 결과 저장: {out_dir}")
+        return results
+
+    def _respond(self, command, filepath, code, extra=None, cache_key=None, label=None):
+        """파일 하나에 대한 응답 (컨텍스트에 안 들어가는 큰 파일은 나눠서 분석 후 합침)"""
+        context = self._repo_context(filepath)
+        messages = render(command, context=context, path=label or filepath, code=code, extra=extra)
+        chunk_tokens = self._chunk_budget(messages[0]['content'] + (extra or ''))
+        if estimate_tokens(code, self.model) <= chunk_tokens:
+            self._stream_response(messages, cache_key=cache_key)
+        else:
+            self._map_reduce(command, filepath, code, extra, chunk_tokens, context, cache_key=cache_key)
+    
+    def _chunk_budget(self, fixed_text):
+        """코드 한 덩어리에 쓸 수 있는 토큰 수 (AI_CHUNK_TOKENS로 더 작게 제한 가능)"""
+        budget = context_window(self.model) - RESERVED_OUTPUT_TOKENS - estimate_tokens(fixed_text, self.model) - 200
+        limit = os.getenv("AI_CHUNK_TOKENS")
+        if limit:
+            budget = min(budget, int(limit))
+        return max(500, budget)
+    
+    def _map_reduce(self, command, filepath, code, extra, chunk_tokens, context, cache_key=None):
+        """큰 파일: 함수/클래스 경계로 나눠 동시에 분석(map)한 뒤 하나의 보고서로 합침(reduce)"""
+        if self._replay_cached(cache_key):
+            return
+        if self.cache_only:
+            raise CacheMissError("캐시에 저장된 응답이 없습니다 (--cache-only)")
+        
+        chunks = chunk_code(code, Path(filepath).suffix, chunk_tokens,
+                            estimate=lambda text: estimate_tokens(text, self.model))
+        total_lines = len(code.splitlines())
+        self._print_and_save(f"📚 큰 파일 (약 {estimate_tokens(code, self.model):,} 토큰): {len(chunks)}개 부분으로 나누어 동시에 분석합니다.\n")
+        
+        system = system_message(command, context)
+        
+        def analyze_chunk(index, chunk):
+            where = f"{chunk.start}-{chunk.end}줄" + (f", {chunk.name}" if chunk.name else "")
+            user = CHUNK_NOTE.format(path=filepath, total_lines=total_lines, index=index, count=len(chunks),
+                                     where=where, code=number_lines(chunk.text, chunk.start))
+            if extra:
+                user += "\n\n" + extra
+            result = self._complete([system, {"role": "user", "content": user}])
+            return f"## 부분 {index}/{len(chunks)} ({where})\n\n{result.strip()}"
+        
+        partials = [None] * len(chunks)
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(analyze_chunk, i + 1, chunk): i for i, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                try:
+                    partials[futures[future]] = future.result()
+                except Exception as e:
+                    self._report_error(f"부분 {futures[future] + 1} 분석 실패: {e}")
+                    return
+                done += 1
+                if not getattr(self._local, 'quiet', False):
+                    print(f"\r🧩 부분 분석 [{done}/{len(chunks)}]\033[K", end='', flush=True)
+        self._notice("\n")
+        
+        request = get_template(command).system + (f"\n\n{extra}" if extra else "")
+        messages = render('reduce', context=context, path=filepath, total_lines=total_lines,
+                          request=request, partials="\n\n".join(partials))
+        self._stream_response(messages, cache_key=cache_key)
+    
+    def _preflight(self, messages, show=True):
+        """보내기 전에 로컬에서 프롬프트 크기 추정 (모델 한도를 넘을 것 같으면 경고, show=False면 경고만)"""
+        tokens = estimate_messages(messages, self.model)
+        window = context_window(self.model)
+        if tokens > window - RESERVED_OUTPUT_TOKENS:
+            self._notice(f"⚠️ 프롬프트가 모델 한도를 넘을 수 있습니다: 약 {tokens:,} 토큰 / 컨텍스트 {window:,} "
+                         f"(응답용 {RESERVED_OUTPUT_TOKENS:,} 토큰 제외)")
+        elif show:
+            self._notice(f"📏 프롬프트 약 {tokens:,} 토큰 / 컨텍스트 {window:,}")
+        return tokens
+    
+    def _hedge_options(self):
+        """transport.stream에 넘길 중복 요청 옵션 (--hedge를 쓰지 않으면 빈 dict)"""
+        if self.hedge is None:
+            return {}
+        quiet = getattr(self._local, 'quiet', False)
+        return {'hedge': self.hedge, 'on_hedge': None if quiet else print_hedge}
+    
+    def _complete(self, messages):
+        """스트리밍 없이 전체 응답 텍스트 반환"""
+        self._preflight(messages, show=False)
+        return self.transport.complete(messages, self.model)
+    
+    def _stream_text(self, messages):
+        """스트리밍으로 받으면서 출력하고 전체 응답 텍스트 반환 (결과 파일/캐시에는 쓰지 않음)"""
+        self._preflight(messages)
+        parts = []
+        for content in self.transport.stream(messages, self.model, **self._hedge_options()):
+            parts.append(content)
+            self._notice_inline(content)
+        self._notice("")
+        return ''.join(parts)
+    
+    def _stream_full_file(self, messages, filepath):
+        """전체 파일 모드: 스트리밍으로 받으면서 코드 블록 내용을 대상 파일 옆의 임시 파일에 바로 기록
+        
+        (전체 응답, 가장 긴 닫힌 코드 블록의 임시 파일 기록기) 반환.
+        응답에 코드 블록이 없으면 응답 전체를 코드로 보고, 닫히지 않은 블록(잘린 응답)은 버림.
+        """
+        self._preflight(messages)
+        extractor = ArtifactExtractor(filepath, tag='apply')
+        parts = []
+        shown = 0
+        try:
+            for content in self.transport.stream(messages, self.model, **self._hedge_options()):
+                parts.append(content)
+                extractor.feed(content)
+                if extractor.lines and extractor.lines != shown:
+                    shown = extractor.lines
+                    self._notice_inline(f"\r✍️ 코드 수신 중: {shown:,}줄\033[K")
+            staged = extractor.finish()
+        except BaseException:
+            extractor.discard()
+            raise
+        self._notice("")
+        
+        response = ''.join(parts)
+        if extractor.truncated:
+            self._print_and_save(f"⚠️ 코드 블록이 닫히지 않았습니다 (응답이 잘렸을 수 있음): {extractor.truncated:,}줄 버림")
+        if not extractor.opened and response.strip():
+            staged = ResultWriter(filepath, suffix=".apply.partial")
+            staged.write(response.strip() + "\n")
+            staged.close()
+        return response, staged
+    
+    def _artifact(self, path):
+        """응답의 코드를 기록할 추출기 (기존 파일은 덮어쓰지 않고 옆에 새 이름으로, artifacts=False면 None)"""
+        if not self.artifacts:
+            return None
+        with self._artifact_lock:
+            path = available_path(path, self._artifact_paths)
+            self._artifact_paths.add(path)
+        return ArtifactExtractor(path)
+    
+    def _save_artifact(self, extractor):
+        """응답이 끝난 뒤 추출한 코드를 검사하고 목적지 파일로 확정"""
+        writer = extractor.finish()
+        if writer is None:
+            reason = f"코드 블록이 닫히지 않았습니다 ({extractor.truncated:,}줄)" if extractor.truncated \
+                else "응답에 코드 블록이 없습니다"
+            self._print_and_save(f"⚠️ 코드 파일을 만들지 않았습니다: {reason}")
+            return
+        error = check_syntax(writer.path, writer.partial_path.read_text(encoding='utf-8'))
+        if error:
+            writer.discard()
+            self._print_and_save(f"⚠️ 코드 파일을 만들지 않았습니다: {error}")
+            return
+        self._print_and_save(f"📄 코드 파일 생성: {writer.commit()}")
+    
+    def _replay_cached(self, cache_key, artifact=None):
+        """캐시 적중 시 저장된 응답을 출력하고 True 반환"""
+        if not cache_key:
+            return False
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return False
+        self._notice("⚡ 캐시된 응답을 사용합니다.\n")
+        self._print_and_save(cached, end='')
+        self._print_and_save("\n")
+        if artifact:
+            artifact.feed(cached)
+            self._save_artifact(artifact)
+        return True
+    
+    def _stream_response(self, messages, cache_key=None, artifact=None):
+        """스트리밍 응답 (cache_key가 있으면 캐시 적중 시 저장된 응답을 바로 재생)
+        
+        artifact(ArtifactExtractor)를 주면 응답의 코드 블록을 받는 대로 목적지 옆 임시 파일에 쓰고,
+        응답이 끝나면 검사 후 목적지 파일로 확정합니다.
+        """
+        if self._replay_cached(cache_key, artifact):
+            return
+        
+        if self.cache_only:
+            raise CacheMissError("캐시에 저장된 응답이 없습니다 (--cache-only)")
+        
+        self._preflight(messages)
+        # 응답은 결과 파일과 캐시에 받는 대로 이어쓰기 (전체 응답을 메모리에 모으지 않음)
+        cache_writer = self.cache.writer(cache_key, model=self.model) if cache_key else None
+        try:
+            for content in self.transport.stream(messages, self.model, **self._hedge_options()):
+                self._print_and_save(content, end='')
+                if cache_writer:
+                    cache_writer.write(content)
+                if artifact:
+                    artifact.feed(content)
             self._print_and_save("\n")
         except Exception as e:
-            self._print_and_save(f"❌ Error: {e}")
+            if cache_writer:
+                cache_writer.discard()
+            if artifact:
+                artifact.discard()
+            self._report_error(f"Error: {e}")
+            return
+        except BaseException:
+            if cache_writer:
+                cache_writer.discard()
+            if artifact:
+                artifact.discard()
+            raise
+        
+        if cache_writer:
+            if cache_writer.empty:
+                cache_writer.discard()
+            else:
+                cache_writer.commit()
+        if artifact:
+            self._save_artifact(artifact)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -534,18 +1081,35 @@ def main():
   
   # 코드 리뷰
   python code_assistant.py review app.py
+  
+  # 특정 함수/메서드만 설명, 리뷰 (심볼 인덱스 사용)
+  python code_assistant.py explain app.py::AIService.chat_stream
+  python code_assistant.py review app.py::chat
+  python code_assistant.py index .
+  
+  # 여러 파일 동시 리뷰 (glob 또는 파일 목록, 워커 8개)
+  python code_assistant.py batch review "src/**/*.py" -w 8
+  python code_assistant.py batch bugs --files-from changed_files.txt
+  
+  # 여러 파일에 같은 수정을 한 번에 적용 (하나라도 실패하면 전체 취소)
+  python code_assistant.py apply src/handlers -q "print 대신 logger를 사용하도록 수정해줘"
+  python code_assistant.py apply "src/**/*.py" -q "타입 힌트 추가" -w 8
+  
+  # 캐시된 응답만 사용 (CI 등에서 캐시에 없으면 즉시 실패)
+  python code_assistant.py review app.py --cache-only
         """
     )
     
     parser.add_argument(
         'command',
-        choices=['analyze', 'analyze-dir', 'review', 'refactor', 'explain', 'bugs', 'test', 'apply'],
+        choices=['analyze', 'analyze-dir', 'review', 'refactor', 'explain', 'bugs', 'test', 'apply', 'batch', 'index'],
         help='실행할 명령'
     )
     
     parser.add_argument(
         'path',
-        help='분석할 파일 또는 디렉토리 경로'
+        nargs='*',
+        help='분석할 파일 또는 디렉토리 경로 (batch: 하위 명령 다음에 glob/파일 목록)'
     )
     
     parser.add_argument(
@@ -590,18 +1154,92 @@ def main():
         help='수정 전 백업 파일을 생성하지 않음'
     )
     
+    parser.add_argument(
+        '--no-artifacts',
+        action='store_true',
+        help='test/refactor 결과의 코드를 실제 파일(tests/test_<이름>.py, <이름>_refactored.py)로 만들지 않음'
+    )
+    
+    parser.add_argument(
+        '--hedge',
+        action='store_true',
+        help='첫 토큰이 최근 TTFT의 95백분위수보다 늦으면 중복 요청하고 먼저 응답한 쪽 사용'
+    )
+    
+    parser.add_argument(
+        '--hedge-model',
+        default=None,
+        help='--hedge의 중복 요청에 사용할 대체 모델 (기본값: 같은 모델)'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='응답 캐시를 사용하지 않음'
+    )
+    
+    parser.add_argument(
+        '--cache-only',
+        action='store_true',
+        help='캐시된 응답만 사용 (캐시에 없으면 AI를 호출하지 않고 즉시 실패)'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=4,
+        help='동시에 처리할 파일 수 (batch, apply, analyze-dir 요약에서 사용, 기본값: 4)'
+    )
+    
+    parser.add_argument(
+        '-k', '--top-k',
+        type=int,
+        default=20,
+        help='질문과 관련된 코드 조각을 최대 몇 개 보낼지 (analyze-dir -q에서 사용, 기본값: 20)'
+    )
+    
+    parser.add_argument(
+        '--rebuild',
+        action='store_true',
+        help='이전 요약을 무시하고 모든 파일을 다시 요약 (analyze-dir에서 사용)'
+    )
+    
+    parser.add_argument(
+        '--files-from',
+        default=None,
+        help='처리할 파일 경로 목록 파일 (batch에서 사용, 한 줄에 하나)'
+    )
+    
     args = parser.parse_args()
     
+    if args.command == 'batch':
+        if not args.path or args.path[0] not in BATCH_COMMANDS:
+            parser.error(f"batch 명령은 하위 명령이 필요합니다: {', '.join(BATCH_COMMANDS)}")
+        if len(args.path) < 2 and not args.files_from:
+            parser.error("batch 명령은 glob 패턴/파일 경로 또는 --files-from 이 필요합니다")
+    elif args.command == 'apply':
+        if not args.path:
+            parser.error("apply 명령은 파일, 디렉토리 또는 glob 패턴이 필요합니다")
+    elif len(args.path) != 1:
+        parser.error(f"'{args.command}' 명령은 경로를 하나만 받습니다")
+    else:
+        args.path = args.path[0]
+    
+    assistant = None
     try:
-        assistant = CodeAssistant(model=args.model, save_dir=args.save_dir)
+        assistant = CodeAssistant(model=args.model, save_dir=args.save_dir,
+                                  use_cache=not args.no_cache, cache_only=args.cache_only,
+                                  workers=args.workers, artifacts=not args.no_artifacts,
+                                  hedge=(args.hedge_model or '') if args.hedge else None)
         save = not args.no_save
         
         print(f"📁 분석 결과 저장 위치: {assistant.save_dir}\n")
+        timings.record('command', command=args.command)
         
         if args.command == 'analyze':
             assistant.analyze_file(args.path, args.question, save=save)
         elif args.command == 'analyze-dir':
-            assistant.analyze_directory(args.path, args.question, save=save)
+            assistant.analyze_directory(args.path, args.question, save=save, rebuild=args.rebuild, top_k=args.top_k)
         elif args.command == 'review':
             assistant.review_code(args.path, save=save)
         elif args.command == 'refactor':
@@ -619,11 +1257,39 @@ def main():
             if not args.question:
                 print("❌ 'apply' 명령은 -q (질문/지시) 옵션이 필수입니다.", file=sys.stderr)
                 sys.exit(1)
-            assistant.apply_fix(args.path, args.question, no_backup=args.no_backup, save=save)
+            # 파일 하나면 그대로 적용, 디렉토리/glob/여러 파일이면 전체를 한 번에 적용하거나 모두 취소
+            if len(args.path) == 1 and Path(args.path[0]).is_file():
+                assistant.apply_fix(args.path[0], args.question, no_backup=args.no_backup, save=save)
+            elif not assistant.apply_many(args.path, args.question, no_backup=args.no_backup, save=save,
+                                          workers=args.workers):
+                sys.exit(1)
+        elif args.command == 'index':
+            assistant.build_index(args.path)
+        elif args.command == 'batch':
+            results = assistant.run_batch(args.path[0], args.path[1:], workers=args.workers,
+                                          question=args.question, files_from=args.files_from)
+            if any(not ok for _, ok in results):
+                sys.exit(1)
+        
+        # 에러로 일찍 끝나서 확정되지 않은 결과 파일 정리
+        assistant.discard_result()
     
-    except Exception as e:
+    except CacheMissError as e:
+        # --cache-only 캐시 미스: 받은 응답이 없으므로 결과 파일을 남기지 않음
+        if assistant:
+            assistant.discard_result()
         print(f"❌ Error: {e}", file=sys.stderr)
         sys.exit(1)
+    except (Exception, KeyboardInterrupt) as e:
+        # 중단된 경우 지금까지 받은 결과는 .partial 파일로 남김
+        partial = assistant.abort_result() if assistant else None
+        if isinstance(e, KeyboardInterrupt):
+            print("\n\n⚠️ 중단되었습니다.", file=sys.stderr)
+        else:
+            print(f"❌ Error: {e}", file=sys.stderr)
+        if partial:
+            print(f"💾 지금까지의 결과: {partial}", file=sys.stderr)
+        sys.exit(130 if isinstance(e, KeyboardInterrupt) else 1)
 
 if __name__ == "__main__":
     main()
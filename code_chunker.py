@@ -0,0 +1,259 @@
+"""
+Tokamak AI Code Chunker
+소스 코드를 최상위 정의(함수/클래스 등) 단위로 나누는 도구
+"""
+
+import re
+import ast
+from collections import namedtuple
+
+# start/end는 1부터 시작하는 줄 번호 (end 포함)
+CodeBlock = namedtuple('CodeBlock', ['start', 'end', 'name', 'text'])
+
+# 중괄호 기반 언어
+BRACE_LANGUAGES = {'.js', '.jsx', '.ts', '.tsx', '.mjs', '.cjs', '.sol', '.java', '.go', '.rs', '.c', '.h', '.cpp', '.hpp', '.cs', '.kt', '.swift'}
+
+_DEF_NAME = re.compile(
+    r'\b(?:function\*?|class|contract|interface|library|struct|enum|trait|impl|fn|func|modifier|event|type)\s+([A-Za-z_$][\w$]*)'
+    r'|\b(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*='
+)
+_COMMENT_OR_DECORATOR = re.compile(r'^\s*(?://|/\*|\*|@|#\[|$)')
+
+
+def split_top_level(code, suffix):
+    """코드를 최상위 블록 목록으로 분리
+
+    블록은 파일 전체를 빠짐없이 순서대로 덮습니다 (블록 사이의 주석/import도 어딘가에 포함).
+    분리할 수 없는 언어나 파싱 실패 시 파일 전체를 블록 하나로 반환합니다.
+    """
+    lines = code.splitlines(keepends=True)
+    if not lines:
+        return []
+    if suffix == '.py':
+        blocks = _split_python(code, lines)
+    elif suffix in BRACE_LANGUAGES:
+        blocks = _split_braces(lines)
+    else:
+        blocks = None
+    return blocks or [CodeBlock(1, len(lines), None, code)]
+
+
+def _make_block(lines, start, end, name):
+    return CodeBlock(start, end, name, ''.join(lines[start - 1:end]))
+
+
+def _split_python(code, lines):
+    """Python: ast로 최상위 문장 위치를 찾아 정의 단위로 분리"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    blocks = []
+    start = 1
+    pending_simple = False  # import/대입 등 정의가 아닌 문장이 모여 있는 중인지
+    for node in tree.body:
+        is_def = isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        node_start = min([d.lineno for d in getattr(node, 'decorator_list', [])] + [node.lineno])
+        if is_def:
+            if pending_simple and node_start - 1 >= start:
+                blocks.append(_make_block(lines, start, node_start - 1, None))
+                start = node_start
+            blocks.append(_make_block(lines, start, node.end_lineno, node.name))
+            start = node.end_lineno + 1
+            pending_simple = False
+        else:
+            pending_simple = True
+
+    if start <= len(lines):
+        if blocks and not pending_simple:
+            # 마지막 정의 뒤의 빈 줄/주석은 마지막 블록에 붙임
+            last = blocks.pop()
+            blocks.append(_make_block(lines, last.start, len(lines), last.name))
+        else:
+            blocks.append(_make_block(lines, start, len(lines), None))
+    return blocks
+
+
+def scan_depth(line, depth, state):
+    """한 줄을 읽으면서 문자열/주석을 건너뛰고 중괄호 깊이 계산
+
+    state는 여러 줄에 걸친 주석/템플릿 문자열 상태 ('' / 'block' / '`')
+    반환: (새 깊이, 새 상태, 이 줄에서 연 중괄호가 있었는지)
+    """
+    opened = False
+    i = 0
+    n = len(line)
+    while i < n:
+        ch = line[i]
+        if state == 'block':
+            end = line.find('*/', i)
+            if end < 0:
+                return depth, state, opened
+            state = ''
+            i = end + 2
+            continue
+        if state == '`':
+            if ch == '\\':
+                i += 2
+                continue
+            if ch == '`':
+                state = ''
+            i += 1
+            continue
+        if ch == '/' and line.startswith('//', i):
+            break
+        if ch == '/' and line.startswith('/*', i):
+            state = 'block'
+            i += 2
+            continue
+        if ch in '"\'':
+            j = i + 1
+            while j < n and line[j] != ch:
+                j += 2 if line[j] == '\\' else 1
+            i = j + 1
+            continue
+        if ch == '`':
+            state = '`'
+        elif ch == '{':
+            depth += 1
+            opened = True
+        elif ch == '}':
+            depth = max(0, depth - 1)
+        i += 1
+    return depth, state, opened
+
+
+def _block_name(text):
+    for line in text.splitlines():
+        if _COMMENT_OR_DECORATOR.match(line):
+            continue
+        match = _DEF_NAME.search(line)
+        if match:
+            return match.group(1) or match.group(2)
+        return None
+    return None
+
+
+def _split_braces(lines):
+    """중괄호 언어: 깊이 0으로 돌아오는 지점에서 최상위 블록을 끊음"""
+    blocks = []
+    depth = 0
+    state = ''
+    start = 1
+    braced = False  # 현재 블록이 중괄호 블록을 포함하는지
+
+    for idx, line in enumerate(lines, 1):
+        if depth == 0 and state == '' and not braced and idx > start and '{' in line:
+            # 단순 문장(import 등)이 모인 블록 뒤에 새 정의가 시작되면 앞 블록을 끊되,
+            # 바로 앞의 주석/데코레이터 줄은 새 정의 쪽으로 넘김
+            split = idx
+            while split > start and _COMMENT_OR_DECORATOR.match(lines[split - 2]):
+                split -= 1
+            if split > start:
+                blocks.append(_make_block(lines, start, split - 1, None))
+                start = split
+
+        depth, state, opened = scan_depth(line, depth, state)
+        braced = braced or opened
+        if depth == 0 and state == '' and braced:
+            block = _make_block(lines, start, idx, None)
+            blocks.append(block._replace(name=_block_name(block.text)))
+            start = idx + 1
+            braced = False
+
+    if start <= len(lines):
+        blocks.append(_make_block(lines, start, len(lines), None))
+    return blocks
+
+
+def chunk_code(code, suffix, max_tokens, estimate=None):
+    """최상위 블록을 max_tokens 이하의 청크로 묶음
+
+    블록 하나가 max_tokens보다 크면 Python 클래스는 메서드 단위로, 그 외에는
+    빈 줄을 우선으로 줄 단위로 다시 나눕니다. 반환 청크도 CodeBlock이며 줄 번호는 파일 기준입니다.
+    """
+    if estimate is None:
+        from token_estimator import estimate_tokens as estimate
+
+    pieces = []
+    for block in split_top_level(code, suffix):
+        if estimate(block.text) <= max_tokens:
+            pieces.append(block)
+        else:
+            pieces.extend(_split_oversized(block, suffix, max_tokens, estimate))
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        tokens = estimate(piece.text)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(_merge(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append(_merge(current))
+    return chunks
+
+
+def _merge(blocks):
+    names = list(dict.fromkeys(b.name for b in blocks if b.name))
+    name = names[0] if len(names) == 1 else (f"{names[0]} … {names[-1]}" if names else None)
+    return CodeBlock(blocks[0].start, blocks[-1].end, name, ''.join(b.text for b in blocks))
+
+
+def _split_oversized(block, suffix, max_tokens, estimate):
+    """너무 큰 블록 분리 (Python 클래스는 멤버 경계, 나머지는 줄 단위)"""
+    lines = block.text.splitlines(keepends=True)
+    if suffix == '.py':
+        try:
+            tree = ast.parse(block.text)
+        except SyntaxError:
+            tree = None
+        if tree and tree.body and isinstance(tree.body[-1], ast.ClassDef) and len(tree.body[-1].body) > 1:
+            members = tree.body[-1].body
+            bounds = [1] + [min([d.lineno for d in getattr(m, 'decorator_list', [])] + [m.lineno]) for m in members[1:]]
+            parts = []
+            for i, start in enumerate(bounds):
+                end = bounds[i + 1] - 1 if i + 1 < len(bounds) else len(lines)
+                member = getattr(members[i], 'name', None) if i else None
+                name = f"{block.name}.{member}" if member else block.name
+                sub = CodeBlock(block.start + start - 1, block.start + end - 1, name, ''.join(lines[start - 1:end]))
+                if estimate(sub.text) <= max_tokens:
+                    parts.append(sub)
+                else:
+                    parts.extend(_split_lines(sub, max_tokens, estimate))
+            return parts
+    return _split_lines(block, max_tokens, estimate)
+
+
+def _split_lines(block, max_tokens, estimate):
+    """줄 단위로 나누되, 가능하면 빈 줄에서 끊음"""
+    lines = block.text.splitlines(keepends=True)
+    parts = []
+    start = 0
+    tokens = 0
+    last_blank = None
+    for i, line in enumerate(lines):
+        line_tokens = estimate(line)
+        if tokens + line_tokens > max_tokens and i > start:
+            cut = last_blank + 1 if last_blank is not None and last_blank > start else i
+            parts.append(CodeBlock(block.start + start, block.start + cut - 1, block.name, ''.join(lines[start:cut])))
+            start = cut
+            tokens = sum(estimate(l) for l in lines[start:i])
+            last_blank = None
+        tokens += line_tokens
+        if not line.strip():
+            last_blank = i
+    if start < len(lines):
+        parts.append(CodeBlock(block.start + start, block.start + len(lines) - 1, block.name, ''.join(lines[start:])))
+    return parts
+
+
+def number_lines(text, start):
+    """각 줄 앞에 파일 기준 줄 번호 붙이기 (모델이 절대 줄 번호로 답하도록)"""
+    lines = text.splitlines()
+    width = len(str(start + len(lines)))
+    return '\n'.join(f"{start + i:>{width}} | {line}" for i, line in enumerate(lines))
@@ -0,0 +1,140 @@
+"""
+Tokamak AI Context Packer
+토큰 예산 안에서 가장 쓸모 있는 파일/정의부터 프롬프트에 채워 넣는 도구
+"""
+
+import re
+import math
+from pathlib import Path
+
+from code_chunker import split_top_level
+from token_estimator import estimate_tokens
+
+# 진입점으로 볼 파일 이름 (확장자 제외)
+ENTRY_POINT_NAMES = {
+    'main', '__main__', 'app', 'index', 'server', 'cli', 'manage', 'wsgi', 'asgi',
+    'lib', 'mod', 'setup', 'settings', 'config', 'routes', 'urls',
+}
+
+# 생략 표시에 쓸 주석 기호 (목록에 없는 확장자는 C 계열로 보고 //)
+HASH_COMMENT_SUFFIXES = {'.py', '.pyw', '.sh', '.bash', '.zsh', '.rb', '.pl', '.r', '.yaml', '.yml', '.toml',
+                         '.cfg', '.ini', '.mk', '.dockerfile'}
+DASH_COMMENT_SUFFIXES = {'.sql', '.lua', '.hs'}
+
+_WORD = re.compile(r'[A-Za-z][a-z0-9]*|[A-Z]+(?![a-z])|\d+|[가-힣]+')
+
+
+def identifier_terms(text):
+    """식별자를 단어로 분리 (camelCase, snake_case, 경로 구분자 모두 처리), 소문자로 반환"""
+    return [word.lower() for word in _WORD.findall(text) if len(word) > 1]
+
+
+def omission_marker(suffix, start, end):
+    """코드 블록 안에서 생략한 줄을 알리는 한 줄 주석 (파일 언어의 주석 문법 사용)"""
+    suffix = suffix.lower()
+    prefix = '#' if suffix in HASH_COMMENT_SUFFIXES else '--' if suffix in DASH_COMMENT_SUFFIXES else '//'
+    return f"{prefix} ... ({start}-{end}줄 생략)\n"
+
+
+def rank_files(candidates, question=None):
+    """후보 파일을 점수 순으로 정렬
+
+    candidates: [{"path": 상대 경로, "size": 바이트, "mtime": 수정 시각, "summary": 요약(선택)}]
+    점수 요소: 진입점 여부, 디렉토리 깊이, 크기(작을수록 토큰 대비 효율), 최근 수정, 질문과의 관련도
+    """
+    if not candidates:
+        return []
+    mtimes = [c['mtime'] for c in candidates]
+    oldest, newest = min(mtimes), max(mtimes)
+    query = set(identifier_terms(question)) if question else set()
+    wants_tests = 'test' in query or 'tests' in query
+
+    def score(candidate):
+        relpath = candidate['path']
+        path = Path(relpath)
+        value = 0.0
+        if path.stem.lower() in ENTRY_POINT_NAMES:
+            value += 3.0
+        value -= 0.3 * relpath.count('/')
+        value -= 0.5 * math.log10(max(candidate['size'], 100) / 100)
+        if newest > oldest:
+            value += 1.5 * (candidate['mtime'] - oldest) / (newest - oldest)
+        if not wants_tests and ('test' in path.stem.lower() or 'tests' in path.parts):
+            value -= 1.0
+        if query:
+            path_hits = len(query & set(identifier_terms(relpath)))
+            summary_hits = len(query & set(identifier_terms(candidate.get('summary') or '')))
+            value += 4.0 * path_hits + 1.5 * summary_hits
+        return value
+
+    return sorted(candidates, key=score, reverse=True)
+
+
+class ContextPacker:
+    """토큰 예산을 넘지 않도록 프롬프트 조각을 모으는 버퍼
+
+    조각은 리스트에 모았다가 마지막에 한 번만 합칩니다.
+    model을 주면 그 모델에서 학습한 보정 비율로 토큰 수를 셉니다.
+    """
+
+    def __init__(self, budget, model=None):
+        self.budget = max(0, budget)
+        self.model = model
+        self.used = 0
+        self.parts = []
+        self.full_files = 0
+        self.partial_files = 0
+
+    @property
+    def remaining(self):
+        return self.budget - self.used
+
+    def add(self, text, tokens=None):
+        """예산 안에 들어가면 추가하고 True 반환"""
+        tokens = estimate_tokens(text, self.model) if tokens is None else tokens
+        if tokens > self.remaining:
+            return False
+        self.parts.append(text)
+        self.used += tokens
+        return True
+
+    def add_file(self, relpath, code):
+        """파일 전체를 넣고, 안 들어가면 들어가는 최상위 정의만 통째로 넣음
+
+        반환: 'full' / 'partial' / None (하나도 못 넣음)
+        """
+        if self.add(f"\n\n### {relpath}\n```\n{code}\n```\n"):
+            self.full_files += 1
+            return 'full'
+
+        blocks = split_top_level(code, Path(relpath).suffix)
+        header = f"\n\n### {relpath} (일부 정의만 포함)\n```\n"
+        footer = "```\n"
+        overhead = estimate_tokens(header + footer, self.model)
+        if overhead >= self.remaining:
+            return None
+
+        # 정의 앞에 생략 표시가 필요하면 그 토큰도 함께 예산에서 뺌
+        suffix = Path(relpath).suffix
+        pieces = [header]
+        available = self.remaining - overhead
+        previous_end = 0
+        for block in blocks:
+            marker = omission_marker(suffix, previous_end + 1, block.start - 1) \
+                if block.start > previous_end + 1 else ''
+            text = block.text if block.text.endswith('\n') else block.text + '\n'
+            tokens = estimate_tokens(marker + text, self.model)
+            if tokens <= available:
+                pieces.append(marker + text)
+                available -= tokens
+                previous_end = block.end
+        if len(pieces) == 1:
+            return None
+
+        pieces.append(footer)
+        self.add(''.join(pieces), tokens=self.remaining - available)
+        self.partial_files += 1
+        return 'partial'
+
+    def text(self):
+        return ''.join(self.parts)
@@ -0,0 +1,83 @@
+"""
+Tokamak AI Directory Manifest
+analyze-dir가 이전 실행 결과(파일 해시, 파일별 요약)를 기억하기 위한 매니페스트
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+
+
+class DirectoryManifest:
+    """디렉토리의 파일별 내용 해시와 요약을 저장하는 JSON 매니페스트
+
+    files: {상대 경로: {"hash", "size", "mtime", "summary"}}
+    model/prompt_version이 바뀌면 기존 요약은 모두 무효로 봅니다.
+    """
+
+    def __init__(self, path, model=None, prompt_version=None):
+        self.path = Path(path)
+        self.model = model
+        self.prompt_version = prompt_version
+        self.files = {}
+        self._load()
+
+    @staticmethod
+    def path_for(base_dir, directory):
+        """분석 대상 디렉토리별 매니페스트 경로"""
+        directory = Path(directory).resolve()
+        digest = hashlib.sha1(str(directory).encode('utf-8')).hexdigest()[:12]
+        return Path(base_dir) / ".manifests" / f"{directory.name or 'root'}_{digest}.json"
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('model') != self.model or data.get('prompt_version') != self.prompt_version:
+            return
+        self.files = data.get('files', {})
+
+    def save(self):
+        """임시 파일에 쓴 뒤 교체 (중간에 중단돼도 기존 매니페스트 유지)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'model': self.model,
+                'prompt_version': self.prompt_version,
+                'files': self.files,
+            }, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def file_hash(self, relpath, filepath, st):
+        """파일 해시 (크기/mtime이 그대로면 이전 해시 재사용)"""
+        entry = self.files.get(relpath)
+        if entry and entry.get('size') == st.st_size and entry.get('mtime') == st.st_mtime_ns:
+            return entry['hash']
+        with open(filepath, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def diff(self, current):
+        """current({상대 경로: 해시})와 비교해서 (추가, 변경, 삭제) 목록 반환"""
+        added = sorted(p for p in current if p not in self.files)
+        changed = sorted(p for p in current if p in self.files and self.files[p]['hash'] != current[p])
+        deleted = sorted(p for p in self.files if p not in current)
+        return added, changed, deleted
+
+    def update(self, relpath, file_hash, st, summary):
+        self.files[relpath] = {
+            'hash': file_hash,
+            'size': st.st_size,
+            'mtime': st.st_mtime_ns,
+            'summary': summary,
+        }
+
+    def remove(self, relpath):
+        self.files.pop(relpath, None)
+
+    def summaries(self):
+        """(상대 경로, 요약) 목록 (경로 순)"""
+        return [(p, self.files[p]['summary']) for p in sorted(self.files)]
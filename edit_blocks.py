@@ -0,0 +1,113 @@
+"""
+Tokamak AI Edit Blocks
+apply 명령에서 모델이 보낸 검색/치환 블록을 파싱해서 파일에 적용하는 도구
+
+모델은 파일 전체 대신 바뀌는 부분만 다음 형식으로 보냅니다:
+
+<<<<<<< SEARCH
+(파일에 있는 그대로의 기존 코드)
+=======
+(바꿀 코드)
+>>>>>>> REPLACE
+
+- SEARCH 부분은 파일에서 정확히 한 번만 나와야 함 (줄 끝 공백 차이는 허용)
+- 적용할 수 없으면 EditBlockError (호출하는 쪽에서 전체 파일 모드로 다시 요청)
+"""
+
+import re
+import ast
+from pathlib import Path
+from collections import namedtuple
+
+EditBlock = namedtuple('EditBlock', ['search', 'replace'])
+
+SEARCH_MARK = re.compile(r"^<{5,9} ?SEARCH\s*$")
+DIVIDER = re.compile(r"^={5,9}\s*$")
+REPLACE_MARK = re.compile(r"^>{5,9} ?REPLACE\s*$")
+
+# 문법 검사를 하는 파일 확장자
+PYTHON_SUFFIXES = ('.py', '.pyw')
+
+
+class EditBlockError(Exception):
+    """편집 블록을 파싱하거나 적용할 수 없음"""
+    pass
+
+
+class ApplyError(Exception):
+    """수정 결과를 적용할 수 없음 (원래 파일은 그대로)"""
+    pass
+
+
+def parse_edit_blocks(text):
+    """응답 텍스트에서 편집 블록 목록 추출 (블록 밖의 설명/코드 펜스는 무시)"""
+    blocks = []
+    lines = text.splitlines(keepends=True)
+    i = 0
+    while i < len(lines):
+        if not SEARCH_MARK.match(lines[i]):
+            i += 1
+            continue
+        i += 1
+        start = i
+        while i < len(lines) and not DIVIDER.match(lines[i]):
+            i += 1
+        if i >= len(lines):
+            raise EditBlockError(f"블록 {len(blocks) + 1}: '=======' 구분선이 없습니다 (응답이 잘렸을 수 있음)")
+        search = ''.join(lines[start:i])
+        i += 1
+        start = i
+        while i < len(lines) and not REPLACE_MARK.match(lines[i]):
+            i += 1
+        if i >= len(lines):
+            raise EditBlockError(f"블록 {len(blocks) + 1}: '>>>>>>> REPLACE'로 끝나지 않았습니다 (응답이 잘렸을 수 있음)")
+        blocks.append(EditBlock(search, ''.join(lines[start:i])))
+        i += 1
+    return blocks
+
+
+def apply_edit_blocks(code, blocks):
+    """편집 블록들을 순서대로 적용한 코드 반환"""
+    if not blocks:
+        raise EditBlockError("응답에 편집 블록이 없습니다")
+    for number, block in enumerate(blocks, 1):
+        code = _replace_once(code, block, number)
+    return code
+
+
+def _replace_once(code, block, number):
+    search, replace = block
+    if not search.strip():
+        # 빈 파일에 새로 쓰는 경우만 허용
+        if code.strip():
+            raise EditBlockError(f"블록 {number}: SEARCH 부분이 비어 있습니다")
+        return replace
+
+    count = code.count(search)
+    if count == 1:
+        return code.replace(search, replace, 1)
+    if count > 1:
+        raise EditBlockError(f"블록 {number}: SEARCH 부분이 파일에 {count}번 나옵니다")
+
+    # 줄 끝 공백/마지막 줄바꿈만 다른 경우는 줄 단위로 비교해서 적용
+    lines = code.splitlines(keepends=True)
+    have = [line.rstrip() for line in lines]
+    want = [line.rstrip() for line in search.splitlines()]
+    starts = [i for i in range(len(lines) - len(want) + 1) if have[i:i + len(want)] == want]
+    if not starts:
+        raise EditBlockError(f"블록 {number}: SEARCH 부분을 파일에서 찾을 수 없습니다")
+    if len(starts) > 1:
+        raise EditBlockError(f"블록 {number}: SEARCH 부분이 파일에 {len(starts)}번 나옵니다")
+    start = starts[0]
+    return ''.join(lines[:start]) + replace + ''.join(lines[start + len(want):])
+
+
+def check_syntax(path, code):
+    """Python 파일이면 문법 검사 (문제가 있으면 에러 메시지, 없거나 검사 대상이 아니면 None)"""
+    if Path(path).suffix not in PYTHON_SUFFIXES:
+        return None
+    try:
+        ast.parse(code, filename=str(path))
+    except SyntaxError as e:
+        return f"문법 오류: {e.msg} ({e.lineno}번째 줄)"
+    return None
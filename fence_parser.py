@@ -0,0 +1,69 @@
+"""
+Tokamak AI Fence Parser
+스트리밍 응답에서 마크다운 코드 블록(```)을 받는 대로 분리하는 증분 파서
+
+- 받은 텍스트 조각을 feed()로 넣으면 완성된 줄마다 이벤트를 돌려줌 (이미 처리한 부분은 다시 보지 않음)
+- 코드 블록은 여는 펜스와 같은 문자(` 또는 ~)로, 같거나 더 긴 길이의 정보 문자열 없는 펜스로만 닫힘
+  (````markdown 안의 ``` 같은 중첩 블록도 안쪽 펜스를 코드로 취급)
+- 응답이 코드 블록 안에서 끝나면 close() 후 unterminated가 True
+"""
+
+import re
+from collections import namedtuple
+
+# kind: 'text'(코드 블록 밖의 줄), 'open'(text=정보 문자열), 'code'(코드 블록 안의 줄), 'close'
+FenceEvent = namedtuple('FenceEvent', ['kind', 'text'])
+
+FENCE = re.compile(r"^\s*(`{3,}|~{3,})(.*)$")
+
+
+class FenceParser:
+    """코드 블록 경계를 찾는 줄 단위 상태 기계"""
+
+    def __init__(self):
+        self._pending = []  # 아직 줄바꿈이 오지 않은 마지막 줄 조각들
+        self._fence = None  # 열려 있는 코드 블록의 펜스 (예: '```')
+
+    @property
+    def in_code(self):
+        return self._fence is not None
+
+    @property
+    def unterminated(self):
+        """close() 이후: 응답이 코드 블록 안에서 끝났는지"""
+        return self._fence is not None
+
+    def feed(self, text):
+        """받은 텍스트 조각을 넣고 이번에 완성된 줄들의 이벤트 목록 반환"""
+        if '\n' not in text:
+            self._pending.append(text)
+            return []
+        parts = text.split('\n')
+        self._pending.append(parts[0])
+        events = self._line(''.join(self._pending))
+        for line in parts[1:-1]:
+            events += self._line(line)
+        self._pending = [parts[-1]] if parts[-1] else []
+        return events
+
+    def close(self):
+        """응답이 끝남: 줄바꿈 없이 남은 마지막 줄 처리"""
+        if not self._pending:
+            return []
+        line = ''.join(self._pending)
+        self._pending = []
+        return self._line(line, last=True)
+
+    def _line(self, line, last=False):
+        line = line.rstrip('\r')
+        match = FENCE.match(line)
+        if self._fence is None:
+            if match and not (match.group(1)[0] == '`' and '`' in match.group(2)):
+                self._fence = match.group(1)
+                return [FenceEvent('open', match.group(2).strip())]
+            return [FenceEvent('text', line)]
+        if match and not match.group(2).strip() and match.group(1)[0] == self._fence[0] \
+                and len(match.group(1)) >= len(self._fence):
+            self._fence = None
+            return [FenceEvent('close', '')]
+        return [FenceEvent('code', line if last else line + '\n')]
@@ -0,0 +1,129 @@
+"""
+Tokamak AI Hedged Requests
+첫 토큰이 유난히 늦게 오는 요청(TTFT 꼬리 지연)에 대비한 중복 요청 정책
+
+- 최근 첫 토큰 시간(TTFT)의 백분위수만큼 기다려도 첫 토큰이 없으면 같은 모델(또는 대체 모델)로 한 번 더 요청
+- 먼저 첫 토큰을 보낸 쪽의 스트림을 사용하고 나머지 요청은 취소 (Transport.ahedged_stream)
+- 최근 요청 중 중복 요청 비율이 예산을 넘으면 더 요청하지 않음 (추가 비용 상한)
+- TTFT와 중복 요청 기록은 파일에 남겨서 다음 실행에서도 사용
+"""
+
+import os
+import json
+import math
+import atexit
+import threading
+from pathlib import Path
+
+# 기록이 이보다 적으면 백분위수 대신 기본 대기 시간 사용
+MIN_SAMPLES = 20
+# 모델별 TTFT, 중복 요청 여부를 최근 몇 개까지 기억할지
+HISTORY_SIZE = 200
+
+
+def default_history_path(save_dir=None):
+    """TTFT 기록 파일 위치 (응답 캐시와 같은 .cache 디렉토리, save_dir: 결과 저장 디렉토리)"""
+    base = os.getenv("AI_CACHE_DIR")
+    if base:
+        return Path(base).parent / "hedge_history.json"
+    return Path(save_dir or Path(__file__).parent / "analysis") / ".cache" / "hedge_history.json"
+
+
+def print_hedge(model, delay):
+    """중복 요청 알림 (Transport.ahedged_stream의 on_hedge)"""
+    print(f"\n🔀 {delay:.1f}초 동안 첫 토큰이 없어 {model}로 중복 요청합니다", flush=True)
+
+
+class HedgePolicy:
+    """중복 요청 시점과 예산
+
+    percentile/min_delay/default_delay/budget을 지정하지 않으면 환경변수
+    AI_HEDGE_PERCENTILE(기본 95), AI_HEDGE_MIN_DELAY(기본 1초), AI_HEDGE_DELAY(기록이 적을 때, 기본 5초),
+    AI_HEDGE_BUDGET(최근 요청 중 중복 요청 비율 상한, 기본 0.1)을 사용합니다.
+    fallback_model을 주면 중복 요청은 그 모델로 보냅니다 (기본: 같은 모델, AI_HEDGE_MODEL).
+    """
+
+    def __init__(self, fallback_model=None, percentile=None, min_delay=None, default_delay=None, budget=None,
+                 path=None):
+        self.fallback_model = fallback_model or os.getenv("AI_HEDGE_MODEL") or None
+        self.percentile = float(percentile or os.getenv("AI_HEDGE_PERCENTILE", "95"))
+        self.min_delay = float(min_delay or os.getenv("AI_HEDGE_MIN_DELAY", "1"))
+        self.default_delay = float(default_delay or os.getenv("AI_HEDGE_DELAY", "5"))
+        self.budget = float(budget if budget is not None else os.getenv("AI_HEDGE_BUDGET", "0.1"))
+        self.path = Path(path) if path else default_history_path()
+        self._ttft = None  # 모델 -> 최근 TTFT(초) 목록
+        self._hedged = None  # 최근 요청별 중복 요청 여부 (0/1)
+        self._inflight = 0  # try_acquire로 예약했지만 아직 record되지 않은 중복 요청 수
+        self._dirty = False
+        self._lock = threading.Lock()
+        atexit.register(self.save)
+
+    def _load(self):
+        """lock 안에서 호출"""
+        if self._ttft is not None:
+            return
+        self._ttft, self._hedged = {}, []
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._ttft = data.get('ttft', {})
+        self._hedged = data.get('hedged', [])
+
+    def delay(self, model):
+        """중복 요청 전에 기다릴 시간 (최근 TTFT의 백분위수, 최소 min_delay)"""
+        with self._lock:
+            self._load()
+            samples = sorted(self._ttft.get(model, []))
+        if len(samples) < MIN_SAMPLES:
+            return max(self.min_delay, self.default_delay)
+        rank = max(1, math.ceil(len(samples) * self.percentile / 100))
+        return max(self.min_delay, samples[rank - 1])
+
+    def try_acquire(self):
+        """이번 요청에 중복 요청을 보내도 되는지 (최근 중복 요청 비율이 예산 안인지)
+
+        True를 반환하면 그 자리에서 예약하므로, 동시에 도는 요청들도 아직 끝나지 않은 중복 요청까지 세어
+        예산을 넘지 않습니다. 예약은 record(..., hedged=True)에서 기록으로 바뀝니다.
+        """
+        with self._lock:
+            self._load()
+            hedged = sum(self._hedged) + self._inflight
+            if hedged < self.budget * (len(self._hedged) + self._inflight + 1):
+                self._inflight += 1
+                return True
+            return False
+
+    def record(self, model, ttft, hedged):
+        """요청 하나의 결과 기록 (model: 첫 토큰을 보낸 요청의 모델, ttft: 그 요청을 보낸 뒤 첫 토큰까지, 실패했으면 None)
+
+        같은 모델의 중복 요청이 이기면 원래 요청의 TTFT는 알 수 없으므로 그때까지 기다린 시간(하한)을 기록합니다.
+        """
+        with self._lock:
+            self._load()
+            if ttft is not None:
+                samples = self._ttft.setdefault(model, [])
+                samples.append(round(ttft, 3))
+                del samples[:-HISTORY_SIZE]
+            if hedged:
+                self._inflight = max(0, self._inflight - 1)
+            self._hedged.append(1 if hedged else 0)
+            del self._hedged[:-HISTORY_SIZE]
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'ttft': {model: list(samples) for model, samples in self._ttft.items()},
+                    'hedged': list(self._hedged)}
+            self._dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp, self.path)
+        except OSError:
+            pass  # 기록은 다음 실행에서 다시 쌓이므로 저장 실패는 무시
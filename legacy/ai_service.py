@@ -0,0 +1,271 @@
+"""
+Tokamak AI 웹 인터페이스의 AI 호출 계층
+Flask 앱(app.py)과 ASGI 앱(asgi_app.py)이 함께 사용
+"""
+
+import os
+import re
+import sys
+import signal
+import threading
+from collections import namedtuple, OrderedDict
+from openai import OpenAI
+from dotenv import load_dotenv
+
+# 상위 디렉토리의 공용 모듈 사용
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_discovery import ModelDiscovery
+from transport import get_transport, close_transports
+from token_estimator import context_window
+from session_store import SessionStore, window_messages
+from metrics import ChatObserver
+
+load_dotenv()
+
+# 모델명 -> 키 해석 결과를 기억할 최대 개수 (모델명은 클라이언트가 보내므로 제한)
+RESOLVED_KEYS_MAX = 256
+
+class AIService:
+    def __init__(self):
+        # API 키별 클라이언트 풀 (같은 키는 같은 클라이언트 = 같은 커넥션 풀을 재사용)
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+        self.discovery = None
+        self.reload_keys()
+        # 모델 목록은 키별로 동시에 조회하고 TTL 동안 캐시 (만료 후에는 이전 목록을 주면서 백그라운드 갱신)
+        self.discovery = ModelDiscovery(self.base_url, self._discovery_keys(), fetch=self._fetch_models)
+    
+    def reload_keys(self):
+        """환경변수/.env에서 API 키 설정을 다시 읽음 (시작 시 한 번, 이후 SIGHUP 수신 시)"""
+        load_dotenv(override=True)
+        default_api_key = os.getenv("AI_API_KEY")
+        base_url = os.getenv("AI_BASE_URL")
+        
+        if not default_api_key or default_api_key == "your_api_key_here":
+            raise ValueError("AI_API_KEY must be set in .env file")
+        if not base_url:
+            raise ValueError("AI_BASE_URL must be set in .env file")
+        
+        # 모델별 키 매핑 미리 계산
+        # 예: AI_API_KEY_QWEN3_235B 등으로 환경변수를 설정해두면 개별 적용됨
+        model_keys = {
+            name[len("AI_API_KEY_"):]: value
+            for name, value in os.environ.items()
+            if name.startswith("AI_API_KEY_") and value
+        }
+        
+        with self._clients_lock:
+            if base_url != getattr(self, "base_url", base_url):
+                self._close_clients(list(self._clients))
+            self.default_api_key = default_api_key
+            self.base_url = base_url
+            self.model_keys = model_keys
+            self.group_key = model_keys.get("GPT_OPUS")
+            # 키 -> 지표 라벨용 이름 (키 자체는 노출하지 않고 설정한 환경변수 이름 사용)
+            self._key_groups = {value: name.lower() for name, value in model_keys.items()}
+            self._key_groups[default_api_key] = "default"
+            self._resolved_keys = OrderedDict()  # 모델명 -> 키 (요청마다 다시 계산하지 않도록, 최근 사용 순)
+            # 더 이상 쓰지 않는 키의 클라이언트와 async Transport 정리
+            active_keys = {default_api_key, *model_keys.values()}
+            self._close_clients([key for key in self._clients if key not in active_keys])
+            close_transports({(key, base_url) for key in active_keys})
+        if self.discovery is not None:
+            self.discovery.set_keys(self._discovery_keys(), base_url)
+    
+    def _close_clients(self, keys):
+        for key in keys:
+            client = self._clients.pop(key, None)
+            if client is not None:
+                client.close()
+    
+    def _resolve_key(self, model_name):
+        """모델에 최적인 API 키 (최근 RESOLVED_KEYS_MAX개 모델의 결과를 기억)"""
+        with self._clients_lock:
+            key = self._resolved_keys.get(model_name)
+            if key is not None:
+                self._resolved_keys.move_to_end(model_name)
+                return key
+        # 모델명에서 특수문자 제거하고 대문자로 변환 (예: qwen3-235b -> QWEN3_235B)
+        env_suffix = model_name.replace("-", "_").replace(".", "_").upper()
+        specific_key = self.model_keys.get(env_suffix)
+        
+        # 특정 그룹 키 (예: GPT 계열)
+        if self.group_key and ("gpt" in model_name.lower() or "opus" in model_name.lower()):
+            specific_key = self.group_key
+        
+        key = specific_key or self.default_api_key
+        with self._clients_lock:
+            self._resolved_keys[model_name] = key
+            if len(self._resolved_keys) > RESOLVED_KEYS_MAX:
+                self._resolved_keys.popitem(last=False)
+        return key
+    
+    def key_group(self, model_name):
+        """모델 요청에 쓰이는 키의 그룹 이름 (/metrics 라벨)"""
+        return self._key_groups.get(self._resolve_key(model_name), "default")
+    
+    def _get_client(self, key):
+        """키별 클라이언트를 풀에서 가져오기 (없으면 한 번만 생성)"""
+        client = self._clients.get(key)
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._clients[key] = OpenAI(api_key=key, base_url=self.base_url)
+        return client
+    
+    def _get_client_for_model(self, model_name):
+        """모델에 최적인 API 키의 클라이언트 반환 (커넥션 재사용)"""
+        return self._get_client(self._resolve_key(model_name))
+    
+    def _discovery_keys(self):
+        keys = [self.default_api_key, *sorted(self.model_keys.values())]
+        return [k for k in dict.fromkeys(keys) if k and k != "your_api_key_here"]
+    
+    def _fetch_models(self, key, timeout):
+        """키 하나로 모델 목록 조회 (풀의 클라이언트 사용, 재시도 없이 timeout 안에)"""
+        client = self._get_client(key).with_options(timeout=timeout, max_retries=0)
+        return [model.id for model in client.models.list().data]
+    
+    def get_available_models(self):
+        """설정된 모든 API 키로 접근 가능한 모델 목록 (캐시된 결과, 키별 에러 포함)"""
+        result = self.discovery.get()
+        for key, error in result.errors.items():
+            print(f"Error fetching models for key {self.discovery.key_label(key)}: {error}")
+        
+        # 만약 API 호출로 가져온 모델이 없으면 환경변수에서 기본 세트 반환
+        if not result.models:
+            default_models = os.getenv("DEFAULT_MODELS", "")
+            return result._replace(models=[m.strip() for m in default_models.split(",") if m.strip()])
+            
+        return result
+    
+    def chat_stream(self, messages, model="qwen3-235b", observer=None):
+        """스트리밍 방식으로 응답 (observer: 지표 기록용 ChatObserver)"""
+        observer = observer or ChatObserver(model, self.key_group(model))
+        observer.upstream_start()
+        try:
+            client = self._get_client_for_model(model)
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                stream=True
+            )
+            observer.connected()
+            
+            for chunk in response:
+                if chunk.choices[0].delta.content:
+                    observer.delta()
+                    yield chunk.choices[0].delta.content
+                    
+        except Exception as e:
+            observer.failed()
+            yield f"\n\n❌ Error ({model}): {str(e)}"
+    
+    async def achat_stream(self, messages, model="qwen3-235b", observer=None):
+        """chat_stream의 async 버전 (ASGI 서버용: 스트림이 스레드를 점유하지 않음)"""
+        observer = observer or ChatObserver(model, self.key_group(model))
+        observer.upstream_start()
+        try:
+            transport = get_transport(self._resolve_key(model), self.base_url)
+            async for content in transport.astream(messages, model, on_connect=observer.connected):
+                observer.delta()
+                yield content
+        except Exception as e:
+            observer.failed()
+            yield f"\n\n❌ Error ({model}): {str(e)}"
+
+ai_service = AIService()
+
+def _reload_keys_on_signal(signum, frame):
+    """SIGHUP으로 서버 재시작 없이 API 키 설정 다시 읽기 (예: kill -HUP <pid>)"""
+    try:
+        ai_service.reload_keys()
+        print("🔑 API 키 설정을 다시 읽었습니다.")
+    except Exception as e:
+        print(f"❌ API 키 설정 다시 읽기 실패 (기존 설정 유지): {e}")
+
+if hasattr(signal, "SIGHUP"):
+    try:
+        signal.signal(signal.SIGHUP, _reload_keys_on_signal)
+    except ValueError:
+        pass  # 메인 스레드가 아닌 곳에서 import된 경우
+
+# 대화 세션 (SESSION_DB를 지정하면 SQLite에도 기록)
+session_store = SessionStore(
+    max_sessions=int(os.getenv("SESSION_MAX", "1000")),
+    ttl=float(os.getenv("SESSION_TTL_HOURS", "24")) * 3600,
+    db_path=os.getenv("SESSION_DB") or None,
+)
+
+# 응답용으로 남겨둘 토큰 수
+RESERVED_OUTPUT_TOKENS = 4096
+
+_SESSION_ID = re.compile(r'[0-9a-f]{32}')
+
+# session_id: 세션 ID (세션 없이 요청한 경우 None), messages: 업스트림에 보낼 메시지,
+# finish(reply, completed): 응답이 끝나면 호출 (끝까지 성공한 답변만 세션에 질문/답변 추가, 지표 기록),
+# observer: 이 요청의 지표 기록 (chat_stream/achat_stream에 전달)
+ChatRequest = namedtuple('ChatRequest', ['session_id', 'model', 'messages', 'finish', 'observer'])
+
+def prepare_chat(data, received=None):
+    """/api/chat 요청 본문 해석 (received: 요청을 받은 시각, time.perf_counter 기준)
+
+    message(새 메시지 하나)를 보내면 서버 세션에 이어서 대화하고,
+    예전 방식대로 messages(전체 대화)를 보내면 세션 없이 그대로 사용합니다.
+    """
+    model = data.get('model', 'qwen3-235b')
+    observer = ChatObserver(model, ai_service.key_group(model), received)
+    if 'message' not in data:
+        messages = data.get('messages', [])
+        return ChatRequest(None, model, messages,
+                           lambda reply, completed: observer.finish(messages, reply, completed), observer)
+    
+    session_id = data.get('session_id') or ''
+    if not _SESSION_ID.fullmatch(session_id):
+        session_id = session_store.new_id()
+    history = session_store.get(session_id) or []
+    user_message = {"role": "user", "content": data['message']}
+    
+    # 최근 대화부터 컨텍스트 예산(SESSION_MAX_TOKENS, 기본: 모델 컨텍스트 - 응답용)만큼만 전송
+    max_tokens = int(os.getenv("SESSION_MAX_TOKENS") or context_window(model) - RESERVED_OUTPUT_TOKENS)
+    messages = window_messages(history + [user_message], max_tokens)
+    
+    def finish(reply, completed):
+        # 업스트림 오류나 클라이언트가 끊어서 잘린 답변은 이후 대화에 계속 전송되므로 기록하지 않음
+        if reply and completed and not observer.error:
+            session_store.append(session_id, user_message, {"role": "assistant", "content": reply})
+        observer.finish(messages, reply, completed)
+    
+    return ChatRequest(session_id, model, messages, finish, observer)
+
+def record_reply(deltas, finish, observer):
+    """응답 조각을 그대로 넘기면서 모아두었다가, 끝나면(중간에 끊겨도) finish(전체 응답, 끝까지 받았는지) 호출
+
+    observer.failed() 이후의 조각(오류 메시지)은 클라이언트에만 보내고 응답에는 넣지 않습니다.
+    """
+    parts = []
+    completed = False
+    try:
+        for delta in deltas:
+            if not observer.error:
+                parts.append(delta)
+            yield delta
+        completed = True
+    finally:
+        deltas.close()
+        finish("".join(parts), completed)
+
+async def arecord_reply(deltas, finish, observer):
+    """record_reply의 async 버전"""
+    parts = []
+    completed = False
+    try:
+        async for delta in deltas:
+            if not observer.error:
+                parts.append(delta)
+            yield delta
+        completed = True
+    finally:
+        await deltas.aclose()
+        finish("".join(parts), completed)
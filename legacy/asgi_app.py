@@ -0,0 +1,104 @@
+"""
+Tokamak AI 웹 인터페이스 - ASGI 모드
+app.py(Flask)와 같은 엔드포인트/SSE 형식을 async로 제공
+
+스트림마다 스레드를 점유하지 않으므로 워커 하나가 수백 개의 동시 스트림을 처리할 수 있습니다.
+실행: uvicorn asgi_app:app --port 5000 --workers 4  (또는 python asgi_app.py)
+"""
+
+import os
+import time
+from datetime import datetime
+
+from jinja2 import Environment, FileSystemLoader
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+from ai_service import ai_service, session_store, prepare_chat, arecord_reply
+from sse import asse_events, stream_totals
+from metrics import render_metrics, CONTENT_TYPE
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# index.html은 요청마다 바뀌는 내용이 없으므로 시작할 때 한 번만 렌더링
+_templates = Environment(loader=FileSystemLoader(os.path.join(BASE_DIR, 'templates')), autoescape=True)
+_templates.globals['url_for'] = lambda endpoint, filename: f"/{endpoint}/{filename}"
+INDEX_HTML = _templates.get_template('index.html').render()
+
+
+async def index(request):
+    """메인 페이지"""
+    return HTMLResponse(INDEX_HTML)
+
+
+async def get_models(request):
+    """사용 가능한 모델 목록 반환 (캐시가 비어 있으면 조회가 끝날 때까지 스레드풀에서 대기)"""
+    result = await run_in_threadpool(ai_service.get_available_models)
+    return JSONResponse({"models": result.models, "errors": result.errors, "stale": result.stale})
+
+
+async def chat(request):
+    """채팅 API - 스트리밍 응답 (클라이언트가 끊으면 업스트림 요청도 취소됨, 세션 ID는 X-Session-Id 헤더로 반환)"""
+    received = time.perf_counter()
+    req = await run_in_threadpool(prepare_chat, await request.json(), received)
+    deltas = arecord_reply(ai_service.achat_stream(req.messages, req.model, req.observer), req.finish, req.observer)
+
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    }
+    if req.session_id:
+        headers['X-Session-Id'] = req.session_id
+    return StreamingResponse(
+        asse_events(deltas, req.model),
+        media_type='text/event-stream',
+        headers=headers
+    )
+
+
+async def get_session(request):
+    """세션의 대화 내용 (화면 복원용)"""
+    session_id = request.path_params['session_id']
+    messages = await run_in_threadpool(session_store.get, session_id)
+    if messages is None:
+        return JSONResponse({"error": "session not found"}, status_code=404)
+    return JSONResponse({"session_id": session_id, "messages": messages})
+
+
+async def delete_session(request):
+    """세션 삭제 (대화 지우기)"""
+    await run_in_threadpool(session_store.delete, request.path_params['session_id'])
+    return JSONResponse({"status": "ok"})
+
+
+async def health(request):
+    """헬스 체크"""
+    return JSONResponse({"status": "ok", "timestamp": datetime.now().isoformat(), "sse": stream_totals()})
+
+
+async def metrics(request):
+    """Prometheus 지표 (/api/chat 대기 시간, TTFT, 토큰 간 지연, 토큰 수 등)"""
+    return Response(render_metrics(), headers={'Content-Type': CONTENT_TYPE})
+
+
+app = Starlette(routes=[
+    Route('/', index),
+    Route('/api/models', get_models, methods=['GET']),
+    Route('/api/chat', chat, methods=['POST']),
+    Route('/api/sessions/{session_id}', get_session, methods=['GET']),
+    Route('/api/sessions/{session_id}', delete_session, methods=['DELETE']),
+    Route('/api/health', health, methods=['GET']),
+    Route('/metrics', metrics, methods=['GET']),
+    Mount('/static', StaticFiles(directory=os.path.join(BASE_DIR, 'static')), name='static'),
+])
+
+if __name__ == '__main__':
+    import uvicorn
+
+    workers = int(os.getenv("WEB_WORKERS", "1"))
+    print("🚀 Starting Tokamak AI Chat Interface (ASGI)...")
+    print(f"📡 Server running at: http://localhost:5000 (workers: {workers})")
+    uvicorn.run("asgi_app:app", host="127.0.0.1", port=5000, workers=workers)
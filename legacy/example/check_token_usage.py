@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import urllib.request
 from dotenv import load_dotenv
@@ -8,7 +9,23 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 load_dotenv(os.path.join(parent_dir, ".env"))
 
+# 저장소 루트의 공용 모듈 사용
+sys.path.insert(0, os.path.dirname(parent_dir))
+from token_estimator import estimate_messages, record_usage
+
+def estimate_token_usage(text_content):
+    """API 호출 없이 로컬에서 추정 (학습된 모델별 보정 비율 적용)"""
+    model = os.getenv("AI_MODEL")
+    messages = [{"role": "user", "content": text_content}]
+    tokens = estimate_messages(messages, model)
+    print(f"--- Token Usage Estimate (local) ---")
+    print(f"Model: {model}")
+    print(f"Input Text: {text_content}")
+    print(f"Total Tokens: {tokens}")
+    return tokens
+
 def check_token_usage(text_content):
+    """게이트웨이의 /utils/token_counter로 정확한 값 확인 (결과로 로컬 추정의 보정 비율도 갱신)"""
     api_key = os.getenv("AI_API_KEY")
     base_url = os.getenv("AI_BASE_URL")
     # 모델도 환경변수에서 가져오거나 기본값 사용
@@ -58,6 +75,7 @@ def check_token_usage(text_content):
             print(f"Model: {data.get('model_used', model)}")
             print(f"Input Text: {text_content}")
             print(f"Total Tokens: {data.get('total_tokens')}")
+            record_usage(model, payload["messages"], data.get('total_tokens'))
             return data
             
     except urllib.error.HTTPError as e:
@@ -68,4 +86,7 @@ def check_token_usage(text_content):
 
 if __name__ == "__main__":
     test_text = "API 목록에 있는 토큰 카운터 기능을 테스트합니다."
-    check_token_usage(test_text)
+    estimate_token_usage(test_text)
+    # --remote: 게이트웨이에 요청해서 정확한 값과 비교
+    if "--remote" in sys.argv:
+        check_token_usage(test_text)
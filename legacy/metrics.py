@@ -0,0 +1,220 @@
+"""
+Tokamak AI 웹 인터페이스의 요청 지표 (Prometheus 텍스트 형식, GET /metrics)
+Flask 앱(app.py)과 ASGI 앱(asgi_app.py)이 함께 사용
+
+- 외부 패키지 없이 프로세스 안에서 히스토그램/카운터를 유지
+- /api/chat 스트림마다 대기 시간, 업스트림 연결 시간, TTFT, 토큰 간 지연, 전체 시간, 토큰 수, 결과(ok/error/disconnect) 기록
+- 토큰 간 지연은 스트림 안에서 lock 없이 모았다가 스트림이 끝날 때 한 번에 반영
+- 라벨: model, key_group (API 키 자체가 아니라 키를 설정한 환경변수 이름)
+"""
+
+import time
+import threading
+from bisect import bisect_left
+
+from token_estimator import estimate_tokens
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 지표 하나당 최대 라벨 조합 수 (모델 이름은 클라이언트가 보내므로 넘으면 model="other"로 묶음)
+MAX_LABEL_SETS = 200
+
+_metrics = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # 라벨 값 튜플 -> 값
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        """라벨 조합 (lock 안에서 호출, 조합이 너무 많으면 model을 other로)"""
+        if labels not in self._values and len(self._values) >= MAX_LABEL_SETS and 'model' in self.labelnames:
+            labels = tuple('other' if name == 'model' else value for name, value in zip(self.labelnames, labels))
+        return labels
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(labels, self._snapshot(value)) for labels, value in self._values.items()]
+        for labels, value in sorted(items):
+            lines.extend(self._lines(labels, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            key = self._key(labels)
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _snapshot(self, value):
+        return value
+
+    def _lines(self, labels, value):
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_format(value)}"]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+
+class LocalHistogram:
+    """스트림 하나에서만 쓰는 lock 없는 히스토그램 (Histogram.merge로 반영)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def local(self):
+        return LocalHistogram(self.buckets)
+
+    def observe(self, labels, value):
+        local = self.local()
+        local.observe(value)
+        self.merge(labels, local)
+
+    def merge(self, labels, local):
+        if not local.count:
+            return
+        with self._lock:
+            key = self._key(labels)
+            total = self._values.get(key)
+            if total is None:
+                total = self._values[key] = LocalHistogram(self.buckets)
+            for i, count in enumerate(local.counts):
+                total.counts[i] += count
+            total.sum += local.sum
+            total.count += local.count
+
+    def _snapshot(self, value):
+        return list(value.counts), value.sum, value.count
+
+    def _lines(self, labels, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket
+            le = 'le="+Inf"' if bound == float('inf') else f'le="{_format(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_format(float(total))}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def render_metrics():
+    """등록된 모든 지표를 Prometheus 텍스트 형식으로"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---- /api/chat 지표 ----
+
+LABELS = ('model', 'key_group')
+
+QUEUE_SECONDS = Histogram(
+    'tokamak_chat_queue_seconds', '요청 수신부터 업스트림 호출 시작까지 (세션 준비, 워커/스레드풀 대기 포함)',
+    (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5), LABELS)
+CONNECT_SECONDS = Histogram(
+    'tokamak_chat_connect_seconds', '업스트림 호출 시작부터 응답 헤더 수신까지',
+    (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30), LABELS)
+TTFT_SECONDS = Histogram(
+    'tokamak_chat_ttft_seconds', '업스트림 호출 시작부터 첫 토큰까지',
+    (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60), LABELS)
+INTER_TOKEN_SECONDS = Histogram(
+    'tokamak_chat_inter_token_seconds', '업스트림 응답 조각 사이의 간격',
+    (0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5), LABELS)
+STREAM_SECONDS = Histogram(
+    'tokamak_chat_stream_seconds', '요청 수신부터 스트림 종료까지',
+    (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300), LABELS)
+REQUESTS = Counter(
+    'tokamak_chat_requests_total', '/api/chat 요청 수 (status: ok, error, disconnect)', LABELS + ('status',))
+TOKENS = Counter(
+    'tokamak_chat_tokens_total', '추정 토큰 수 (type: prompt, completion)', LABELS + ('type',))
+ACTIVE_STREAMS = Gauge('tokamak_chat_active_streams', '진행 중인 /api/chat 스트림 수')
+
+
+class ChatObserver:
+    """/api/chat 스트림 하나의 측정 (스트림을 처리하는 쪽에서만 호출하므로 끝날 때까지 lock 없음)"""
+
+    def __init__(self, model, key_group, received=None):
+        self.labels = (model, key_group)
+        self.received = received or time.perf_counter()
+        self.started = None
+        self.last = None
+        self.error = False
+        self._gaps = INTER_TOKEN_SECONDS.local()
+
+    def upstream_start(self):
+        self.started = time.perf_counter()
+        ACTIVE_STREAMS.inc()
+        QUEUE_SECONDS.observe(self.labels, self.started - self.received)
+
+    def connected(self):
+        CONNECT_SECONDS.observe(self.labels, time.perf_counter() - self.started)
+
+    def delta(self):
+        now = time.perf_counter()
+        if self.last is None:
+            TTFT_SECONDS.observe(self.labels, now - self.started)
+        else:
+            self._gaps.observe(now - self.last)
+        self.last = now
+
+    def failed(self):
+        self.error = True
+
+    def finish(self, messages, reply, completed):
+        """스트림 종료 (completed=False면 클라이언트가 중간에 끊음)"""
+        if self.started is not None:
+            ACTIVE_STREAMS.dec()
+        INTER_TOKEN_SECONDS.merge(self.labels, self._gaps)
+        STREAM_SECONDS.observe(self.labels, time.perf_counter() - self.received)
+        status = 'error' if self.error else 'ok' if completed else 'disconnect'
+        REQUESTS.inc(self.labels + (status,))
+        TOKENS.inc(self.labels + ('prompt',), sum(estimate_tokens(m.get('content') or '') for m in messages))
+        TOKENS.inc(self.labels + ('completion',), estimate_tokens(reply))
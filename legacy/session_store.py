@@ -0,0 +1,154 @@
+"""
+Tokamak AI 웹 인터페이스의 대화 세션 저장소
+브라우저는 세션 ID와 새 메시지만 보내고, 대화 내용은 서버가 보관
+
+- 메모리에 최근 세션만 보관 (최대 개수 초과 시 LRU로 밀어냄, TTL이 지나면 만료)
+- db_path를 지정하면 SQLite에도 기록 (밀려난 세션 복원, 서버 재시작/워커 여러 개에서도 공유)
+"""
+
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from token_estimator import estimate_tokens
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+"""
+
+# 메시지 하나당 역할/구분자 등으로 붙는 토큰 수
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def window_messages(messages, max_tokens):
+    """토큰 예산 안에 들어가는 최근 메시지들 (마지막 메시지는 항상 포함)"""
+    kept = []
+    used = 0
+    for message in reversed(messages):
+        tokens = estimate_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS
+        if kept and used + tokens > max_tokens:
+            break
+        kept.append(message)
+        used += tokens
+    kept.reverse()
+    return kept
+
+
+class SessionStore:
+    """세션 ID -> 메시지 목록"""
+
+    def __init__(self, max_sessions=1000, ttl=86400, db_path=None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.db_path = db_path
+        self._sessions = OrderedDict()  # id -> {"messages": [...], "updated": 시각}
+        self._lock = threading.Lock()
+        if db_path:
+            with self._connect() as conn:
+                conn.executescript(SCHEMA)
+                # 만료된 세션 정리
+                expired = time.time() - ttl
+                conn.execute("DELETE FROM messages WHERE session_id IN (SELECT id FROM sessions WHERE updated < ?)",
+                             (expired,))
+                conn.execute("DELETE FROM sessions WHERE updated < ?", (expired,))
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def _expired(self, updated):
+        return time.time() - updated > self.ttl
+
+    def _load(self, session_id):
+        """SQLite에서 세션 읽기 (없거나 만료됐으면 None)"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT updated FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[0]):
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                return None
+            messages = [{"role": role, "content": content} for role, content in conn.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? ORDER BY seq", (session_id,))]
+        return {"messages": messages, "updated": row[0]}
+
+    def _stored_count(self, session_id):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+    def get(self, session_id):
+        """세션의 메시지 목록 (없거나 만료됐으면 None)"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry and self._expired(entry['updated']):
+                del self._sessions[session_id]
+                entry = None
+        # 다른 워커가 같은 세션에 메시지를 추가했을 수 있으므로 개수가 다르면 다시 읽음
+        if self.db_path and (entry is None or len(entry['messages']) != self._stored_count(session_id)):
+            entry = self._load(session_id)
+            if entry is not None:
+                with self._lock:
+                    self._sessions[session_id] = entry
+                    self._evict()
+        if entry is None:
+            return None
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions.move_to_end(session_id)
+            return list(entry['messages'])
+
+    def append(self, session_id, *messages):
+        """세션에 메시지 추가 (세션이 없으면 새로 생성)"""
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = self._sessions[session_id] = {"messages": [], "updated": now}
+            entry['messages'].extend(messages)
+            entry['updated'] = now
+            self._sessions.move_to_end(session_id)
+            self._evict()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO sessions (id, updated) VALUES (?, ?)", (session_id, now))
+                start = conn.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id = ?",
+                                     (session_id,)).fetchone()[0]
+                conn.executemany(
+                    "INSERT OR REPLACE INTO messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                    [(session_id, start + i, m['role'], m['content']) for i, m in enumerate(messages)])
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def _evict(self):
+        """최대 개수를 넘는 오래된 세션을 메모리에서 제거 (SQLite에 기록된 내용은 유지) - lock 안에서 호출"""
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
@@ -0,0 +1,179 @@
+"""
+Tokamak AI 웹 인터페이스의 SSE 프레임 생성
+Flask 앱(app.py)과 ASGI 앱(asgi_app.py)이 함께 사용
+
+- 업스트림 조각(≈토큰)을 모아서 최대 지연(SSE_MAX_LATENCY_MS, 기본 30ms) 또는
+  최대 크기(SSE_MAX_BYTES, 기본 1024바이트)에 도달하면 프레임 하나로 전송
+  (Flask는 조각이 도착할 때 확인, ASGI는 업스트림이 멈춰 있어도 지연 타이머로 전송)
+- 스트림별 프레임/조각 수를 기록 (튜닝용, /api/health에서 누적값 확인)
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+from contextlib import suppress
+
+DONE_FRAME = "data: [DONE]\n\n"
+
+# json.dumps보다 가볍고, 한글을 \uXXXX(6바이트) 대신 UTF-8(3바이트)로 보냄
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+_totals = {"streams": 0, "frames": 0, "deltas": 0, "bytes": 0}
+_totals_lock = threading.Lock()
+
+
+def sse_frame(content):
+    return f'data: {{"content": {_encode(content)}}}\n\n'
+
+
+def stream_totals():
+    """서버 시작 이후 전체 스트림의 누적 카운터"""
+    with _totals_lock:
+        totals = dict(_totals)
+    totals["deltas_per_frame"] = round(totals["deltas"] / totals["frames"], 2) if totals["frames"] else 0
+    return totals
+
+
+class StreamStats:
+    """스트림 하나의 프레임/조각 카운터"""
+
+    def __init__(self, model):
+        self.model = model
+        self.frames = 0
+        self.deltas = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    def record(self, frame, deltas):
+        self.frames += 1
+        self.deltas += deltas
+        self.bytes += len(frame.encode('utf-8'))
+
+    def finish(self):
+        with _totals_lock:
+            _totals["streams"] += 1
+            _totals["frames"] += self.frames
+            _totals["deltas"] += self.deltas
+            _totals["bytes"] += self.bytes
+        if os.getenv("SSE_LOG_STATS", "1") != "0":
+            elapsed = time.monotonic() - self.started
+            print(f"📊 SSE ({self.model}): 프레임 {self.frames}개 / 조각 {self.deltas}개, "
+                  f"{self.bytes:,}바이트, {elapsed:.1f}초")
+
+
+def _limits(max_latency, max_bytes):
+    if max_latency is None:
+        max_latency = float(os.getenv("SSE_MAX_LATENCY_MS", "30")) / 1000
+    if max_bytes is None:
+        max_bytes = int(os.getenv("SSE_MAX_BYTES", "1024"))
+    return max_latency, max_bytes
+
+
+class _Batch:
+    """아직 보내지 않은 조각 모음"""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.deadline = None
+
+    def add(self, delta, max_latency):
+        if not self.parts:
+            self.deadline = time.monotonic() + max_latency
+        self.parts.append(delta)
+        self.size += len(delta.encode('utf-8'))
+
+    def take(self):
+        text, count = "".join(self.parts), len(self.parts)
+        self.parts, self.size, self.deadline = [], 0, None
+        return text, count
+
+
+def coalesce(deltas, max_latency=None, max_bytes=None):
+    """동기 조각 iterator를 (텍스트, 조각 수) 묶음으로 변환
+
+    요청 스레드에서 바로 읽으면서, 조각이 도착했을 때 max_latency가 지났거나 max_bytes를 넘었으면 내보냅니다
+    (스트림당 스레드를 더 쓰지 않음, 업스트림이 멈춰 있는 동안 모은 조각은 다음 조각과 함께 전송).
+    중간에 반복을 멈추면 업스트림도 바로 닫습니다.
+    """
+    max_latency, max_bytes = _limits(max_latency, max_bytes)
+    try:
+        if max_latency <= 0:
+            for delta in deltas:
+                yield delta, 1
+            return
+
+        batch = _Batch()
+        for delta in deltas:
+            batch.add(delta, max_latency)
+            if batch.size >= max_bytes or time.monotonic() >= batch.deadline:
+                yield batch.take()
+        if batch.parts:
+            yield batch.take()
+    finally:
+        if hasattr(deltas, 'close'):
+            deltas.close()
+
+
+async def acoalesce(deltas, max_latency=None, max_bytes=None):
+    """coalesce의 async 버전 (업스트림 대기와 지연 타이머를 이벤트 루프에서 함께 처리)"""
+    max_latency, max_bytes = _limits(max_latency, max_bytes)
+    if max_latency <= 0:
+        async for delta in deltas:
+            yield delta, 1
+        return
+
+    batch = _Batch()
+    pending = asyncio.ensure_future(deltas.__anext__())
+    try:
+        while True:
+            timeout = None if batch.deadline is None else max(0, batch.deadline - time.monotonic())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield batch.take()
+                continue
+            try:
+                delta = pending.result()
+            except StopAsyncIteration:
+                break
+            batch.add(delta, max_latency)
+            if batch.size >= max_bytes:
+                yield batch.take()
+            pending = asyncio.ensure_future(deltas.__anext__())
+        if batch.parts:
+            yield batch.take()
+    finally:
+        if not pending.done():
+            # 클라이언트가 끊긴 경우: 대기 중인 업스트림 읽기를 취소하고 스트림 닫기
+            pending.cancel()
+            with suppress(asyncio.CancelledError, Exception):
+                await pending
+        await deltas.aclose()
+
+
+def sse_events(deltas, model):
+    """동기 조각 iterator -> SSE 프레임 (마지막에 [DONE])"""
+    stats = StreamStats(model)
+    try:
+        for text, count in coalesce(deltas):
+            frame = sse_frame(text)
+            stats.record(frame, count)
+            yield frame
+        yield DONE_FRAME
+    finally:
+        stats.finish()
+
+
+async def asse_events(deltas, model):
+    """async 조각 iterator -> SSE 프레임 (마지막에 [DONE])"""
+    stats = StreamStats(model)
+    try:
+        async for text, count in acoalesce(deltas):
+            frame = sse_frame(text)
+            stats.record(frame, count)
+            yield frame
+        yield DONE_FRAME
+    finally:
+        stats.finish()
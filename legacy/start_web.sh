@@ -38,4 +38,9 @@ echo ""
 echo "Press Ctrl+C to stop the server"
 echo ""
 
-python app.py
+# --asgi: async 서버로 실행 (starlette, uvicorn 필요)
+if [ "$1" == "--asgi" ]; then
+    python asgi_app.py
+else
+    python app.py
+fi
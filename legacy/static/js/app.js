@@ -1,5 +1,7 @@
 // App State
+// 대화 내용은 서버 세션에 보관 (여기 기록은 화면 표시/다운로드용)
 let conversationHistory = [];
+let sessionId = localStorage.getItem('sessionId');
 let isProcessing = false;
 
 // DOM Elements
@@ -109,7 +111,6 @@ async function sendMessage() {
         isProcessing = false;
         sendBtn.disabled = false;
         userInput.focus();
-        saveConversationHistory();
     }
 }
 
@@ -127,7 +128,8 @@ async function streamResponse(messageId) {
             'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-            messages: conversationHistory,
+            session_id: sessionId,
+            message: conversationHistory[conversationHistory.length - 1].content,
             model: model
         })
     });
@@ -136,15 +138,25 @@ async function streamResponse(messageId) {
         throw new Error(`HTTP error! status: ${response.status}`);
     }
 
+    // 새 세션이면 서버가 발급한 ID 저장
+    const newSessionId = response.headers.get('X-Session-Id');
+    if (newSessionId && newSessionId !== sessionId) {
+        sessionId = newSessionId;
+        localStorage.setItem('sessionId', sessionId);
+    }
+
     const reader = response.body.getReader();
     const decoder = new TextDecoder();
+    let buffer = '';
 
     while (true) {
         const { value, done } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value);
-        const lines = chunk.split('\n');
+        // 읽기 단위가 프레임/UTF-8 문자 중간에서 끊길 수 있으므로 완성된 줄만 처리
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
 
         for (const line of lines) {
             if (line.startsWith('data: ')) {
@@ -243,6 +255,11 @@ function scrollToBottom() {
 function clearConversation() {
     if (confirm('대화 내용을 모두 지우시겠습니까?')) {
         conversationHistory = [];
+        if (sessionId) {
+            fetch(`/api/sessions/${sessionId}`, { method: 'DELETE' });
+            sessionId = null;
+            localStorage.removeItem('sessionId');
+        }
         chatContainer.innerHTML = `
             <div class="welcome-message">
                 <div class="welcome-icon">👋</div>
@@ -264,8 +281,6 @@ function clearConversation() {
                 sendMessage();
             });
         });
-
-        saveConversationHistory();
     }
 }
 
@@ -294,33 +309,33 @@ function downloadConversation() {
     URL.revokeObjectURL(url);
 }
 
-// Save Conversation History
-function saveConversationHistory() {
-    try {
-        localStorage.setItem('conversationHistory', JSON.stringify(conversationHistory));
-    } catch (e) {
-        console.error('Failed to save conversation history:', e);
-    }
-}
+// Load Conversation History (서버 세션에서 복원)
+async function loadConversationHistory() {
+    // 예전 버전이 브라우저에 저장해둔 전체 대화는 더 이상 사용하지 않음
+    localStorage.removeItem('conversationHistory');
+    if (!sessionId) return;
 
-// Load Conversation History
-function loadConversationHistory() {
     try {
-        const saved = localStorage.getItem('conversationHistory');
-        if (saved) {
-            conversationHistory = JSON.parse(saved);
-
-            // Restore messages
-            if (conversationHistory.length > 0) {
-                const welcomeMsg = document.querySelector('.welcome-message');
-                if (welcomeMsg) {
-                    welcomeMsg.style.display = 'none';
-                }
+        const response = await fetch(`/api/sessions/${sessionId}`);
+        if (!response.ok) {
+            // 만료된 세션: 새 대화로 시작
+            sessionId = null;
+            localStorage.removeItem('sessionId');
+            return;
+        }
+        const data = await response.json();
+        conversationHistory = data.messages;
 
-                conversationHistory.forEach(msg => {
-                    addMessage(msg.role, msg.content);
-                });
+        // Restore messages
+        if (conversationHistory.length > 0) {
+            const welcomeMsg = document.querySelector('.welcome-message');
+            if (welcomeMsg) {
+                welcomeMsg.style.display = 'none';
             }
+
+            conversationHistory.forEach(msg => {
+                addMessage(msg.role, msg.content);
+            });
         }
     } catch (e) {
         console.error('Failed to load conversation history:', e);
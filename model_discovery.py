@@ -0,0 +1,160 @@
+"""
+Tokamak AI Model Discovery
+여러 API 키로 사용 가능한 모델 목록을 동시에 조회하고 TTL 캐시에 보관하는 도구
+
+- 키별로 동시에 조회하고 키마다 타임아웃 적용 (느린 키 하나가 전체를 막지 않음)
+- 캐시가 만료되면 이전 결과를 바로 반환하고 백그라운드에서 갱신 (stale-while-revalidate)
+- cache_path를 지정하면 결과를 파일에도 저장해서 다른 프로세스(ai.py 등)와 공유
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from transport import get_transport
+
+# models: 정렬된 모델 id 목록, errors: {키 id(key_id): 에러 메시지}, fetched_at: 조회 시각, stale: 만료된 결과인지
+DiscoveryResult = namedtuple('DiscoveryResult', ['models', 'errors', 'fetched_at', 'stale'])
+
+
+def mask_key(key):
+    """출력용 (같은 접두어로 시작하는 키가 많으므로 구분/식별에는 key_id 사용)"""
+    return f"{key[:6]}…" if key else "(empty)"
+
+
+def key_id(key):
+    """키를 드러내지 않으면서 키마다 다른 짧은 id (캐시 식별, 키별 에러 표시용)"""
+    return hashlib.sha256((key or "").encode('utf-8')).hexdigest()[:12]
+
+
+def collect_api_keys():
+    """AI_API_KEY와 AI_API_KEY_* 환경변수의 키 목록 (중복/예시 값 제외)"""
+    keys = [os.getenv("AI_API_KEY")]
+    keys += [value for name, value in sorted(os.environ.items()) if name.startswith("AI_API_KEY_")]
+    return [k for k in dict.fromkeys(keys) if k and k != "your_api_key_here"]
+
+
+def default_cache_path():
+    """CLI에서 쓰는 모델 목록 캐시 파일 위치"""
+    base = os.getenv("AI_CACHE_DIR")
+    if base:
+        return Path(base).parent / "models.json"
+    return Path(__file__).parent / "analysis" / ".cache" / "models.json"
+
+
+class ModelDiscovery:
+    """키별 모델 목록 조회 + TTL 캐시"""
+
+    def __init__(self, base_url, keys, ttl=None, timeout=None, cache_path=None, fetch=None):
+        """fetch(key, timeout) -> 모델 id 목록 (지정하지 않으면 공용 transport 사용)
+
+        ttl/timeout을 지정하지 않으면 환경변수 AI_MODELS_TTL(기본 300초), AI_MODELS_TIMEOUT(기본 5초)을 사용합니다.
+        """
+        self.base_url = base_url
+        self.keys = list(keys)
+        self.ttl = float(ttl or os.getenv("AI_MODELS_TTL", "300"))
+        self.timeout = float(timeout or os.getenv("AI_MODELS_TIMEOUT", "5"))
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._fetch = fetch or self._default_fetch
+        self._lock = threading.Lock()
+        self._result = None
+        self._refreshing = None  # 진행 중인 백그라운드 갱신 스레드
+        self._load()
+
+    def _default_fetch(self, key, timeout):
+        return get_transport(key, self.base_url).list_models(timeout=timeout)
+
+    def set_keys(self, keys, base_url=None):
+        """키 설정이 바뀌면 캐시를 비움"""
+        with self._lock:
+            self.keys = list(keys)
+            self.base_url = base_url or self.base_url
+            self._result = None
+
+    def key_label(self, kid):
+        """errors의 키 id를 출력용으로 (마스킹된 키 접두어 + id)"""
+        key = next((k for k in self.keys if key_id(k) == kid), None)
+        return f"{mask_key(key)} ({kid})" if key else kid
+
+    def _load(self):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('base_url') == self.base_url and data.get('keys') == [key_id(k) for k in self.keys]:
+            self._result = DiscoveryResult(data['models'], data.get('errors', {}), data['fetched_at'], False)
+
+    def _save(self, result):
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'base_url': self.base_url,
+                'keys': [key_id(k) for k in self.keys],
+                'models': result.models,
+                'errors': result.errors,
+                'fetched_at': result.fetched_at,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def refresh(self):
+        """모든 키를 동시에 조회해서 캐시 갱신 (키마다 최대 timeout초)"""
+        keys = list(self.keys)
+        models = set()
+        errors = {}
+        pool = ThreadPoolExecutor(max_workers=max(1, len(keys)), thread_name_prefix="model-discovery")
+        futures = {pool.submit(self._fetch, key, self.timeout): key for key in keys}
+        done, pending = wait(futures, timeout=self.timeout + 1)
+        for future in done:
+            try:
+                models.update(future.result())
+            except Exception as e:
+                errors[key_id(futures[future])] = str(e)
+        for future in pending:
+            errors[key_id(futures[future])] = f"timeout ({self.timeout:.0f}s)"
+        pool.shutdown(wait=False)  # 멈춘 키는 기다리지 않음
+
+        result = DiscoveryResult(sorted(models), errors, time.time(), False)
+        with self._lock:
+            if models or self._result is None:
+                self._result = result
+            else:
+                # 전부 실패하면 이전 목록 유지, 에러만 갱신
+                self._result = self._result._replace(errors=errors)
+            result = self._result
+        if models:
+            self._save(result)
+        return result
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing and self._refreshing.is_alive():
+                return
+            self._refreshing = threading.Thread(target=self.refresh, name="model-discovery-refresh", daemon=True)
+            self._refreshing.start()
+
+    def wait_refresh(self, timeout=None):
+        """진행 중인 백그라운드 갱신이 끝날 때까지 대기 (CLI가 종료 전에 캐시를 저장하도록)"""
+        thread = self._refreshing
+        if thread:
+            thread.join(timeout)
+
+    def get(self):
+        """캐시된 결과 반환 (만료됐으면 이전 결과를 주고 백그라운드에서 갱신, 없으면 바로 조회)"""
+        result = self._result
+        if result is None:
+            return self.refresh()
+        if time.time() - result.fetched_at > self.ttl:
+            self._refresh_in_background()
+            return result._replace(stale=True)
+        return result
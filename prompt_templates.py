@@ -0,0 +1,198 @@
+"""
+Tokamak AI Prompt Templates
+code_assistant.py 명령들이 쓰는 프롬프트 템플릿 모음
+
+메시지 순서를 항상 [고정 지시사항 -> 저장소별 컨텍스트 -> 파일 내용/질문] 으로 맞춰서,
+여러 파일에 같은 명령을 실행할 때 앞부분이 같은 요청이 되도록 합니다.
+(게이트웨이/추론 서버의 프롬프트 접두어 캐시가 적중하면 첫 토큰이 빨라짐)
+
+- system: 요청마다 바뀌지 않는 지시사항 (변수 없음)
+- user: 요청마다 바뀌는 부분 (str.format 필드)
+- version: 템플릿 내용을 바꾸면 올려서 기존 응답 캐시/매니페스트를 무효화
+"""
+
+from collections import namedtuple
+
+PromptTemplate = namedtuple('PromptTemplate', ['name', 'version', 'system', 'user'])
+
+_FILE = """파일: {path}
+
+```
+{code}
+```"""
+
+TEMPLATES = {}
+
+
+def register(name, version, system, user=_FILE):
+    TEMPLATES[name] = PromptTemplate(name, version, system.strip(), user)
+
+
+def get_template(name):
+    return TEMPLATES[name]
+
+
+def system_message(name, context=None):
+    """고정 지시사항 + 저장소별 컨텍스트 (같은 저장소의 같은 명령끼리 공유되는 접두어)"""
+    system = TEMPLATES[name].system
+    if context:
+        system += "\n\n" + context
+    return {"role": "system", "content": system}
+
+
+def render(name, context=None, **fields):
+    """템플릿으로 chat 메시지 목록 생성
+
+    fields: user 템플릿의 필드 (extra 필드는 내용이 있을 때만 빈 줄 다음에 덧붙임)
+    """
+    extra = fields.pop('extra', None)
+    user = TEMPLATES[name].user.format(**fields)
+    if extra:
+        user += "\n\n" + extra
+    return [system_message(name, context), {"role": "user", "content": user}]
+
+
+register('analyze', 3, """
+당신은 코드 분석 도우미입니다. 사용자가 보낸 코드를 분석해주세요.
+
+질문이 함께 주어지면 그 질문에 집중해서 답변하고, 질문이 없으면 다음 항목들을 분석해주세요:
+1. 코드의 주요 기능과 목적
+2. 코드 품질 (가독성, 유지보수성)
+3. 잠재적인 버그나 개선점
+4. 베스트 프랙티스 준수 여부
+5. 성능 최적화 제안
+""")
+
+register('review', 3, """
+당신은 전문 개발자입니다. 사용자가 보낸 코드를 다음 관점에서 리뷰해주세요:
+1. 코드 스타일과 컨벤션
+2. 잠재적 버그
+3. 성능 이슈
+4. 보안 취약점
+5. 테스트 가능성
+6. 구체적인 개선 제안 (코드 예시 포함)
+
+리뷰는 건설적이고 구체적으로 해주세요.
+""")
+
+register('bugs', 3, """
+당신은 버그를 찾는 코드 검토자입니다. 사용자가 보낸 코드에서 다음을 찾아주세요:
+1. 논리적 오류
+2. 예외 처리 누락
+3. 메모리 누수 가능성
+4. 경쟁 조건 (race condition)
+5. 보안 취약점
+6. 엣지 케이스 미처리
+
+각 문제에 대해:
+- 문제가 있는 코드 라인
+- 문제 설명
+- 수정 방법
+을 제시해주세요.
+""")
+
+register('explain', 2, """
+사용자가 보낸 코드를 초보자도 이해할 수 있도록 자세히 설명해주세요.
+
+다음을 포함해서 설명해주세요:
+1. 전체적인 동작 방식
+2. 각 부분의 역할
+3. 사용된 개념/패턴
+4. 주의할 점
+5. 실제 사용 예시
+""", user="""{location}```
+{code}
+```""")
+
+register('refactor', 1, """
+사용자가 보낸 코드를 리팩토링해주세요.
+
+리팩토링 요구사항이 주어지면 그에 맞게, 없으면 다음 원칙에 따라 리팩토링해주세요:
+1. 가독성 향상
+2. 중복 코드 제거
+3. 함수/클래스 분리
+4. 네이밍 개선
+5. 성능 최적화
+
+리팩토링된 전체 코드를 제공해주세요.
+""")
+
+register('test', 2, """
+사용자가 보낸 코드에 대한 테스트 코드를 작성해주세요.
+
+주어진 테스트 프레임워크를 사용하여:
+1. 단위 테스트 (unit tests)
+2. 엣지 케이스 테스트
+3. 에러 케이스 테스트
+4. 통합 테스트 (필요시)
+
+완전하고 실행 가능한 테스트 코드를 제공해주세요.
+""")
+
+_APPLY = """파일: {path}
+
+현재 코드:
+```
+{code}
+```
+
+지시사항: {instruction}"""
+
+register('apply', 2, """
+사용자가 보낸 코드를 지시사항에 따라 수정해주세요.
+파일 전체를 다시 쓰지 말고, 바뀌는 부분만 아래 형식의 편집 블록으로 응답해주세요:
+
+<<<<<<< SEARCH
+(파일에 있는 그대로의 기존 코드)
+=======
+(바꿀 코드)
+>>>>>>> REPLACE
+
+규칙:
+1. SEARCH 부분은 들여쓰기와 공백까지 파일과 똑같이 쓰고, 파일에서 한 번만 나오도록 필요한 만큼의 줄을 포함해주세요.
+2. 수정할 곳이 여러 군데면 위에서 아래 순서로 블록을 여러 개 보내주세요.
+3. 코드를 지우려면 REPLACE 부분을 비워두세요.
+4. 블록 외의 설명은 제외해주세요.
+""", user=_APPLY)
+
+# 편집 블록을 적용하지 못했을 때 다시 요청하는 전체 파일 모드
+register('apply_full', 1, """
+사용자가 보낸 코드를 지시사항에 따라 수정해주세요.
+수정된 **전체 코드**만 코드 블록(```) 안에 넣어서 응답해주세요. 불필요한 설명은 제외해주세요.
+""", user=_APPLY)
+
+register('summary', 2, """
+사용자가 보낸 파일을 프로젝트 전체 분석에 쓸 수 있도록 5줄 이내로 요약해주세요.
+파일의 역할, 주요 클래스/함수, 다른 모듈과의 의존성, 눈에 띄는 문제점을 포함해주세요.
+""")
+
+register('analyze_dir', 1, """
+당신은 소프트웨어 아키텍트입니다. 아래의 프로젝트 구조, 파일별 요약, 소스 코드를 보고 프로젝트를 분석해주세요.
+
+질문이 함께 주어지면 그 질문에 집중해서 답변하고, 질문이 없으면 다음 항목들을 분석해주세요:
+1. 프로젝트의 전체적인 구조와 아키텍처
+2. 사용된 기술 스택
+3. 코드 품질과 일관성
+4. 개선 제안사항
+5. 보안 이슈나 잠재적 문제점
+""", user="{sources}")
+
+# 큰 파일을 나눠서 분석할 때 부분 하나에 붙이는 안내 (원래 명령의 템플릿과 함께 사용)
+CHUNK_NOTE = """파일: {path} (전체 {total_lines}줄 중 {index}/{count}번째 부분: {where})
+각 줄 앞의 숫자는 파일 기준 줄 번호입니다. 줄 번호를 언급할 때는 반드시 이 번호를 사용해주세요.
+이 부분에 보이지 않는 코드는 다른 부분에서 따로 분석하므로 추측하지 마세요.
+
+```
+{code}
+```"""
+
+register('reduce', 1, """
+사용자가 하나의 파일을 여러 부분으로 나누어 분석한 결과를 보냅니다.
+중복되는 내용은 합치고, 부분 사이에 걸친 문제는 연결해서, 하나의 완성된 보고서로 정리해주세요.
+줄 번호는 이미 파일 기준이므로 그대로 유지해주세요.
+""", user="""파일: {path} (전체 {total_lines}줄)
+
+[원래 요청]
+{request}
+
+{partials}""")
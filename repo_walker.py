@@ -0,0 +1,210 @@
+"""
+Tokamak AI Repository Walker
+디렉토리를 한 번만 순회하면서 프로젝트 구조(트리)와 분석 대상 파일 목록을 함께 만드는 도구
+"""
+
+import os
+import re
+from collections import namedtuple
+
+# 항상 제외하는 디렉토리/파일 이름 (이름이 '.'으로 시작하는 항목도 제외)
+DEFAULT_EXCLUDES = frozenset(['node_modules', '__pycache__', 'venv', '.venv', 'dist', 'build'])
+
+# 분석 대상 코드 파일 확장자
+CODE_EXTENSIONS = ('.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.go', '.rs', '.sol')
+
+# 분석 대상 파일 최대 크기 (50KB)
+MAX_FILE_SIZE = 50000
+
+# relpath: 루트 기준 '/' 구분 경로, path: 실제 경로, stat: os.stat_result
+WalkedFile = namedtuple('WalkedFile', ['relpath', 'path', 'stat'])
+WalkResult = namedtuple('WalkResult', ['tree', 'files'])
+
+
+def format_size(size):
+    """파일 크기 포맷팅"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024.0:
+            return f"{size:.1f}{unit}"
+        size /= 1024.0
+    return f"{size:.1f}TB"
+
+
+def _glob_to_regex(pattern):
+    """gitignore 패턴 하나를 정규식 문자열로 변환"""
+    out = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == n:
+            out.append('(?:/.*)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            out.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            out.append('[^/]')
+            i += 1
+        elif pattern[i] == '[':
+            end = pattern.find(']', i + 1)
+            if end < 0:
+                out.append(re.escape('['))
+                i += 1
+            else:
+                body = pattern[i + 1:end].replace('\\', '\\\\')
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append(f'[{body}]')
+                i = end + 1
+        elif pattern[i] == '\\' and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return ''.join(out)
+
+
+class GitIgnore:
+    """한 .gitignore 파일의 규칙 (규칙은 파일이 있는 디렉토리 기준)"""
+
+    def __init__(self, lines):
+        self.rules = []  # (정규식, 부정 여부, 디렉토리 전용 여부)
+        for raw in lines:
+            line = raw.rstrip('\n').rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            anchored = '/' in line
+            body = _glob_to_regex(line.lstrip('/'))
+            regex = re.compile(('' if anchored else '(?:.*/)?') + body + '$')
+            self.rules.append((regex, negate, dir_only))
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                return cls(f.readlines())
+        except OSError:
+            return None
+
+    def match(self, relpath, is_dir):
+        """무시 대상이면 True, 다시 포함(!)이면 False, 해당 규칙이 없으면 None"""
+        result = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(relpath):
+                result = not negate
+        return result
+
+
+def _is_ignored(matchers, relpath, is_dir):
+    """상위 디렉토리의 .gitignore부터 차례로 적용 (가까운 파일의 규칙이 우선)"""
+    ignored = False
+    for base, gitignore in matchers:
+        sub = relpath[len(base) + 1:] if base else relpath
+        result = gitignore.match(sub, is_dir)
+        if result is not None:
+            ignored = result
+    return ignored
+
+
+def walk_repository(root, max_depth=3, extensions=CODE_EXTENSIONS, max_file_size=MAX_FILE_SIZE,
+                    max_entries=40, use_gitignore=True):
+    """os.scandir로 한 번만 순회해서 (트리 문자열, 분석 대상 파일 목록) 반환
+
+    - 트리는 max_depth 깊이까지만 그리고, 더 깊은 디렉토리는 파일 수/크기 합계로 접음
+    - 한 디렉토리에 파일이 max_entries개보다 많으면 나머지 파일도 개수/크기 합계로 접음
+    - 파일 목록은 깊이와 상관없이 모든 하위 디렉토리에서 수집
+    """
+    root = os.fspath(root)
+    files = []
+    extensions = tuple(extensions)
+
+    matchers = []
+    if use_gitignore:
+        for name in ('.gitignore', os.path.join('.git', 'info', 'exclude')):
+            gitignore = GitIgnore.load(os.path.join(root, name))
+            if gitignore:
+                matchers.append(('', gitignore))
+
+    def visit(path, relpath, depth, matchers):
+        """반환: (트리 줄 목록, 파일 수, 전체 크기)"""
+        if use_gitignore and relpath:
+            gitignore = GitIgnore.load(os.path.join(path, '.gitignore'))
+            if gitignore:
+                matchers = matchers + [(relpath, gitignore)]
+
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda e: (not e.is_dir(follow_symlinks=False), e.name))
+        except OSError as e:
+            return [f"{'  ' * depth}Error: {e}"], 0, 0
+
+        lines = []
+        file_lines = []
+        count = 0
+        total = 0
+        hidden_count = 0
+        hidden_size = 0
+        indent = "  " * depth
+
+        for entry in entries:
+            name = entry.name
+            if name.startswith('.') or name in DEFAULT_EXCLUDES:
+                continue
+            child_rel = f"{relpath}/{name}" if relpath else name
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if matchers and _is_ignored(matchers, child_rel, is_dir):
+                continue
+
+            if is_dir:
+                sub_lines, sub_count, sub_size = visit(entry.path, child_rel, depth + 1, matchers)
+                count += sub_count
+                total += sub_size
+                if depth + 1 < max_depth:
+                    lines.append(f"{indent}📁 {name}/")
+                    lines.extend(sub_lines)
+                elif depth < max_depth:
+                    lines.append(f"{indent}📁 {name}/ (파일 {sub_count}개, {format_size(sub_size)})")
+                continue
+
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            count += 1
+            total += st.st_size
+
+            if name.endswith(extensions) and st.st_size < max_file_size:
+                files.append(WalkedFile(child_rel, entry.path, st))
+
+            if depth < max_depth:
+                if len(file_lines) < max_entries:
+                    file_lines.append(f"{indent}📄 {name} ({format_size(st.st_size)})")
+                else:
+                    hidden_count += 1
+                    hidden_size += st.st_size
+
+        if hidden_count:
+            file_lines.append(f"{indent}📄 … 외 파일 {hidden_count}개 ({format_size(hidden_size)})")
+        return lines + file_lines, count, total
+
+    tree_lines, _, _ = visit(root, '', 0, matchers)
+    files.sort(key=lambda f: f.relpath)
+    return WalkResult("\n".join(tree_lines), files)
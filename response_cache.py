@@ -0,0 +1,160 @@
+"""
+Tokamak AI Response Cache
+같은 파일/같은 프롬프트에 대한 AI 응답을 디스크에 저장해두고 재사용하는 캐시
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+
+class CacheMissError(Exception):
+    """--cache-only 모드에서 캐시에 응답이 없을 때 발생"""
+
+
+class ResponseCache:
+    """내용 기반(content-addressed) 응답 캐시
+
+    키는 (명령, 모델, 프롬프트 템플릿 버전, 파일 내용 해시, 질문/지시사항)으로 만들고,
+    항목 하나를 JSON 파일 하나로 저장합니다. 적중 시 파일 mtime을 갱신해서
+    용량 초과 시 가장 오래 사용하지 않은 항목부터 지웁니다 (LRU).
+    """
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, max_age_days=30):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 3600
+        self._lock = threading.Lock()
+        self._total_bytes = None  # 첫 저장 시 한 번만 계산
+
+    @staticmethod
+    def content_hash(content):
+        """파일 내용 해시"""
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_key(command, model, prompt_version, content, extra=None):
+        """캐시 키 생성"""
+        payload = json.dumps({
+            'command': command,
+            'model': model,
+            'prompt_version': prompt_version,
+            'content': ResponseCache.content_hash(content),
+            'extra': extra,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        """캐시된 응답 반환 (없거나 만료되면 None)"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry.get('created', 0) > self.max_age:
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)  # LRU 순서 갱신
+        except OSError:
+            pass
+        return entry.get('response')
+
+    def put(self, key, response, **meta):
+        """응답 저장 후 필요하면 오래된 항목 정리"""
+        writer = self.writer(key, **meta)
+        writer.write(response)
+        writer.commit()
+
+    def writer(self, key, **meta):
+        """응답을 받는 대로 조금씩 저장하는 CacheWriter (전체 응답을 메모리에 모으지 않음)"""
+        return CacheWriter(self, key, meta)
+
+    def _committed(self, path, size, old_size):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += size - old_size
+            if self._total_bytes > self.max_bytes:
+                self.evict()
+
+    def _entries(self):
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            yield path, st
+
+    def _scan_size(self):
+        return sum(st.st_size for _, st in self._entries())
+
+    def _remove(self, path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def evict(self):
+        """만료 항목 삭제 후, 용량 한도 안으로 들어올 때까지 LRU 순서로 삭제"""
+        now = time.time()
+        entries = []
+        for path, st in self._entries():
+            # 생성 시각은 파일 내용에 있지만, 만료 판단은 mtime으로 근사 (적중 시 갱신되므로 보수적)
+            if now - st.st_mtime > self.max_age:
+                self._remove(path)
+            else:
+                entries.append((st.st_mtime, st.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        self._total_bytes = total
+
+
+class CacheWriter:
+    """캐시 항목 하나를 스트리밍으로 기록 (임시 파일에 쓰다가 commit 시 교체)"""
+
+    def __init__(self, cache, key, meta):
+        self.cache = cache
+        self.path = cache._path(key)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_path = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+        # {"메타...", "created": ..., "response": "  까지 먼저 쓰고, 응답은 JSON 문자열로 이스케이프해서 이어씀
+        header = json.dumps(dict(meta, created=time.time(), response=""), ensure_ascii=False)
+        self._file.write(header[:-2])
+        self.empty = True
+
+    def write(self, text):
+        if text:
+            self._file.write(json.dumps(text, ensure_ascii=False)[1:-1])
+            self.empty = False
+
+    def commit(self):
+        self._file.write('"}')
+        self._file.close()
+        size = self.tmp_path.stat().st_size
+        old_size = self.path.stat().st_size if self.path.exists() else 0
+        os.replace(self.tmp_path, self.path)
+        self.cache._committed(self.path, size, old_size)
+
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        self.cache._remove(self.tmp_path)
@@ -0,0 +1,55 @@
+"""
+Tokamak AI Result Writer
+분석 결과를 메모리에 모아두지 않고 파일에 바로 이어쓰는 도구
+
+- <결과 파일>.partial에 버퍼링해서 이어쓰고, 완료되면 원래 이름으로 교체 (atomic rename)
+- 중간에 중단되면 .partial 파일이 남아서 지금까지 받은 내용을 확인할 수 있음
+"""
+
+import os
+from pathlib import Path
+
+# 이 크기만큼 모아서 디스크에 씀
+BUFFER_SIZE = 64 * 1024
+
+
+class ResultWriter:
+    """결과 파일 하나에 대한 스트리밍 기록"""
+
+    def __init__(self, path, buffer_size=BUFFER_SIZE, suffix=".partial"):
+        self.path = Path(path)
+        self.partial_path = self.path.with_name(self.path.name + suffix)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.partial_path, 'w', encoding='utf-8', buffering=buffer_size)
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def write(self, text):
+        self._file.write(text)
+
+    def close(self):
+        """기록을 마치고 파일 닫기 (확정 전에 내용을 검사할 때 사용)"""
+        self._file.close()
+
+    def commit(self):
+        """기록 완료: 원래 이름으로 교체하고 경로 반환"""
+        self._file.close()
+        os.replace(self.partial_path, self.path)
+        return self.path
+
+    def abort(self):
+        """중단: 지금까지의 내용을 .partial 파일로 남기고 그 경로 반환"""
+        if not self._file.closed:
+            self._file.close()
+        return self.partial_path
+
+    def discard(self):
+        """저장하지 않음: .partial 파일 삭제"""
+        if not self._file.closed:
+            self._file.close()
+        try:
+            self.partial_path.unlink()
+        except OSError:
+            pass
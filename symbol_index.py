@@ -0,0 +1,286 @@
+"""
+Tokamak AI Symbol Index
+저장소의 함수/클래스/메서드 정의 위치를 SQLite에 저장해두고 이름으로 찾는 인덱스
+"""
+
+import os
+import re
+import ast
+import hashlib
+import sqlite3
+from pathlib import Path
+from contextlib import contextmanager
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from code_chunker import BRACE_LANGUAGES, scan_depth
+from repo_walker import walk_repository
+
+# qualname: 점으로 연결한 전체 이름 (예: CodeAssistant.explain_code), start/end: 1부터 시작하는 줄 번호
+Symbol = namedtuple('Symbol', ['path', 'qualname', 'kind', 'start', 'end', 'signature', 'docstring'])
+
+INDEX_EXTENSIONS = ('.py',) + tuple(sorted(BRACE_LANGUAGES))
+
+# 이 개수보다 많은 파일이 바뀌었을 때만 프로세스 풀 사용
+PARALLEL_THRESHOLD = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    path TEXT NOT NULL,
+    qualname TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    start_line INTEGER NOT NULL,
+    end_line INTEGER NOT NULL,
+    signature TEXT,
+    docstring TEXT
+);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path, qualname);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+"""
+
+
+class SymbolLookupError(LookupError):
+    """심볼을 찾지 못했거나 이름이 여러 정의와 일치할 때 발생"""
+
+
+def find_repo_root(path):
+    """.git이 있는 가장 가까운 상위 디렉토리 (없으면 파일이 있는 디렉토리)"""
+    path = Path(path).resolve()
+    start = path if path.is_dir() else path.parent
+    for candidate in [start] + list(start.parents):
+        if (candidate / '.git').exists():
+            return candidate
+    return start
+
+
+def _first_line(docstring):
+    if not docstring:
+        return None
+    return docstring.strip().splitlines()[0][:200]
+
+
+def _python_symbols(relpath, code):
+    tree = ast.parse(code)
+    symbols = []
+
+    def visit(nodes, prefix, in_class):
+        for node in nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                qualname = f"{prefix}{node.name}"
+                start = min([d.lineno for d in node.decorator_list] + [node.lineno])
+                if isinstance(node, ast.ClassDef):
+                    bases = ", ".join(ast.unparse(b) for b in node.bases)
+                    signature = f"class {node.name}({bases})" if bases else f"class {node.name}"
+                    kind = 'class'
+                else:
+                    prefix_kw = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+                    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+                    signature = f"{prefix_kw} {node.name}({ast.unparse(node.args)}){returns}"
+                    kind = 'method' if in_class else 'function'
+                symbols.append(Symbol(relpath, qualname, kind, start, node.end_lineno, signature,
+                                      _first_line(ast.get_docstring(node))))
+                visit(node.body, qualname + '.', kind == 'class')
+
+    visit(tree.body, '', False)
+    return symbols
+
+
+_BRACE_DEF = re.compile(
+    r'^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?(?:async\s+)?(?:pub(?:\([^)]*\))?\s+)?'
+    r'(?P<kind>class|contract|interface|library|struct|enum|trait|function\*?|fn|func|modifier)\s+(?P<name>[A-Za-z_$][\w$]*)'
+)
+_BRACE_METHOD = re.compile(
+    r'^\s*(?:(?:public|private|protected|static|async|override|readonly|get|set)\s+)*'
+    r'(?P<name>[A-Za-z_$][\w$]*)\s*\([^;]*\)\s*(?::\s*[^{;]+)?\{'
+)
+_BRACE_ARROW = re.compile(
+    r'^\s*(?:export\s+)?(?:const|let|var)\s+(?P<name>[A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)'
+)
+_NOT_METHODS = {'if', 'for', 'while', 'switch', 'catch', 'return', 'function', 'with', 'else', 'do', 'try'}
+_CONTAINER_KINDS = {'class', 'contract', 'interface', 'library', 'struct', 'trait', 'enum'}
+
+
+def _brace_symbols(relpath, code):
+    """중괄호 언어: 정의 줄을 정규식으로 찾고 중괄호 깊이로 끝 줄을 계산"""
+    symbols = []
+    stack = []  # [qualname, kind, start, base_depth, entered, signature, is_container]
+    depth = 0
+    state = ''
+    lines = code.splitlines()
+
+    for idx, line in enumerate(lines, 1):
+        if state == '':
+            in_container = not stack or stack[-1][6]
+            match = _BRACE_DEF.match(line) or _BRACE_ARROW.match(line)
+            kind = None
+            if match:
+                kind = match.groupdict().get('kind') or 'function'
+            elif in_container and stack:
+                match = _BRACE_METHOD.match(line)
+                if match and match.group('name') not in _NOT_METHODS:
+                    kind = 'method'
+            if kind:
+                kind = kind.rstrip('*')
+                parent = stack[-1][0] + '.' if stack else ''
+                signature = line.strip().rstrip('{').strip()
+                stack.append([parent + match.group('name'), kind, idx, depth, False, signature,
+                              kind in _CONTAINER_KINDS])
+
+        depth, state, _ = scan_depth(line + '\n', depth, state)
+
+        while stack:
+            top = stack[-1]
+            if depth > top[3]:
+                top[4] = True
+                break
+            if not top[4] and not line.rstrip().endswith((';', '}')) and idx - top[2] < 3:
+                break  # 여는 중괄호가 다음 줄에 오는 경우
+            stack.pop()
+            symbols.append(Symbol(relpath, top[0], top[1], top[2], idx, top[5], None))
+
+    for top in stack:
+        symbols.append(Symbol(relpath, top[0], top[1], top[2], len(lines), top[5], None))
+    symbols.sort(key=lambda s: s.start)
+    return symbols
+
+
+def extract_symbols(root, relpath):
+    """파일 하나의 심볼 추출 (프로세스 풀에서 실행되므로 최상위 함수)
+
+    반환: (relpath, 내용 해시, 심볼 목록) / 읽기·파싱 실패 시 심볼 목록은 빈 리스트
+    """
+    try:
+        with open(os.path.join(root, relpath), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return relpath, None, []
+    file_hash = hashlib.sha256(data).hexdigest()
+    code = data.decode('utf-8', errors='replace')
+    try:
+        if relpath.endswith('.py'):
+            symbols = _python_symbols(relpath, code)
+        else:
+            symbols = _brace_symbols(relpath, code)
+    except (SyntaxError, ValueError, RecursionError):
+        symbols = []
+    return relpath, file_hash, symbols
+
+
+class SymbolIndex:
+    """저장소별 심볼 인덱스 (SQLite)
+
+    파일의 크기/mtime이 바뀐 경우에만 해시를 비교하고, 내용이 바뀐 파일만 다시 파싱합니다.
+    """
+
+    def __init__(self, db_path, root):
+        self.db_path = Path(db_path)
+        self.root = Path(root).resolve()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @staticmethod
+    def path_for(base_dir, root):
+        root = Path(root).resolve()
+        digest = hashlib.sha1(str(root).encode('utf-8')).hexdigest()[:12]
+        return Path(base_dir) / ".cache" / "symbols" / f"{root.name or 'root'}_{digest}.sqlite"
+
+    @contextmanager
+    def _connect(self):
+        """트랜잭션 단위 연결 (성공 시 커밋, 항상 닫음)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def update(self, relpaths=None, workers=None):
+        """인덱스 갱신 (relpaths가 없으면 저장소 전체). 반환: 다시 파싱한 파일 수"""
+        if relpaths is None:
+            walked = walk_repository(self.root, max_depth=0, extensions=INDEX_EXTENSIONS,
+                                     max_file_size=float('inf'))
+            current = {f.relpath: f.stat for f in walked.files}
+            full_scan = True
+        else:
+            current = {}
+            for relpath in relpaths:
+                try:
+                    current[relpath] = os.stat(self.root / relpath)
+                except OSError:
+                    pass
+            full_scan = False
+
+        with self._connect() as conn:
+            known = {row[0]: row[1:] for row in conn.execute("SELECT path, mtime_ns, size, hash FROM files")}
+            stale = [p for p, st in current.items()
+                     if known.get(p, (None, None))[:2] != (st.st_mtime_ns, st.st_size)]
+            removed = [p for p in known if p not in current] if full_scan else \
+                [p for p in (relpaths or []) if p in known and p not in current]
+
+            if len(stale) > PARALLEL_THRESHOLD:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(extract_symbols, [str(self.root)] * len(stale), stale, chunksize=8))
+            else:
+                results = [extract_symbols(str(self.root), p) for p in stale]
+
+            reparsed = 0
+            for relpath, file_hash, symbols in results:
+                st = current[relpath]
+                if file_hash is None:
+                    removed.append(relpath)
+                    continue
+                if relpath in known and known[relpath][2] == file_hash:
+                    # 내용은 그대로이고 mtime만 바뀜
+                    conn.execute("UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?",
+                                 (st.st_mtime_ns, st.st_size, relpath))
+                    continue
+                reparsed += 1
+                conn.execute("DELETE FROM symbols WHERE path = ?", (relpath,))
+                conn.executemany(
+                    "INSERT INTO symbols (path, qualname, name, kind, start_line, end_line, signature, docstring) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(s.path, s.qualname, s.qualname.rsplit('.', 1)[-1], s.kind, s.start, s.end,
+                      s.signature, s.docstring) for s in symbols])
+                conn.execute("INSERT OR REPLACE INTO files (path, mtime_ns, size, hash) VALUES (?, ?, ?, ?)",
+                             (relpath, st.st_mtime_ns, st.st_size, file_hash))
+
+            for relpath in removed:
+                conn.execute("DELETE FROM symbols WHERE path = ?", (relpath,))
+                conn.execute("DELETE FROM files WHERE path = ?", (relpath,))
+        return reparsed
+
+    def symbols(self, relpath):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT path, qualname, kind, start_line, end_line, signature, docstring "
+                "FROM symbols WHERE path = ? ORDER BY start_line", (relpath,)).fetchall()
+        return [Symbol(*row) for row in rows]
+
+    def lookup(self, relpath, name):
+        """파일 안에서 이름으로 심볼 찾기 (전체 이름 우선, 없으면 끝부분 일치)"""
+        self.update([relpath])
+        symbols = self.symbols(relpath)
+        exact = [s for s in symbols if s.qualname == name]
+        if exact:
+            return exact[0]
+        partial = [s for s in symbols if s.qualname.endswith('.' + name)]
+        if len(partial) == 1:
+            return partial[0]
+        if partial:
+            raise SymbolLookupError(f"'{name}'과 일치하는 정의가 여러 개입니다: {', '.join(s.qualname for s in partial)}")
+        raise SymbolLookupError(f"{relpath}에서 '{name}' 정의를 찾을 수 없습니다")
+
+    def parents(self, symbol):
+        """심볼을 감싸는 상위 정의들 (바깥쪽부터)"""
+        parts = symbol.qualname.split('.')
+        names = ['.'.join(parts[:i]) for i in range(1, len(parts))]
+        by_name = {s.qualname: s for s in self.symbols(symbol.path)}
+        return [by_name[n] for n in names if n in by_name]
@@ -0,0 +1,42 @@
+"""
+Tokamak AI Timings
+벤치마크(bench/run_bench.py)가 단계별 소요 시간을 측정할 수 있도록 남기는 가벼운 계측 기록
+
+- 환경변수 AI_TIMINGS_FILE이 설정된 경우에만 기록 (없으면 아무 일도 하지 않음)
+- 한 줄에 하나씩 JSON: {"event": 이름, "ts": time.time(), "ms": 구간 길이(span만), ...}
+- 이벤트: command(명령 시작), walk(파일 탐색 구간), request(API 요청 시작), first_token, response(응답 완료)
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+TIMINGS_FILE = os.getenv("AI_TIMINGS_FILE")
+
+_lock = threading.Lock()
+
+
+def record(event, **fields):
+    """이벤트 하나 기록"""
+    if not TIMINGS_FILE:
+        return
+    fields['event'] = event
+    fields['ts'] = time.time()
+    line = json.dumps(fields, ensure_ascii=False) + "\n"
+    with _lock, open(TIMINGS_FILE, 'a', encoding='utf-8') as f:
+        f.write(line)
+
+
+@contextmanager
+def span(event, **fields):
+    """with 구간의 길이를 ms 단위로 기록"""
+    if not TIMINGS_FILE:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(event, ms=(time.perf_counter() - start) * 1000, **fields)
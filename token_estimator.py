@@ -0,0 +1,234 @@
+"""
+Tokamak AI Token Estimator
+API 호출 없이 로컬에서 토큰 수와 모델 컨텍스트 크기를 추정
+
+- tiktoken 패키지가 있으면 o200k_base 인코딩으로, 없으면 글자 수 근사치로 셈
+- 같은 내용은 내용 해시로 다시 세지 않음 (큰 파일을 여러 번 세는 경우)
+- 응답의 usage.prompt_tokens로 모델별 보정 비율을 학습해서 파일에 저장 (다음 실행에서도 사용)
+"""
+
+import os
+import json
+import atexit
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# 모델 이름 접두어 -> 컨텍스트 크기 (긴 접두어가 먼저 매칭되도록 정렬해서 사용)
+MODEL_CONTEXT_WINDOWS = {
+    'qwen3-coder': 262144,
+    'qwen3': 131072,
+    'gpt-4o': 128000,
+    'gpt-4.1': 1000000,
+    'gpt-5': 400000,
+    'claude': 200000,
+    'opus': 200000,
+}
+DEFAULT_CONTEXT_WINDOW = 32768
+
+# 영문/코드는 평균 약 4자당 1토큰, 한글 등 비ASCII 문자는 약 1자당 1토큰으로 계산
+ASCII_CHARS_PER_TOKEN = 4.0
+NON_ASCII_TOKENS_PER_CHAR = 1.0
+
+# 채팅 메시지 하나당 역할/구분자 토큰
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# 이보다 짧은 텍스트는 해시를 만드는 비용이 더 크므로 메모하지 않음
+MEMO_MIN_CHARS = 512
+MEMO_MAX_ENTRIES = 4096
+
+# 보정 비율: 최근 관측값의 가중 평균, 이상한 usage 값에 끌려가지 않도록 범위 제한
+CALIBRATION_WEIGHT = 0.2
+CALIBRATION_RANGE = (0.25, 4.0)
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+_memo = OrderedDict()  # 내용 해시 -> 토큰 수
+_memo_lock = threading.Lock()
+
+
+def _tiktoken_encoding():
+    """tiktoken 인코딩 (처음 한 번만 로드, 없거나 로드에 실패하면 None)"""
+    global _encoding, _encoding_failed
+    if not TIKTOKEN_AVAILABLE or _encoding_failed:
+        return None
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None and not _encoding_failed:
+                try:
+                    _encoding = tiktoken.get_encoding("o200k_base")
+                except Exception:
+                    # 인코딩 파일을 내려받을 수 없는 환경 등 -> 근사치 사용
+                    _encoding_failed = True
+    return _encoding
+
+
+def _count(text):
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=())) + 1
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    non_ascii_chars = len(text) - ascii_chars
+    return int(ascii_chars / ASCII_CHARS_PER_TOKEN + non_ascii_chars * NON_ASCII_TOKENS_PER_CHAR) + 1
+
+
+def _base_tokens(text):
+    """보정 전 토큰 수 (긴 텍스트는 내용 해시로 메모)"""
+    if not text:
+        return 0
+    if len(text) < MEMO_MIN_CHARS:
+        return _count(text)
+    key = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    with _memo_lock:
+        tokens = _memo.get(key)
+        if tokens is not None:
+            _memo.move_to_end(key)
+            return tokens
+    tokens = _count(text)
+    with _memo_lock:
+        _memo[key] = tokens
+        if len(_memo) > MEMO_MAX_ENTRIES:
+            _memo.popitem(last=False)
+    return tokens
+
+
+def estimate_tokens(text, model=None):
+    """텍스트의 토큰 수 추정 (model을 주면 그 모델에서 학습한 보정 비율 적용)
+
+    보정 전 값은 실제보다 약간 크게 잡는 보수적인 근사치입니다.
+    """
+    tokens = _base_tokens(text)
+    if model and tokens:
+        tokens = int(tokens * calibration.ratio(model)) + 1
+    return tokens
+
+
+def estimate_messages(messages, model=None):
+    """채팅 메시지 목록 전체의 프롬프트 토큰 수 추정"""
+    tokens = sum(_base_tokens(m.get('content') or '') + MESSAGE_OVERHEAD_TOKENS for m in messages)
+    if model and tokens:
+        tokens = int(tokens * calibration.ratio(model)) + 1
+    return tokens
+
+
+def record_usage(model, messages, prompt_tokens):
+    """응답의 usage.prompt_tokens로 모델의 보정 비율 갱신"""
+    if not model or not prompt_tokens:
+        return
+    estimated = estimate_messages(messages)
+    if estimated:
+        calibration.observe(model, prompt_tokens / estimated)
+
+
+def context_window(model):
+    """모델의 컨텍스트 크기 (AI_MODEL_CONTEXT 환경변수가 있으면 우선)"""
+    override = os.getenv("AI_MODEL_CONTEXT")
+    if override:
+        return int(override)
+    name = (model or "").lower()
+    for prefix in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+        if name.startswith(prefix) or prefix in name:
+            return MODEL_CONTEXT_WINDOWS[prefix]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def default_calibration_path(save_dir=None):
+    """보정 비율 파일 위치 (응답 캐시와 같은 .cache 디렉토리, save_dir: 결과 저장 디렉토리)"""
+    base = os.getenv("AI_CACHE_DIR")
+    if base:
+        return Path(base).parent / "token_calibration.json"
+    return Path(save_dir or Path(__file__).parent / "analysis") / ".cache" / "token_calibration.json"
+
+
+class TokenCalibration:
+    """모델별 (실제 토큰 수 / 추정 토큰 수) 비율
+
+    파일은 처음 비율이 필요할 때 읽고, 바뀐 경우에만 프로세스 종료 시 저장합니다.
+    path를 주지 않으면 처음 읽을 때 default_calibration_path()를 사용합니다 (.env 로드 이후).
+    결과 저장 디렉토리를 따로 쓰는 경우(code_assistant.py --save-dir)에는 use_path()로 위치를 바꿉니다.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self._ratios = None  # 모델 -> {'ratio': 비율, 'samples': 관측 수}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """lock 안에서 호출"""
+        if self._ratios is not None:
+            return
+        self._ratios = {}
+        if self.path is None:
+            self.path = default_calibration_path()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('counter') == self.counter:
+            self._ratios = data.get('models', {})
+
+    def use_path(self, path):
+        """보정 비율 파일 위치 변경 (이미 읽은 비율은 버리고 새 위치에서 다시 읽음, 바뀐 비율은 먼저 저장)"""
+        path = Path(path)
+        with self._lock:
+            if self.path == path:
+                return
+        self.save()
+        with self._lock:
+            self.path = path
+            self._ratios = None
+            self._dirty = False
+
+    @property
+    def counter(self):
+        """보정 비율은 세는 방법에 따라 달라지므로 방법이 바뀌면 버림"""
+        return 'tiktoken' if _tiktoken_encoding() is not None else 'chars'
+
+    def ratio(self, model):
+        with self._lock:
+            self._load()
+            entry = self._ratios.get(model)
+        return entry['ratio'] if entry else 1.0
+
+    def observe(self, model, ratio):
+        low, high = CALIBRATION_RANGE
+        ratio = min(high, max(low, ratio))
+        with self._lock:
+            self._load()
+            entry = self._ratios.get(model)
+            if entry is None:
+                entry = self._ratios[model] = {'ratio': ratio, 'samples': 0}
+            else:
+                entry['ratio'] += (ratio - entry['ratio']) * CALIBRATION_WEIGHT
+            entry['samples'] += 1
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'counter': self.counter, 'models': {model: dict(entry) for model, entry in self._ratios.items()}}
+            self._dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp, self.path)
+        except OSError:
+            pass  # 보정 값은 다음에 다시 학습하면 되므로 저장 실패는 무시
+
+
+calibration = TokenCalibration()
+atexit.register(calibration.save)
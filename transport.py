@@ -0,0 +1,322 @@
+"""
+Tokamak AI Transport
+ai.py와 code_assistant.py가 함께 쓰는 AI API 호출 계층
+
+- 하나의 httpx.AsyncClient 커넥션 풀(keep-alive, h2 패키지가 있으면 HTTP/2)을 공유
+- async 스트리밍/일반 호출 API 제공
+- 기존 동기 코드에서도 쓸 수 있도록, 백그라운드 이벤트 루프 스레드에서 실행하는 동기 API 제공
+- 중복 요청(hedging): 첫 토큰이 늦으면 한 번 더 요청하고 먼저 첫 토큰을 보낸 쪽 사용 (정책은 hedging.py)
+- 응답의 usage(프롬프트 토큰 수)로 token_estimator의 모델별 보정 비율 갱신
+  (스트리밍은 게이트웨이가 usage를 보내줄 때만, AI_STREAM_USAGE=1이면 stream_options로 요청)
+"""
+
+import os
+import time
+import queue
+import asyncio
+import threading
+
+import httpx
+from openai import AsyncOpenAI
+
+import timings
+from token_estimator import record_usage
+
+try:
+    import h2  # noqa: F401  (HTTP/2 지원 여부 확인용)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_DONE = object()
+
+
+async def _first_delta(stream):
+    """스트림의 첫 조각 (빈 응답이면 None)"""
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def _cancel(task, stream):
+    """첫 조각을 기다리는 요청 취소 (스트림의 finally에서 응답도 닫힘)"""
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await stream.aclose()
+
+_loop = None
+_loop_lock = threading.Lock()
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def _background_loop():
+    """모든 Transport가 공유하는 이벤트 루프 (데몬 스레드에서 실행)"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="ai-transport", daemon=True)
+            thread.start()
+    return _loop
+
+
+def get_transport(api_key, base_url, **options):
+    """(api_key, base_url)별로 하나의 Transport를 공유해서 반환"""
+    key = (api_key, base_url)
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = _transports[key] = Transport(api_key, base_url, **options)
+        return transport
+
+
+def close_transports(keep):
+    """keep((api_key, base_url) 집합)에 없는 공유 Transport를 목록에서 빼고 커넥션 풀을 닫음 (키 설정 변경 시)
+
+    진행 중인 요청이 있는 Transport는 그 요청들이 끝난 뒤에 닫힙니다.
+    """
+    with _transports_lock:
+        stale = [_transports.pop(key) for key in list(_transports) if key not in keep]
+    for transport in stale:
+        transport.close()
+
+
+class Transport:
+    """커넥션 풀을 공유하는 AI API 클라이언트
+
+    timeout/connect_timeout/max_connections를 지정하지 않으면 환경변수
+    AI_TIMEOUT(기본 600초), AI_CONNECT_TIMEOUT(기본 10초), AI_MAX_CONNECTIONS(기본 100)를 사용합니다.
+    """
+
+    def __init__(self, api_key, base_url, timeout=None, connect_timeout=None, max_connections=None, http2=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = float(timeout or os.getenv("AI_TIMEOUT", "600"))
+        self.connect_timeout = float(connect_timeout or os.getenv("AI_CONNECT_TIMEOUT", "10"))
+        self.max_connections = int(max_connections or os.getenv("AI_MAX_CONNECTIONS", "100"))
+        self.http2 = HTTP2_AVAILABLE if http2 is None else http2
+        self._client = None
+        self._client_loop = None  # 커넥션 풀을 만든(소유한) 이벤트 루프
+        self._active = 0  # 진행 중인 요청 수
+        self._closing = False
+        self._state_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """AsyncOpenAI 클라이언트 (처음 사용할 때 커넥션 풀과 함께 생성)"""
+        if self._client is None:
+            http_client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60,
+                ),
+            )
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=http_client)
+            self._client_loop = asyncio.get_running_loop()
+        return self._client
+
+    def close(self):
+        """커넥션 풀 닫기 (기다리지 않음, 진행 중인 요청이 있으면 모두 끝난 뒤에 닫음)"""
+        with self._state_lock:
+            self._closing = True
+            if self._active:
+                return
+            client, loop = self._detach_client()
+        self._close_client(client, loop)
+
+    def _begin(self):
+        with self._state_lock:
+            self._active += 1
+
+    def _end(self):
+        """요청 하나가 끝남 (close()가 기다리던 마지막 요청이면 커넥션 풀을 닫음)"""
+        with self._state_lock:
+            self._active -= 1
+            if self._active or not self._closing:
+                return
+            client, loop = self._detach_client()
+        self._close_client(client, loop)
+
+    def _detach_client(self):
+        """_state_lock 안에서 호출"""
+        client, loop = self._client, self._client_loop
+        self._client = self._client_loop = None
+        return client, loop
+
+    def _close_client(self, client, loop):
+        """커넥션 풀을 만든 이벤트 루프에서 닫기 (다른 루프의 커넥션을 건드리지 않도록)"""
+        if client is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(client.close()).add_done_callback(self._report_close)
+        else:
+            asyncio.run_coroutine_threadsafe(client.close(), loop).add_done_callback(self._report_close)
+
+    def _report_close(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"⚠️ 커넥션 풀 닫기 실패 ({self.base_url}): {future.exception()}")
+
+    # ---- async API ----
+
+    async def acomplete(self, messages, model, **kwargs):
+        """스트리밍 없이 전체 응답 텍스트 반환"""
+        timings.record('request', model=model)
+        self._begin()
+        try:
+            response = await self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+        finally:
+            self._end()
+        timings.record('response', model=model)
+        if response.usage:
+            record_usage(model, messages, response.usage.prompt_tokens)
+        return response.choices[0].message.content or ""
+
+    async def astream(self, messages, model, on_connect=None, **kwargs):
+        """응답 텍스트 조각을 도착하는 대로 yield (on_connect: 응답 헤더를 받았을 때 호출)"""
+        timings.record('request', model=model)
+        if os.getenv("AI_STREAM_USAGE") == "1":
+            kwargs.setdefault('stream_options', {'include_usage': True})
+        self._begin()
+        try:
+            response = await self.client.chat.completions.create(
+                model=model, messages=messages, stream=True, **kwargs
+            )
+            if on_connect:
+                on_connect()
+            first = True
+            try:
+                async for chunk in response:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if first:
+                            timings.record('first_token', model=model)
+                            first = False
+                        yield chunk.choices[0].delta.content
+                    if getattr(chunk, 'usage', None):
+                        record_usage(model, messages, chunk.usage.prompt_tokens)
+                timings.record('response', model=model)
+            finally:
+                await response.close()
+        finally:
+            self._end()
+
+    async def ahedged_stream(self, messages, model, policy, on_hedge=None, **kwargs):
+        """astream + 중복 요청 (policy: hedging.HedgePolicy)
+
+        policy.delay(model) 안에 첫 토큰이 없고 예산이 남아 있으면 같은 모델(또는 대체 모델)로 한 번 더 요청하고,
+        먼저 첫 토큰을 보낸 쪽을 이어서 yield합니다. 진 요청은 취소합니다.
+        TTFT는 이긴 요청의 모델로 기록합니다 (같은 모델의 중복 요청이 이기면 원래 요청을 보낸 뒤 기다린 시간).
+        on_hedge(모델, 기다린 시간)는 중복 요청을 보낼 때 이벤트 루프 스레드에서 호출됩니다.
+        """
+        started = time.perf_counter()
+        primary = self.astream(messages, model, **kwargs)
+        tasks = {asyncio.ensure_future(_first_delta(primary)): (primary, model, started)}
+        winner = None
+        hedged = False
+        try:
+            delay = policy.delay(model)
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and policy.try_acquire():
+                hedged = True
+                backup_model = policy.fallback_model or model
+                timings.record('hedge', model=backup_model, delay=round(delay, 3))
+                if on_hedge:
+                    on_hedge(backup_model, delay)
+                backup = self.astream(messages, backup_model, **kwargs)
+                tasks[asyncio.ensure_future(_first_delta(backup))] = (backup, backup_model, time.perf_counter())
+
+            pending = set(tasks)
+            while winner is None and pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # 동시에 끝나면 원래 요청 우선, 실패한 요청은 건너뛰고 남은 요청을 기다림
+                winner = next((task for task in tasks if task in done and task.exception() is None), None)
+            if winner is None:
+                raise next(task.exception() for task in tasks)
+        finally:
+            if winner is None:
+                policy.record(model, None, hedged)
+            else:
+                _, winner_model, winner_started = tasks[winner]
+                if winner_model == model:
+                    winner_started = started
+                policy.record(winner_model, time.perf_counter() - winner_started, hedged)
+            for task, (stream, _, _) in tasks.items():
+                if task is not winner:
+                    await _cancel(task, stream)
+
+        stream = tasks[winner][0]
+        try:
+            first = winner.result()
+            if first is None:
+                return
+            yield first
+            async for delta in stream:
+                yield delta
+        finally:
+            await stream.aclose()
+
+    async def alist_models(self, timeout=None):
+        """모델 id 목록 (timeout을 주면 재시도 없이 그 시간 안에 끝나야 함)"""
+        timings.record('request', model=None)
+        self._begin()
+        try:
+            client = self.client if timeout is None else self.client.with_options(timeout=timeout, max_retries=0)
+            models = await client.models.list()
+        finally:
+            self._end()
+        timings.record('response', model=None)
+        return [model.id for model in models.data]
+
+    # ---- 동기 API (백그라운드 이벤트 루프에서 실행) ----
+
+    def submit(self, coro):
+        """코루틴을 공유 이벤트 루프에서 실행 (기다리지 않고 concurrent.futures.Future 반환)"""
+        return asyncio.run_coroutine_threadsafe(coro, _background_loop())
+
+    def run(self, coro):
+        """코루틴을 공유 이벤트 루프에서 실행하고 결과를 기다림"""
+        return self.submit(coro).result()
+
+    def complete(self, messages, model, **kwargs):
+        return self.run(self.acomplete(messages, model, **kwargs))
+
+    def list_models(self, timeout=None):
+        return self.run(self.alist_models(timeout))
+
+    def stream(self, messages, model, hedge=None, on_hedge=None, **kwargs):
+        """astream의 동기 버전 (중간에 반복을 멈추면 요청도 취소됨, hedge를 주면 ahedged_stream 사용)"""
+        items = queue.Queue()
+
+        async def pump():
+            if hedge is not None:
+                deltas = self.ahedged_stream(messages, model, hedge, on_hedge, **kwargs)
+            else:
+                deltas = self.astream(messages, model, **kwargs)
+            try:
+                async for delta in deltas:
+                    items.put(delta)
+            except Exception as e:
+                items.put(e)
+            finally:
+                items.put(_DONE)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), _background_loop())
+        try:
+            while True:
+                item = items.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()